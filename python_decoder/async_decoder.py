@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async Decoder - asyncio流式解码接口
+在asyncio服务中使用：
+
+    async with AsyncCimbarDecoder(output_dir="./decoded") as decoder:
+        async for event in decoder.stream(MonitorSource(1)):
+            if event['event'] == 'complete':
+                print(event['path'])
+
+事件是dict：每解码一帧产生 {"event": "decode", ...}，另外还有progress.py中的 progress / complete 事件，
+解码出错时产生 {"event": "error", ...}。
+有libcimbar_py时在线程池中调用进程内解码，否则通过asyncio.create_subprocess_exec启动常驻cimbar进程。
+一个事件循环可以同时驱动多个stream()，检测和解码共用事件循环的默认线程池。
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+import cimbar_native
+from cimbar_native import StreamStatus
+from cimbar_session import FRAME_ACK_PREFIX, CimbarSessionError, cimbar_executable
+from completion import CompletedIndex
+from detectors import create_detector
+from perspective import PerspectiveNormalizer
+from progress import ProgressTracker
+
+
+async def _wait_finished(future):
+    """等future完成，期间再次被取消也不提前返回（线程里的调用无法中断）"""
+    while not future.done():
+        try:
+            await asyncio.wait([future])
+        except asyncio.CancelledError:
+            pass
+    if not future.cancelled():
+        # 结果已经没人要了，取一下异常，免得asyncio报告"exception was never retrieved"
+        future.exception()
+
+
+class AsyncCimbarSession:
+    """常驻cimbar进程的asyncio版本（协议与CimbarDecodeSession相同：--ack --progress）"""
+
+    def __init__(self, cimbar_path="./cimbar", output_dir=None, no_deskew=True, extra_args=None, timeout=30.0):
+        self.cimbar_path = cimbar_path
+        self.output_dir = output_dir or tempfile.mkdtemp(prefix="cimbar_decode_")
+        self.no_deskew = no_deskew
+        self.extra_args = list(extra_args or [])
+        self.timeout = timeout
+        self.process = None
+        self.restarts = 0
+        self._lock = asyncio.Lock()
+
+    def command(self):
+        cmd = [cimbar_executable(self.cimbar_path), '-o', self.output_dir, '--ack', '--progress']
+        if self.no_deskew:
+            cmd.append('--no-deskew')
+        cmd.extend(self.extra_args)
+        return cmd
+
+    def is_running(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        if self.is_running():
+            return
+        if self.process is not None:
+            # 进程意外退出，fountain状态已丢失
+            self.restarts += 1
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command(), stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL)
+
+    async def decode_file(self, image_path):
+        """解码一帧图像，返回 (解码字节数, 新完成的文件列表, 数据流进度)
+
+        调用方被取消时，已经发出的请求仍会在后台读完应答，cimbar进程的输出不会错位。
+        """
+        return await asyncio.shield(self._exchange(os.path.abspath(image_path)))
+
+    async def _exchange(self, image_path):
+        async with self._lock:
+            await self.start()
+            try:
+                self.process.stdin.write(os.fsencode(image_path) + b'\n')
+                await self.process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError) as e:
+                raise CimbarSessionError(f"cimbar进程已退出: {e}")
+
+            new_files = []
+            streams = []
+            while True:
+                try:
+                    line = await asyncio.wait_for(self.process.stdout.readline(), self.timeout)
+                except asyncio.TimeoutError:
+                    await self.close()
+                    raise CimbarSessionError("cimbar解码超时")
+                if not line:
+                    raise CimbarSessionError("cimbar进程已退出")
+                line = line.decode('utf-8').rstrip('\r\n')
+                if line.startswith(FRAME_ACK_PREFIX):
+                    return int(line[len(FRAME_ACK_PREFIX):]), new_files, streams
+                if line.startswith('{'):
+                    st = json.loads(line)
+                    streams.append(StreamStatus(st['slot'], st['blocks'], st['required'], st['size']))
+                elif line:
+                    new_files.append(line)
+
+    async def close(self):
+        process, self.process = self.process, None
+        if process is None or process.returncode is not None:
+            return
+        process.stdin.close()
+        try:
+            await asyncio.wait_for(process.wait(), 5)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+
+class AsyncCimbarDecoder:
+    """asyncio流式解码器
+
+    max_pending: 检测完成、等待解码的帧数上限。latest=True（默认，适合实时捕获）时队列满了丢弃最旧的帧；
+                 latest=False时暂停读取捕获源，每一帧都会被解码（适合录制的帧）
+    fps: 捕获源的最高读取帧率，0表示不限
+    normalize: 检测到的区域透视校正到1024x1024标准网格再解码（解码器使用--no-deskew）；
+               False时解码器自己校正（不使用--no-deskew）
+    事件的消费者处理得慢时，解码也随之暂停（async for 本身就是背压）。
+    """
+
+    def __init__(self, cimbar_path="./cimbar", output_dir=None, use_native=True, detector='anchor',
+                 max_pending=1, latest=True, fps=60.0, expected_files=None, normalize=True):
+        self.cimbar_path = cimbar_path
+        self.output_dir = output_dir or tempfile.mkdtemp(prefix="cimbar_decode_")
+        self.detector = create_detector(detector)
+        self.normalizer = PerspectiveNormalizer() if normalize else None
+        self.max_pending = max(1, max_pending)
+        self.latest = latest
+        self.fps = fps
+        self.progress = ProgressTracker(expected_files)
+        self.completed = CompletedIndex()
+        self.native = None
+        self.session = None
+        self.decoded = 0
+        self.dropped = 0
+        if use_native and cimbar_native.is_available():
+            self.native = cimbar_native.Decoder(self.output_dir, no_deskew=normalize)
+        else:
+            self.session = AsyncCimbarSession(cimbar_path, self.output_dir, no_deskew=normalize)
+        # libcimbar_py的解码会话不能被多个线程同时使用
+        self._native_lock = asyncio.Lock()
+
+    async def decode(self, image):
+        """解码一帧BGR/BGRA图像（已检测和裁剪的ROI或完整画面），返回事件列表"""
+        loop = asyncio.get_running_loop()
+        try:
+            if self.native is not None:
+                async with self._native_lock:
+                    future = loop.run_in_executor(None, self._decode_native, image)
+                    try:
+                        result, streams = await asyncio.shield(future)
+                    except asyncio.CancelledError:
+                        # 取消不会中断线程里的解码：等它返回再释放锁，否则下一个decode()会同时使用
+                        # 同一个解码会话，aclose()也会释放线程还在使用的会话
+                        await _wait_finished(future)
+                        raise
+                nbytes, new_files = result.bytes, result.new_files
+            else:
+                path = await loop.run_in_executor(None, self._write_temp, image)
+                try:
+                    nbytes, new_files, streams = await self.session.decode_file(path)
+                finally:
+                    await loop.run_in_executor(None, os.remove, path)
+        except (CimbarSessionError, ValueError, RuntimeError) as e:
+            return [{'event': 'error', 'stage': 'decode', 'message': str(e)}]
+
+        self.decoded += 1
+        new_files = [entry.path for entry in map(self.completed.add, new_files) if entry]
+        events = [{'event': 'decode', 'bytes': nbytes, 'new_files': new_files}]
+        return events + self.progress.update(streams, new_files)
+
+    def _decode_native(self, image):
+        return self.native.decode(image), self.native.streams()
+
+    def _write_temp(self, image):
+        fd, path = tempfile.mkstemp(prefix="cimbar_frame_", suffix=".png")
+        os.close(fd)
+        cv2.imwrite(path, image)
+        return path
+
+    def _detect(self, frame):
+        image = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR) if frame.shape[2] == 4 else frame
+        return self.detector.detect(image, self.normalizer)
+
+    async def stream(self, source):
+        """从捕获源读取帧并解码，逐个产出事件，捕获源结束或预期文件全部完成时停止
+
+        source可以是异步可迭代对象（产出BGR/BGRA帧），也可以是流水线的捕获源（open()/grab()/close()，
+        grab()抛出EOFError表示结束）。后者的调用都在同一个专用线程中进行（mss不能跨线程使用）。
+        中途退出 async for 或取消任务时，捕获任务随之取消，捕获源被关闭。
+        """
+        queue = asyncio.Queue(self.max_pending)
+        capture = asyncio.ensure_future(self._capture(source, queue))
+        try:
+            while True:
+                get = asyncio.ensure_future(queue.get())
+                await asyncio.wait([get, capture], return_when=asyncio.FIRST_COMPLETED)
+                if not get.done():
+                    # 捕获结束：先把已经排队的帧解完，再把捕获中的异常交给调用方
+                    get.cancel()
+                    if queue.empty():
+                        capture.result()
+                        return
+                    roi = queue.get_nowait()
+                else:
+                    roi = get.result()
+                for event in await self.decode(roi):
+                    yield event
+                if self.progress.done:
+                    return
+        finally:
+            capture.cancel()
+            try:
+                await capture
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def _capture(self, source, queue):
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.fps if self.fps > 0 else 0
+        if hasattr(source, '__aiter__'):
+            async for frame in source:
+                await self._submit(loop, queue, frame)
+                if period:
+                    await asyncio.sleep(period)
+            return
+
+        thread = ThreadPoolExecutor(1, thread_name_prefix="cimbar-async-capture")
+        try:
+            await loop.run_in_executor(thread, source.open)
+            next_time = loop.time()
+            while True:
+                try:
+                    frame, _ = await loop.run_in_executor(thread, source.grab)
+                except EOFError:
+                    return
+                await self._submit(loop, queue, frame)
+                next_time += period
+                delay = next_time - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    next_time = loop.time()
+        finally:
+            # 取消时也要在捕获线程中关闭捕获源
+            await asyncio.shield(loop.run_in_executor(thread, source.close))
+            thread.shutdown(wait=False)
+
+    async def _submit(self, loop, queue, frame):
+        found, roi, _ = await loop.run_in_executor(None, self._detect, frame)
+        if not found:
+            return
+        if self.latest and queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        await queue.put(roi)
+
+    async def aclose(self):
+        if self.native is not None:
+            # 等进行中的解码（包括已被取消、线程还在运行的）结束后再释放会话
+            async with self._native_lock:
+                self.native.close()
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
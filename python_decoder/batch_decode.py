@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Decode - 批量解码录制的图像
+输入可以是目录、通配符或文件列表（@list.txt）。I/O线程预读文件，
+进程池中的每个进程用libcimbar_py做图像解码、提取和cimbar解码，只返回原始fountain块，
+所有块汇总到主进程的同一个fountain sink，分散在多帧里的文件也能完整解出
+"""
+
+import glob
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+import cimbar_native
+from cimbar_session import CimbarDecodeSession
+
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp'}
+
+
+def expand_inputs(inputs):
+    """把目录、通配符和 @文件列表 展开成图像路径列表（保持顺序，去重）"""
+    paths = []
+    for item in inputs:
+        if item.startswith('@'):
+            # 文件列表：每行一个路径，忽略空行和#注释
+            with open(item[1:], encoding='utf-8') as f:
+                lines = [line.strip() for line in f]
+            paths += expand_inputs([line for line in lines if line and not line.startswith('#')])
+        elif os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths += [os.path.join(root, name) for name in sorted(files)
+                          if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+        elif glob.has_magic(item):
+            paths += sorted(glob.glob(item, recursive=True))
+        else:
+            paths.append(item)
+    return list(dict.fromkeys(paths))
+
+
+def read_file(path):
+    """在I/O线程中读取文件内容，读取失败返回None"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+class BatchReport:
+    """批量解码的吞吐量统计"""
+
+    def __init__(self):
+        self.frames = 0
+        self.unreadable = 0
+        self.decoded_frames = 0
+        self.decoded_bytes = 0
+        self.input_bytes = 0
+        self.files = []
+        self.start_time = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.start_time
+        return self
+
+    @property
+    def frames_per_second(self):
+        return self.frames / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.decoded_bytes / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return [
+            f"  总时长: {self.elapsed:.1f}秒",
+            f"  处理帧数: {self.frames}（无法读取: {self.unreadable}，解出数据: {self.decoded_frames}）",
+            f"  解码数据: {self.decoded_bytes} 字节",
+            f"  完成文件: {len(self.files)}",
+            f"  吞吐量: {self.frames_per_second:.1f} 帧/秒, {self.bytes_per_second / 1024:.1f} KB/秒"
+            f"（读取 {self.input_bytes / self.elapsed / 1048576 if self.elapsed else 0:.1f} MB/秒）",
+        ]
+
+
+# 进程池中每个进程各自的解码会话（只用来解出fountain块，不写文件）
+_worker_decoder = None
+
+
+def init_worker(color_bits, ecc, legacy_mode, no_deskew, preprocess):
+    """进程池初始化函数：在子进程中创建解码会话"""
+    global _worker_decoder
+    # 子进程之间不需要再并行，避免OpenCV线程池和进程池互相争抢CPU
+    cv2.setNumThreads(1)
+    _worker_decoder = cimbar_native.Decoder(tempfile.gettempdir(), color_bits, ecc, legacy_mode,
+                                            no_deskew=no_deskew, preprocess=preprocess)
+
+
+def worker_decode(image):
+    """在子进程中解码一帧（BGR），返回该帧的fountain块"""
+    return _worker_decoder.decode_chunks(image)
+
+
+def _decode_worker(data):
+    """在子进程中解码一帧图像文件，图像无法解码时返回None"""
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    return worker_decode(image)
+
+
+class BatchDecoder:
+    """并行批量解码
+
+    jobs: 解码进程数（默认CPU核数）
+    io_threads / prefetch: 读文件的线程数和最多预读的文件数
+    no_deskew: 录制的画面一般包含背景，默认先用Extractor提取再解码
+    没有libcimbar_py时退回到单个常驻cimbar进程顺序解码（仍然共享一个fountain sink）。
+    """
+
+    def __init__(self, output_dir, jobs=None, io_threads=4, prefetch=None, cimbar_path="./cimbar",
+                 use_native=True, color_bits=-1, ecc=-1, legacy_mode=False, no_deskew=False, preprocess=-1):
+        self.output_dir = output_dir
+        self.jobs = max(1, jobs or os.cpu_count() or 1)
+        self.io_threads = max(1, io_threads)
+        self.prefetch = prefetch or self.jobs * 4
+        self.cimbar_path = cimbar_path
+        self.use_native = use_native and cimbar_native.is_available()
+        self.color_bits = color_bits
+        self.ecc = ecc
+        self.legacy_mode = legacy_mode
+        self.no_deskew = no_deskew
+        self.preprocess = preprocess
+
+    def run(self, paths, on_file=None):
+        """解码所有路径，返回BatchReport；每完成一个文件调用 on_file(path)"""
+        report = BatchReport()
+        on_file = on_file or (lambda path: None)
+        if self.use_native:
+            self._run_parallel(paths, report, on_file)
+        else:
+            self._run_sequential(paths, report, on_file)
+        return report.finish()
+
+    def _prefetched(self, paths):
+        """按顺序产出 (path, 文件内容)，后面的文件已经在I/O线程中读取"""
+        with ThreadPoolExecutor(self.io_threads, thread_name_prefix="cimbar-read") as io:
+            pending = deque()
+            for path in paths:
+                pending.append((path, io.submit(read_file, path)))
+                if len(pending) >= self.prefetch:
+                    path, future = pending.popleft()
+                    yield path, future.result()
+            while pending:
+                path, future = pending.popleft()
+                yield path, future.result()
+
+    def _run_parallel(self, paths, report, on_file):
+        sink = cimbar_native.Decoder(self.output_dir, self.color_bits, self.ecc, self.legacy_mode)
+        initargs = (self.color_bits, self.ecc, self.legacy_mode, self.no_deskew, self.preprocess)
+
+        def collect(futures):
+            for future in futures:
+                chunks = future.result()
+                report.frames += 1
+                if chunks is None:
+                    report.unreadable += 1
+                    continue
+                if not chunks:
+                    continue
+                report.decoded_frames += 1
+                result = sink.feed_chunks(chunks)
+                report.decoded_bytes += result.bytes
+                for path in result.new_files:
+                    report.files.append(path)
+                    on_file(path)
+
+        try:
+            with ProcessPoolExecutor(self.jobs, initializer=init_worker, initargs=initargs) as pool:
+                inflight = set()
+                for path, data in self._prefetched(paths):
+                    if data is None:
+                        report.frames += 1
+                        report.unreadable += 1
+                        continue
+                    report.input_bytes += len(data)
+                    inflight.add(pool.submit(_decode_worker, data))
+                    # 限制在途帧数，预读不会把整个归档读进内存
+                    if len(inflight) >= self.jobs * 2:
+                        done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                        collect(done)
+                collect(wait(inflight).done)
+        finally:
+            sink.close()
+
+    def _run_sequential(self, paths, report, on_file):
+        with CimbarDecodeSession(self.cimbar_path, self.output_dir, no_deskew=self.no_deskew) as session:
+            for path in paths:
+                report.frames += 1
+                if not os.path.isfile(path):
+                    report.unreadable += 1
+                    continue
+                report.input_bytes += os.path.getsize(path)
+                nbytes, new_files = session.decode_file(path)
+                if nbytes > 0:
+                    report.decoded_frames += 1
+                    report.decoded_bytes += nbytes
+                # cimbar输出的是 输出目录/文件名
+                for done in new_files:
+                    report.files.append(done)
+                    on_file(done)
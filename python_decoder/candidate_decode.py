@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Candidate Decode - 多个候选区域的并行解码
+检测器返回按可信度排序的候选区域，但最可信的不一定是码（例如比码更大的窗口边框、播放器外框）。
+CandidateMemory记住最近解码成功的候选区域位置，之后的帧先尝试与它重合的候选；
+CandidateDecoder每帧并行解码排名前K的候选（每个工作线程有自己的libcimbar_py会话，只提取fountain块），
+有数据的候选的块再写入主会话的fountain sink，多试几个候选不增加串行延迟。
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def bbox_iou(a, b):
+    """两个 (x, y, w, h) 的交并比"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class CandidateMemory:
+    """最近解码成功的候选区域（捕获源坐标），线程安全（检测线程排序，解码线程记录结果）
+
+    min_iou: 候选与记住的区域交并比不低于它时视为同一位置
+    max_entries: 最多记住的位置数（同时有多个码时各占一个）
+    max_misses: 连续这么多次解码失败后忘掉这个位置
+    """
+
+    def __init__(self, min_iou=0.5, max_entries=4, max_misses=10):
+        self.min_iou = min_iou
+        self.max_entries = max_entries
+        self.max_misses = max_misses
+        self.entries = []  # [bbox, 成功次数, 连续失败次数, 最近成功时间]
+        self._lock = threading.Lock()
+
+    def _match(self, bbox):
+        best, best_iou = None, self.min_iou
+        for entry in self.entries:
+            iou = bbox_iou(entry[0], bbox)
+            if iou >= best_iou:
+                best, best_iou = entry, iou
+        return best
+
+    def rank(self, bboxes):
+        """候选的尝试顺序（下标列表）：与成功过的位置重合的在前（成功次数多的优先），其余保持检测器的顺序"""
+        def key(index):
+            entry = self._match(bboxes[index])
+            return (0, -entry[1], index) if entry is not None else (1, 0, index)
+        with self._lock:
+            return sorted(range(len(bboxes)), key=key)
+
+    def success(self, bbox):
+        entry = self._match(bbox)
+        if entry is None:
+            entry = [bbox, 0, 0, 0.0]
+            self.entries.append(entry)
+        # 码可能在轻微移动，记住最新的位置
+        entry[0] = bbox
+        entry[1] += 1
+        entry[2] = 0
+        entry[3] = time.time()
+        if len(self.entries) > self.max_entries:
+            self.entries.sort(key=lambda e: e[3], reverse=True)
+            del self.entries[self.max_entries:]
+
+    def failure(self, bboxes):
+        """一帧的候选都没有解出数据：与它们重合的位置各记一次失败"""
+        for entry in {id(e): e for e in map(self._match, bboxes) if e is not None}.values():
+            entry[2] += 1
+            if entry[2] >= self.max_misses:
+                self.entries.remove(entry)
+
+    def record(self, bboxes, hits):
+        """记录一帧的解码结果，hits为有数据的候选下标"""
+        with self._lock:
+            if not hits:
+                self.failure(bboxes)
+            for index in hits:
+                self.success(bboxes[index])
+
+    def clear(self):
+        with self._lock:
+            self.entries = []
+
+
+class CandidateDecoder:
+    """每帧并行解码前k个候选区域（libcimbar_py）
+
+    sink: 主会话cimbar_native.Decoder，所有候选的fountain块都写入它
+    create_worker: 创建工作会话的函数（配置须与sink相同），工作会话只调用decode_chunks()
+    """
+
+    def __init__(self, sink, create_worker, k=3, memory=None):
+        self.sink = sink
+        self.k = max(1, k)
+        self.memory = memory if memory is not None else CandidateMemory()
+        self.workers = [create_worker() for _ in range(self.k)] if self.k > 1 else []
+        self.pool = ThreadPoolExecutor(self.k, thread_name_prefix="cimbar-candidate") if self.k > 1 else None
+        self.attempts = 0
+        self.rescued = 0  # 排名第一的候选没有数据、由其他候选解出数据的帧数
+
+    def decode(self, rois, bboxes):
+        """解码按优先级排序的候选，返回 (解码字节数, 新完成的文件, 数据流进度, 有数据的候选下标)"""
+        rois, bboxes = rois[:self.k], bboxes[:self.k]
+        self.attempts += len(rois)
+        if len(rois) == 1:
+            # 只有一个候选时直接在主会话中解码，省去块的拷贝
+            result = self.sink.decode(rois[0])
+            hits = [0] if result.bytes > 0 else []
+            self.memory.record(bboxes, hits)
+            return result.bytes, result.new_files, self.sink.streams(), hits
+
+        # ctypes调用期间释放GIL，各候选的提取和纠错在工作线程中真正并行
+        futures = [self.pool.submit(worker.decode_chunks, roi) for worker, roi in zip(self.workers, rois)]
+        nbytes, new_files, hits = 0, [], []
+        for index, future in enumerate(futures):
+            chunks = future.result()
+            if not chunks:
+                continue
+            result = self.sink.feed_chunks(chunks)
+            nbytes += result.bytes
+            new_files += result.new_files
+            hits.append(index)
+        if hits and hits[0] > 0:
+            self.rescued += 1
+        self.memory.record(bboxes, hits)
+        return nbytes, new_files, self.sink.streams(), hits
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+        for worker in self.workers:
+            worker.close()
+        self.workers = []
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Capture Backends - 屏幕捕获后端
+MonitorSource / WindowSource通过后端抓取屏幕区域，后端都提供 monitors() / grab(region) / close()：
+
+- xshm: Linux X11的MIT-SHM扩展，X服务器把像素直接写入共享内存，只抓取需要的区域，不经过socket传输
+- mss:  跨平台的mss库（原来的实现）
+
+create_backend('auto') 按开销从低到高选择第一个可用的后端。
+FileSource从磁盘读取图像或视频，按指定帧率提供画面，没有显示器的CI机器上也能测试整条解码流水线。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import mss
+import numpy as np
+
+from roi_tracker import clip_crop
+
+
+class CaptureBackend:
+    """屏幕捕获后端接口
+
+    monitors(): 与mss相同的显示器列表，第0项为整个虚拟屏幕，每项为 {'left', 'top', 'width', 'height'}
+    grab(region): 抓取区域，返回 height x width x 4 的BGRA数组（调用方可以一直持有）
+    后端对象只能在创建它的线程中使用。
+    """
+
+    name = None
+
+    def monitors(self):
+        raise NotImplementedError
+
+    def grab(self, region):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MssBackend(CaptureBackend):
+    name = 'mss'
+
+    def __init__(self):
+        self.sct = mss.mss()
+
+    def monitors(self):
+        return self.sct.monitors
+
+    def grab(self, region):
+        return np.asarray(self.sct.grab(region))
+
+    def close(self):
+        self.sct.close()
+
+
+class _XImage(ctypes.Structure):
+    # <X11/Xlib.h> XImage，只用到bytes_per_line之前的字段
+    _fields_ = [('width', ctypes.c_int), ('height', ctypes.c_int), ('xoffset', ctypes.c_int),
+                ('format', ctypes.c_int), ('data', ctypes.c_void_p), ('byte_order', ctypes.c_int),
+                ('bitmap_unit', ctypes.c_int), ('bitmap_bit_order', ctypes.c_int), ('bitmap_pad', ctypes.c_int),
+                ('depth', ctypes.c_int), ('bytes_per_line', ctypes.c_int), ('bits_per_pixel', ctypes.c_int)]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    # <X11/extensions/XShm.h>
+    _fields_ = [('shmseg', ctypes.c_ulong), ('shmid', ctypes.c_int), ('shmaddr', ctypes.c_void_p),
+                ('readOnly', ctypes.c_int)]
+
+
+class _XErrorEvent(ctypes.Structure):
+    # <X11/Xlib.h>
+    _fields_ = [('type', ctypes.c_int), ('display', ctypes.c_void_p), ('resourceid', ctypes.c_ulong),
+                ('serial', ctypes.c_ulong), ('error_code', ctypes.c_ubyte), ('request_code', ctypes.c_ubyte),
+                ('minor_code', ctypes.c_ubyte)]
+
+
+_XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(_XErrorEvent))
+
+# X错误处理函数是进程全局的，Xlib默认的处理函数打印错误后调用exit()，会直接结束解码器。
+# 与mss相同，安装一个只记录错误的处理函数：XShmBackend的连接上的错误记入_x_errors，由发出请求的线程检查；
+# 其他连接（例如Tk）的错误仍交给原来的处理函数
+_x_errors = {}  # display -> (error_code, request_code, minor_code)
+_x_displays = set()
+_x_handler = None
+_x_previous_handler = None
+_x_handler_lock = threading.Lock()
+
+
+def _on_x_error(display, event):
+    if display in _x_displays:
+        e = event.contents
+        _x_errors[display] = (e.error_code, e.request_code, e.minor_code)
+        return 0
+    if _x_previous_handler:
+        return _x_previous_handler(display, event)
+    return 0
+
+
+def _install_x_error_handler(x11, display):
+    global _x_handler, _x_previous_handler
+    with _x_handler_lock:
+        _x_displays.add(display)
+        if _x_handler is None:
+            _x_handler = _XErrorHandler(_on_x_error)
+            _x_previous_handler = x11.XSetErrorHandler(_x_handler)
+
+
+def _uninstall_x_error_handler(display):
+    with _x_handler_lock:
+        _x_displays.discard(display)
+        _x_errors.pop(display, None)
+
+
+_ZPIXMAP = 2
+_ALL_PLANES = 0xFFFFFFFF
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+
+
+def _load_xlib():
+    """加载libX11 / libXext / libc并声明用到的函数，不可用时抛出OSError"""
+    x11 = ctypes.CDLL(ctypes.util.find_library('X11') or 'libX11.so.6')
+    xext = ctypes.CDLL(ctypes.util.find_library('Xext') or 'libXext.so.6')
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XRootWindow.restype = ctypes.c_ulong
+    x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDefaultVisual.restype = ctypes.c_void_p
+    x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XSetErrorHandler.argtypes = [_XErrorHandler]
+    x11.XSetErrorHandler.restype = _XErrorHandler
+    x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XFree.argtypes = [ctypes.c_void_p]
+
+    xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+    xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                     ctypes.c_char_p, ctypes.POINTER(_XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint]
+    xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+    xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+    xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+    xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage), ctypes.c_int,
+                                  ctypes.c_int, ctypes.c_ulong]
+
+    libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+    libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    libc.shmat.restype = ctypes.c_void_p
+    libc.shmdt.argtypes = [ctypes.c_void_p]
+    libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    return x11, xext, libc
+
+
+class XShmBackend(CaptureBackend):
+    """X11 MIT-SHM区域抓取
+
+    每种区域尺寸对应一个共享内存XImage（跟踪区域时尺寸基本不变，只在第一次抓取时创建），
+    XShmGetImage让X服务器直接写入共享内存，抓取后只做一次复制，返回的数组不会被下一次抓取覆盖。
+    显示器布局沿用mss（只在open时读取一次）。
+    区域超出屏幕（例如窗口被拖出屏幕一部分）时只抓取在屏幕内的部分，其余填0；
+    X错误由记录错误的处理函数接收，抛出异常而不是让Xlib结束进程。
+    """
+
+    name = 'xshm'
+    MAX_IMAGES = 4
+
+    def __init__(self):
+        if not sys.platform.startswith('linux') or not os.environ.get('DISPLAY'):
+            raise OSError("xshm捕获需要Linux X11显示（DISPLAY）")
+        self._x11, self._xext, self._libc = _load_xlib()
+        self._display = self._x11.XOpenDisplay(None)
+        if not self._display:
+            raise OSError("无法连接X服务器")
+        self._images = {}
+        try:
+            if not self._xext.XShmQueryExtension(self._display):
+                raise OSError("X服务器不支持MIT-SHM扩展")
+            screen = self._x11.XDefaultScreen(self._display)
+            self._root = self._x11.XRootWindow(self._display, screen)
+            self._visual = self._x11.XDefaultVisual(self._display, screen)
+            self._depth = self._x11.XDefaultDepth(self._display, screen)
+            self._screen_size = (self._x11.XDisplayWidth(self._display, screen),
+                                 self._x11.XDisplayHeight(self._display, screen))
+            with mss.mss() as sct:
+                self._monitors = [dict(m) for m in sct.monitors]
+            # mss在关闭时恢复它保存的处理函数，所以在它之后安装
+            _install_x_error_handler(self._x11, self._display)
+        except Exception:
+            self.close()
+            raise
+
+    def monitors(self):
+        return self._monitors
+
+    def _image(self, width, height):
+        key = (width, height)
+        entry = self._images.get(key)
+        if entry is not None:
+            return entry
+        if len(self._images) >= self.MAX_IMAGES:
+            # 区域尺寸一直在变（例如窗口被拖动缩放）时只保留最近的几个
+            self._release(*self._images.pop(next(iter(self._images))))
+
+        info = _XShmSegmentInfo()
+        image = self._xext.XShmCreateImage(self._display, self._visual, self._depth, _ZPIXMAP, None,
+                                           ctypes.byref(info), width, height)
+        if not image:
+            raise OSError("XShmCreateImage失败")
+        if image.contents.bits_per_pixel != 32:
+            self._x11.XFree(image)
+            raise OSError(f"不支持的像素格式: {image.contents.bits_per_pixel}位")
+        size = image.contents.bytes_per_line * height
+        info.shmid = self._libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+        if info.shmid < 0:
+            self._x11.XFree(image)
+            raise OSError(ctypes.get_errno(), "shmget失败")
+        info.shmaddr = self._libc.shmat(info.shmid, None, 0)
+        # 先标记删除，进程退出或detach后系统自动回收
+        self._libc.shmctl(info.shmid, _IPC_RMID, None)
+        if info.shmaddr in (None, ctypes.c_void_p(-1).value):
+            self._x11.XFree(image)
+            raise OSError(ctypes.get_errno(), "shmat失败")
+        image.contents.data = info.shmaddr
+        info.readOnly = 0
+        _x_errors.pop(self._display, None)
+        self._xext.XShmAttach(self._display, ctypes.byref(info))
+        self._x11.XSync(self._display, 0)
+        error = _x_errors.pop(self._display, None)
+        if error is not None:
+            # 例如连接的是远程X服务器，无法访问本机的共享内存
+            self._libc.shmdt(info.shmaddr)
+            image.contents.data = None
+            self._x11.XFree(image)
+            raise OSError(f"XShmAttach失败（X错误 {error[0]}）")
+
+        buffer = (ctypes.c_ubyte * size).from_address(info.shmaddr)
+        pixels = np.frombuffer(buffer, np.uint8).reshape(height, image.contents.bytes_per_line)
+        entry = (image, info, pixels[:, :width * 4].reshape(height, width, 4))
+        self._images[key] = entry
+        return entry
+
+    def _release(self, image, info, pixels):
+        self._xext.XShmDetach(self._display, ctypes.byref(info))
+        self._x11.XSync(self._display, 0)
+        self._libc.shmdt(info.shmaddr)
+        # 数据在共享内存中，只释放XImage结构本身
+        image.contents.data = None
+        self._x11.XFree(image)
+
+    def grab(self, region):
+        left, top, width, height = region['left'], region['top'], region['width'], region['height']
+        # 超出根窗口的区域会让XShmGetImage报BadMatch，只抓取与屏幕相交的部分
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(left + width, self._screen_size[0]), min(top + height, self._screen_size[1])
+        if x1 <= x0 or y1 <= y0:
+            return np.zeros((height, width, 4), dtype=np.uint8)
+
+        image, _, pixels = self._image(x1 - x0, y1 - y0)
+        _x_errors.pop(self._display, None)
+        ok = self._xext.XShmGetImage(self._display, self._root, image, x0, y0, _ALL_PLANES)
+        self._x11.XSync(self._display, 0)
+        error = _x_errors.pop(self._display, None)
+        if not ok or error is not None:
+            raise RuntimeError(f"XShmGetImage失败{f'（X错误 {error[0]}）' if error else ''}")
+        if (x0, y0, x1, y1) == (left, top, left + width, top + height):
+            return pixels.copy()
+        frame = np.zeros((height, width, 4), dtype=np.uint8)
+        frame[y0 - top:y1 - top, x0 - left:x1 - left] = pixels
+        return frame
+
+    def close(self):
+        if self._display:
+            for entry in self._images.values():
+                self._release(*entry)
+            self._images.clear()
+            self._x11.XCloseDisplay(self._display)
+            _uninstall_x_error_handler(self._display)
+            self._display = None
+
+
+# 按开销从低到高
+BACKENDS = {
+    'xshm': XShmBackend,
+    'mss': MssBackend,
+}
+
+
+def create_backend(name='auto'):
+    """创建捕获后端；auto时依次尝试BACKENDS中的后端，返回第一个可用的"""
+    if name != 'auto':
+        if name not in BACKENDS:
+            raise ValueError(f"未知的捕获后端: {name}（可选: auto, {', '.join(BACKENDS)}）")
+        return BACKENDS[name]()
+
+    errors = []
+    for backend in BACKENDS.values():
+        try:
+            return backend()
+        except OSError as e:
+            errors.append(f"{backend.name}: {e}")
+    raise RuntimeError("没有可用的捕获后端: " + '; '.join(errors))
+
+
+class FileSource:
+    """从磁盘提供画面的捕获源（接口与MonitorSource相同）
+
+    paths: 图像文件列表，或一个视频文件
+    fps: 画面切换的帧率，模拟按这个帧率播放的发送端：捕获得比它快时重复当前帧，慢时跳过帧；
+         0表示每次grab()都取下一帧（尽可能快）
+    loop: 放完后从头开始，否则grab()抛出EOFError
+    cache_size: 缓存的已解码图像数（图像列表）
+
+    画面在grab()时才读取：视频保持打开，按需顺序读取、跳过或定位，图像文件按需读取并缓存最近几张，
+    长录像也不会一次解码进内存。
+    """
+
+    # 向前跳过不超过这么多帧时逐帧grab()（只解复用不解码），更远或向后时才定位
+    MAX_SKIP = 30
+
+    def __init__(self, paths, fps=0.0, loop=False, cache_size=8):
+        self.paths = list(paths) if not isinstance(paths, str) else [paths]
+        self.fps = fps
+        self.loop = loop
+        self.cache_size = max(1, cache_size)
+        self.capture = None
+        self.count = None  # 画面数，视频的帧数未知时为None（读到结尾才知道）
+        self.position = 0  # 视频下一次read()得到的帧号
+        self.cache = OrderedDict()
+        self.index = 0
+        self.start_time = None
+
+    def open(self):
+        self.cache.clear()
+        if len(self.paths) == 1 and not self._is_image(self.paths[0]):
+            self.capture = cv2.VideoCapture(self.paths[0])
+            if not self.capture.isOpened():
+                raise RuntimeError(f"无法打开视频: {self.paths[0]}")
+            count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.count = count if count > 0 else None
+            self.position = 0
+        else:
+            self.count = len(self.paths)
+        if self.count == 0:
+            raise RuntimeError("没有可以播放的画面")
+        # 先读第一帧，打不开的文件在open()时就报错
+        self._frame(0)
+        self.index = 0
+        self.start_time = time.perf_counter()
+
+    @staticmethod
+    def _is_image(path):
+        return os.path.splitext(path)[1].lower() in {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp'}
+
+    @staticmethod
+    def _read_image(path):
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise RuntimeError(f"无法读取图像: {path}")
+        return image
+
+    def _frame(self, index):
+        """第index个画面，不存在时（视频比报告的帧数短）返回None"""
+        frame = self.cache.get(index)
+        if frame is not None:
+            self.cache.move_to_end(index)
+            return frame
+        frame = self._read_video(index) if self.capture is not None else self._read_image(self.paths[index])
+        if frame is not None:
+            self.cache[index] = frame
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return frame
+
+    def _read_video(self, index):
+        skip = index - self.position
+        if skip < 0 or skip > self.MAX_SKIP:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+        else:
+            for _ in range(skip):
+                if not self.capture.grab():
+                    break
+        self.position = index + 1
+        ok, frame = self.capture.read()
+        return frame if ok else None
+
+    def _next_index(self):
+        if self.fps > 0:
+            index = int((time.perf_counter() - self.start_time) * self.fps)
+        else:
+            index = self.index
+            self.index += 1
+        return index
+
+    def _wrap(self, index):
+        if self.count is not None and index >= self.count:
+            if not self.loop:
+                raise EOFError("画面已全部播放")
+            index %= self.count
+        return index
+
+    def grab(self, crop=None):
+        index = self._wrap(self._next_index())
+        frame = self._frame(index)
+        if frame is None:
+            # 视频在这里结束（帧数未知或不准确），记下实际帧数
+            self.count = index
+            if index == 0:
+                raise RuntimeError("没有可以播放的画面")
+            frame = self._frame(self._wrap(index))
+            if frame is None:
+                raise EOFError("画面已全部播放")
+        if crop is not None:
+            crop = clip_crop(crop, frame.shape[1], frame.shape[0])
+        if crop is None:
+            return frame, (0, 0)
+        x, y, w, h = crop
+        return frame[y:y+h, x:x+w], (x, y)
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+        self.cache.clear()
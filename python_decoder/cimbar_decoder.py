@@ -8,17 +8,28 @@ Cimbar Decoder - 彩色图形矩阵条形码解码器
 import os
 import sys
 import time
-import threading
 import subprocess
 import tempfile
+from collections import deque
 from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import mss
 import cv2
-import numpy as np
 from PIL import Image, ImageTk
 
+import cimbar_native
+from cimbar_session import CimbarDecodeSession, cimbar_executable
+from completion import CompletedIndex
+from detectors import create_detector
+from frame_dedup import FrameDeduplicator
+from perspective import PerspectiveNormalizer
+from pipeline import DecodePipeline, MonitorSource, WindowSource
+from progress import ProgressTracker
+from rate_control import RateController
+from roi_tracker import RoiTracker
+from stage_stats import StageStats
+
 try:
     import pygetwindow as gw
 except ImportError:
@@ -29,22 +40,27 @@ except ImportError:
 class CimbarDecoder:
     """Cimbar解码器主类"""
     
-    def __init__(self, cimbar_path="./cimbar"):
+    def __init__(self, cimbar_path="./cimbar", use_native=True, detector='anchor', normalize=True):
         self.cimbar_path = cimbar_path
+        self.detector = create_detector(detector)
+        # 检测到的区域透视校正到标准网格（解码器使用--no-deskew）
+        self.normalizer = PerspectiveNormalizer() if normalize else None
+        self.use_native = use_native
         self.decoding = False
         self.capture_thread = None
         self.decode_thread = None
         self.output_dir = tempfile.mkdtemp(prefix="cimbar_decode_")
-        self.decoded_files = set()
+        self.completed = CompletedIndex()
         self.last_decode_time = 0
-        self.decode_interval = 0.5  # 解码间隔（秒）
+        self.decode_interval = 0.0  # 最小解码间隔（秒），0表示解码线程空闲即处理最新帧
+        self.progress = ProgressTracker()
+        self.session = None
+        self.native = None
+        self.temp_path = None
         
     def check_cimbar_executable(self):
         """检查cimbar可执行文件是否存在"""
-        if os.name == 'nt':
-            cimbar_exe = self.cimbar_path + '.exe'
-        else:
-            cimbar_exe = self.cimbar_path
+        cimbar_exe = cimbar_executable(self.cimbar_path)
             
         if not os.path.exists(cimbar_exe):
             return False, f"找不到cimbar可执行文件: {cimbar_exe}"
@@ -54,72 +70,96 @@ class CimbarDecoder:
             
         return True, "cimbar可执行文件就绪"
     
+    def get_session(self):
+        """获取常驻解码会话（输出目录变化时重建）"""
+        if self.session is None or self.session.output_dir != self.output_dir:
+            self.close()
+            self.session = CimbarDecodeSession(self.cimbar_path, self.output_dir)
+        return self.session
+    
+    def get_native(self):
+        """获取进程内native解码器（libcimbar_py不可用时返回None）"""
+        if not self.use_native or not cimbar_native.is_available():
+            return None
+        if self.native is None or self.native.output_dir != self.output_dir:
+            if self.native is not None:
+                self.native.close()
+            self.native = cimbar_native.Decoder(self.output_dir)
+        return self.native
+    
+    def close(self):
+        """关闭常驻解码会话"""
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+        if self.native is not None:
+            self.native.close()
+            self.native = None
+        if self.temp_path is not None:
+            try:
+                os.remove(self.temp_path)
+            except OSError:
+                pass
+            self.temp_path = None
+    
     def decode_image(self, image_path):
         """调用cimbar解码图像"""
         try:
-            # 构造命令
-            if os.name == 'nt':
-                cmd = [self.cimbar_path + '.exe']
-            else:
-                cmd = [self.cimbar_path]
-                
-            cmd.extend([image_path, '-o', self.output_dir, '--no-deskew'])
-            
-            # 执行解码
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            # 交给常驻cimbar进程解码，fountain状态在帧之间保留
+            session = self.get_session()
+            nbytes, new_files = session.decode_file(image_path)
             
-            if result.returncode == 0:
-                # 检查是否有新文件生成
-                current_files = set(os.listdir(self.output_dir))
-                new_files = current_files - self.decoded_files
-                self.decoded_files = current_files
-                
-                if new_files:
-                    return True, f"成功解码，新文件: {', '.join(new_files)}"
-                else:
-                    return True, "解码成功（等待更多数据）"
-            else:
-                return False, f"解码失败: {result.stderr}"
+            return self.decode_result(nbytes, new_files, session.streams)
                 
         except Exception as e:
             return False, f"解码错误: {str(e)}"
     
-    def find_cimbar_in_image(self, image):
-        """在图像中查找cimbar码"""
-        # 转换为灰度图
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # 应用自适应阈值
-        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                     cv2.THRESH_BINARY, 11, 2)
-        
-        # 查找轮廓
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    def decode_frame(self, image):
+        """解码内存中的帧（优先进程内native解码，否则写临时PNG交给常驻cimbar进程）"""
+        try:
+            native = self.get_native()
+            if native is not None:
+                result = native.decode(image)
+                return self.decode_result(result.bytes, result.new_files, native.streams())
+        except Exception as e:
+            return False, f"解码错误: {str(e)}"
         
-        # 筛选可能的cimbar码区域
-        for contour in contours:
-            # 计算轮廓面积
-            area = cv2.contourArea(contour)
-            if area < 10000:  # 过滤太小的区域
-                continue
-                
-            # 获取边界框
-            x, y, w, h = cv2.boundingRect(contour)
+        # 每个解码器实例使用自己的临时文件，多个实例同时运行时不会互相覆盖
+        if self.temp_path is None:
+            fd, self.temp_path = tempfile.mkstemp(prefix="cimbar_frame_", suffix=".png")
+            os.close(fd)
+        cv2.imwrite(self.temp_path, image)
+        return self.decode_image(self.temp_path)
+    
+    def decode_result(self, nbytes, new_files, streams=None):
+        """把解码字节数和新文件转换为 (成功, 消息)；streams为解码器报告的数据流进度"""
+        if streams is not None:
+            self.progress.update(streams, new_files)
+        if nbytes > 0:
+            new_files = [os.path.basename(entry.path) for entry in map(self.completed.add, new_files) if entry]
             
-            # 检查宽高比（cimbar码应该接近正方形）
-            aspect_ratio = w / h
-            if 0.8 < aspect_ratio < 1.2:
-                # 提取感兴趣区域
-                roi = image[y:y+h, x:x+w]
-                return True, roi, (x, y, w, h)
-                
-        return False, None, None
+            if new_files:
+                return True, f"成功解码，新文件: {', '.join(new_files)}"
+            else:
+                return True, "解码成功（等待更多数据）"
+        else:
+            return False, "解码失败: 未解出数据"
+    
+    def find_cimbar_in_image(self, image):
+        """在图像中查找cimbar码"""
+        return self.detector.detect(image, self.normalizer)
 
 
 class CimbarDecoderGUI:
-    """图形用户界面"""
+    """图形用户界面
+
+    预览和日志都只在Tk线程中更新：预览按preview_fps定时刷新，复用同一个PhotoImage；
+    其他线程的日志先放进有界队列，由Tk线程批量写入，日志区域最多保留log_lines行。
+    """
+    
+    PREVIEW_SIZE = (600, 400)
     
-    def __init__(self):
+    def __init__(self, preview_fps=15, log_lines=500):
         self.root = tk.Tk()
         self.root.title("Cimbar解码器 - 彩色图形矩阵条形码")
         self.root.geometry("800x600")
@@ -127,12 +167,20 @@ class CimbarDecoderGUI:
         self.decoder = CimbarDecoder()
         self.monitoring = False
         self.capture_source = None
-        self.capture_thread = None
-        self.current_frame = None
+        self.pipeline = None
+        self.rate_controller = None
+        self.stats = None
+        self.preview_interval = max(1, int(1000 / preview_fps))  # 预览刷新间隔（毫秒）
+        self.preview_photo = None
+        self.preview_source = None
+        self.last_detection = None  # (bbox, 时间)，bbox为捕获源坐标
         self.preview_label = None
+        self.log_lines = log_lines
+        self.pending_logs = deque(maxlen=log_lines)
         
         self.setup_ui()
         self.check_dependencies()
+        self.root.after(100, self.flush_logs)
         
     def setup_ui(self):
         """设置用户界面"""
@@ -253,131 +301,120 @@ class CimbarDecoderGUI:
         if not self.source_combo.get():
             messagebox.showwarning("警告", "请先选择捕获源")
             return
+        
+        # 在Tk线程中读取捕获源设置，工作线程不访问Tk控件
+        if self.source_var.get() == "monitor":
+            source = MonitorSource(self.source_combo.current() + 1)
+        else:
+            if gw is None:
+                self.log("错误: 窗口捕获功能不可用")
+                return
+            source = WindowSource(self.source_combo.get())
             
         self.monitoring = True
         self.start_button.config(text="停止监控")
         self.status_var.set("正在监控...")
         self.log(f"开始监控: {self.source_combo.get()}")
         
-        # 启动捕获线程
-        self.capture_thread = threading.Thread(target=self.capture_loop, daemon=True)
-        self.capture_thread.start()
+        # 启动 捕获 → 检测 → 解码 流水线，捕获帧率和解码间隔由RateController按传输状态调整
+        self.stats = StageStats()
+        self.rate_controller = RateController(min_interval=self.decoder.decode_interval)
+        self.pipeline = DecodePipeline(
+            source,
+            detect=self.decoder.find_cimbar_in_image,
+            decode=self.decode_roi,
+            decode_interval=self.decoder.decode_interval,
+            on_error=lambda stage, e: self.log(f"捕获错误: {str(e)}"),
+            dedup=FrameDeduplicator(),
+            tracker=RoiTracker(),
+            stats=self.stats,
+        ).start()
+        self.root.after(self.preview_interval, self.refresh_preview)
         
     def stop_monitoring(self):
         """停止监控"""
         self.monitoring = False
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
         self.start_button.config(text="开始监控")
         self.status_var.set("已停止")
         self.log("停止监控")
         
-    def capture_loop(self):
-        """捕获循环"""
-        with mss.mss() as sct:
-            while self.monitoring:
-                try:
-                    # 捕获屏幕
-                    if self.source_var.get() == "monitor":
-                        # 获取显示器索引
-                        monitor_idx = self.source_combo.current() + 1
-                        if 0 < monitor_idx < len(sct.monitors):
-                            screenshot = sct.grab(sct.monitors[monitor_idx])
-                            image = np.array(screenshot)
-                            # 转换BGRA到BGR
-                            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
-                        else:
-                            self.log("错误: 无效的显示器索引")
-                            break
-                    else:
-                        # 窗口捕获
-                        if gw is None:
-                            self.log("错误: 窗口捕获功能不可用")
-                            break
-                            
-                        window_title = self.source_combo.get()
-                        windows = gw.getWindowsWithTitle(window_title)
-                        if windows:
-                            window = windows[0]
-                            region = {
-                                'left': window.left,
-                                'top': window.top,
-                                'width': window.width,
-                                'height': window.height
-                            }
-                            screenshot = sct.grab(region)
-                            image = np.array(screenshot)
-                            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
-                        else:
-                            self.log(f"错误: 找不到窗口 '{window_title}'")
-                            break
-                    
-                    # 更新预览
-                    self.update_preview(image)
-                    
-                    # 查找并解码cimbar码
-                    current_time = time.time()
-                    if current_time - self.decoder.last_decode_time > self.decoder.decode_interval:
-                        found, roi, bbox = self.decoder.find_cimbar_in_image(image)
-                        if found:
-                            # 保存ROI到临时文件
-                            temp_path = os.path.join(tempfile.gettempdir(), "cimbar_temp.png")
-                            cv2.imwrite(temp_path, roi)
-                            
-                            # 解码
-                            success, message = self.decoder.decode_image(temp_path)
-                            if success:
-                                self.log(f"✓ {message}")
-                            else:
-                                self.log(f"✗ {message}")
-                                
-                            # 清理临时文件
-                            try:
-                                os.remove(temp_path)
-                            except:
-                                pass
-                                
-                            self.decoder.last_decode_time = current_time
-                    
-                    # 控制帧率
-                    time.sleep(0.033)  # 约30 FPS
-                    
-                except Exception as e:
-                    self.log(f"捕获错误: {str(e)}")
-                    break
-                    
-        # 清理
-        self.root.after(0, self.stop_monitoring)
+    def decode_roi(self, roi, bbox):
+        """解码线程：解码检测到的区域，返回是否解出了数据"""
+        self.last_detection = (bbox, time.time())
+        with self.stats.time('decode'):
+            success, message = self.decoder.decode_frame(roi)
+        if success:
+            self.log(f"✓ {message}")
+        else:
+            self.log(f"✗ {message}")
+        return success
     
-    def update_preview(self, image):
-        """更新预览图像"""
+    def refresh_preview(self):
+        """在Tk线程中定时刷新预览（流水线线程不直接更新控件）"""
+        if not self.monitoring or self.pipeline is None:
+            return
+        if not self.pipeline.is_running():
+            # 捕获出错，流水线已停止
+            self.stop_monitoring()
+            return
+        
+        # 传输进行中时提高捕获帧率，画面上没有码或没有新数据时放慢
+        progress = self.decoder.progress
+        self.rate_controller.update(self.pipeline, progress.new_blocks, self.stats.percentile('decode', 50))
+        status = progress.status_line() or f"已完成 {len(progress.completed)} 个文件"
+        self.status_var.set(f"正在监控（{self.rate_controller.describe()}）... {status}")
+        
+        capture = self.pipeline.latest_capture
+        # 没有新捕获的帧时不重画
+        if capture is not None and capture[0] is not self.preview_source:
+            self.preview_source = capture[0]
+            self.update_preview(*capture)
+        self.root.after(self.preview_interval, self.refresh_preview)
+    
+    def update_preview(self, frame, offset=(0, 0)):
+        """更新预览图像：先缩小再转换颜色，叠加检测框和统计信息"""
         try:
             # 调整图像大小以适应预览区域
-            height, width = image.shape[:2]
-            max_width, max_height = 600, 400
-            
-            # 计算缩放比例
+            height, width = frame.shape[:2]
+            max_width, max_height = self.PREVIEW_SIZE
             scale = min(max_width/width, max_height/height, 1.0)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            
-            # 缩放图像
-            resized = cv2.resize(image, (new_width, new_height))
+            size = (max(1, int(width * scale)), max(1, int(height * scale)))
             
-            # 转换为RGB（OpenCV使用BGR）
-            rgb_image = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-            
-            # 转换为PIL图像
+            # 在缩小后的图像上转换颜色（OpenCV使用BGR/BGRA）
+            resized = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            rgb_image = cv2.cvtColor(resized, cv2.COLOR_BGRA2RGB if frame.shape[2] == 4 else cv2.COLOR_BGR2RGB)
+            self.draw_overlay(rgb_image, scale, offset)
             pil_image = Image.fromarray(rgb_image)
             
-            # 转换为PhotoImage
-            photo = ImageTk.PhotoImage(image=pil_image)
-            
-            # 更新标签
-            self.preview_label.configure(image=photo, text="")
-            self.preview_label.image = photo  # 保持引用
+            # 尺寸不变时把像素写入已有的PhotoImage，不再每帧新建
+            if self.preview_photo is None or (self.preview_photo.width(), self.preview_photo.height()) != size:
+                self.preview_photo = ImageTk.PhotoImage(image=pil_image)
+                self.preview_label.configure(image=self.preview_photo, text="")
+            else:
+                self.preview_photo.paste(pil_image)
             
         except Exception as e:
             self.log(f"预览更新错误: {str(e)}")
     
+    def draw_overlay(self, image, scale, offset):
+        """在预览图像上画出最近一秒内的检测框，以及帧率和解码统计"""
+        detection = self.last_detection
+        if detection is not None and time.time() - detection[1] < 1.0:
+            x, y, w, h = detection[0]
+            x, y = (x - offset[0]) * scale, (y - offset[1]) * scale
+            cv2.rectangle(image, (int(x), int(y)), (int(x + w * scale), int(y + h * scale)), (0, 255, 0), 2)
+        
+        pipeline = self.pipeline
+        elapsed = max(time.time() - pipeline.start_time, 1e-3)
+        # Hershey字体只有ASCII字符
+        text = (f"capture {pipeline.captured / elapsed:.1f} fps  decode {pipeline.decoded / elapsed:.1f} fps  "
+                f"files {len(self.decoder.completed)}")
+        cv2.putText(image, text, (8, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 3, cv2.LINE_AA)
+        cv2.putText(image, text, (8, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+    
     def select_output_dir(self):
         """选择输出目录"""
         directory = filedialog.askdirectory(
@@ -401,16 +438,38 @@ class CimbarDecoderGUI:
             messagebox.showwarning("警告", "输出目录不存在")
     
     def log(self, message):
-        """添加日志消息"""
+        """添加日志消息（任何线程都可以调用，由Tk线程写入日志区域）"""
         timestamp = time.strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
+        self.pending_logs.append(f"[{timestamp}] {message}\n")
+    
+    def flush_logs(self):
+        """Tk线程：批量写入排队的日志，超出log_lines的旧行被删除"""
+        if self.pending_logs:
+            lines = []
+            while self.pending_logs:
+                lines.append(self.pending_logs.popleft())
+            self.log_text.insert(tk.END, ''.join(lines))
+            excess = int(self.log_text.index('end-1c').split('.')[0]) - 1 - self.log_lines
+            if excess > 0:
+                self.log_text.delete('1.0', f'{excess + 1}.0')
+            self.log_text.see(tk.END)
+        self.root.after(100, self.flush_logs)
     
     def run(self):
         """运行应用程序"""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.decoder.close()
 
 
 if __name__ == "__main__":
-    app = CimbarDecoderGUI()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Cimbar解码器 - 彩色图形矩阵条形码")
+    parser.add_argument('--preview-fps', type=float, default=15, help='预览刷新帧率（默认：15）')
+    parser.add_argument('--log-lines', type=int, default=500, help='日志区域最多保留的行数（默认：500）')
+    args = parser.parse_args()
+    
+    app = CimbarDecoderGUI(preview_fps=args.preview_fps, log_lines=args.log_lines)
     app.run()
\ No newline at end of file
@@ -8,12 +8,29 @@ import os
 import sys
 import time
 import argparse
-import subprocess
 import tempfile
+import threading
 from pathlib import Path
-import mss
 import cv2
-import numpy as np
+
+import cimbar_native
+from batch_decode import BatchDecoder, BatchReport, expand_inputs
+from candidate_decode import CandidateDecoder, CandidateMemory
+from capture_backends import BACKENDS, FileSource, create_backend
+from cimbar_session import CimbarDecodeSession, cimbar_executable
+from completion import CompletedIndex, CompletionWatcher
+from detectors import DETECTORS, create_detector
+from frame_dedup import FrameDeduplicator
+from frame_record import CODECS, FrameRecorder, RecordingReader, RecordingSource
+from frame_ring import RingDecoder
+from multi_source import MultiSourceDecoder
+from perspective import PerspectiveNormalizer
+from pipeline import DecodePipeline, MonitorSource, WindowSource
+from progress import ProgressTracker, json_line
+from rate_control import RateController
+from roi_tracker import RoiTracker
+from stage_stats import StageStats, StatsExporter
+from video_decode import VideoDecoder, VideoSource, frame_range, open_capture, parse_video_source
 
 try:
     import pygetwindow as gw
@@ -24,19 +41,63 @@ except ImportError:
 class CimbarDecoderCLI:
     """命令行版Cimbar解码器"""
     
-    def __init__(self, cimbar_path="./cimbar", output_dir=None):
+    # 关闭自适应频率时，没有未完成的数据流（已收完当前文件）时降低到的解码间隔（秒）
+    IDLE_DECODE_INTERVAL = 0.5
+    # 流水线从检测器取的候选区域数上限（按成功记录排序后再取前candidates个解码）
+    MAX_CANDIDATES = 8
+    # 监视输出目录时，文件出现后等待解码器认领的时间（秒），超时仍未认领的才是其他实例写入的
+    WATCH_CLAIM_GRACE = 2.0
+    
+    def __init__(self, cimbar_path="./cimbar", output_dir=None, use_native=True, dedup_threshold=None,
+                 track_roi=True, rescan_interval=2.0, detector='anchor', stats_json=None, stats_prometheus=None,
+                 stats_interval=5.0, expect_files=None, progress_json=False, watch_output=False, adaptive=True,
+                 capture_backend='auto', record_path=None, record_codec='png',
+                 candidates=3, normalize=True):
         self.cimbar_path = cimbar_path
+        self.detector = create_detector(detector)
+        # 检测到的区域透视校正到1024x1024标准网格再交给解码器（解码器使用--no-deskew）
+        self.normalizer = PerspectiveNormalizer() if normalize else None
+        self.use_native = use_native
+        self.dedup_threshold = dedup_threshold  # 负数表示关闭重复帧过滤
+        self.track_roi = track_roi
+        self.rescan_interval = rescan_interval
         self.output_dir = output_dir or tempfile.mkdtemp(prefix="cimbar_decode_")
-        self.decoded_files = set()
+        # 完成的文件由解码器报告；watch_output时另外监视输出目录（其他解码器写入的文件）
+        self.completed = CompletedIndex()
+        self.watch_output = watch_output
+        self.watched_pending = {}  # 监视到、还没报告的文件 -> 出现的时间
+        self._watch_lock = threading.Lock()
+        # 按检测命中率、新块数、解码耗时和CPU占用自动调整捕获帧率和解码间隔
+        self.adaptive = adaptive
+        # 屏幕捕获后端（见capture_backends.py），auto按开销从低到高选择
+        self.capture_backend = capture_backend
+        # --record: 录制流水线捕获到的帧，之后用 --replay 在相同的画面上复现
+        self.record_path = record_path
+        self.record_codec = record_codec
+        # 每帧解码排名前几的候选区域，成功过的位置排在前面
+        self.candidates = max(1, candidates)
+        self.candidate_memory = CandidateMemory()
+        self.candidate_decoder = None
         self.frame_count = 0
         self.decode_count = 0
+        self.session = None
+        self.native = None
+        self.temp_path = None
+        self.ring_decoder = None
+        # 当前流水线 / 回放的重复帧过滤器；解码子进程的结果异步返回，按帧序号记下待定的哈希
+        self.dedup = None
+        self.pending_hashes = {}
+        # 各阶段耗时和计数，--stats-json / --stats-prom 定期导出
+        self.stats = StageStats()
+        for name in ('blocks', 'decoded_bytes', 'files', 'candidate_rescues'):
+            self.stats.count(name, 0)
+        self.stats_exporter = StatsExporter(self.stats, stats_json, stats_prometheus, stats_interval)
+        # fountain进度：每个文件的百分比和ETA，--progress-json 时逐行输出事件
+        self.progress = ProgressTracker(expect_files, on_event=self.print_event if progress_json else None)
         
     def check_cimbar_executable(self):
         """检查cimbar可执行文件"""
-        if os.name == 'nt':
-            cimbar_exe = self.cimbar_path + '.exe'
-        else:
-            cimbar_exe = self.cimbar_path
+        cimbar_exe = cimbar_executable(self.cimbar_path)
             
         if not os.path.exists(cimbar_exe):
             return False, f"找不到cimbar可执行文件: {cimbar_exe}"
@@ -46,152 +107,382 @@ class CimbarDecoderCLI:
             
         return True, "cimbar可执行文件就绪"
     
+    def get_session(self):
+        """获取常驻解码会话（输出目录变化时重建）"""
+        if self.session is None or self.session.output_dir != self.output_dir:
+            self.close()
+            self.session = CimbarDecodeSession(self.cimbar_path, self.output_dir)
+        return self.session
+    
+    def get_native(self):
+        """获取进程内native解码器（libcimbar_py不可用时返回None）"""
+        if not self.use_native or not cimbar_native.is_available():
+            return None
+        if self.native is None or self.native.output_dir != self.output_dir:
+            if self.native is not None:
+                self.native.close()
+            self.native = cimbar_native.Decoder(self.output_dir)
+        return self.native
+    
+    def get_candidate_decoder(self):
+        """获取多候选并行解码器（共享native解码器的fountain sink，libcimbar_py不可用时返回None）"""
+        native = self.get_native()
+        if native is None:
+            return None
+        if self.candidate_decoder is None or self.candidate_decoder.sink is not native:
+            if self.candidate_decoder is not None:
+                self.candidate_decoder.close()
+            self.candidate_decoder = CandidateDecoder(native, lambda: cimbar_native.Decoder(self.output_dir),
+                                                      self.candidates, self.candidate_memory)
+        return self.candidate_decoder
+    
+    def close(self):
+        """关闭常驻解码会话"""
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+        if self.candidate_decoder is not None:
+            self.candidate_decoder.close()
+            self.candidate_decoder = None
+        if self.native is not None:
+            self.native.close()
+            self.native = None
+        if self.temp_path is not None:
+            try:
+                os.remove(self.temp_path)
+            except OSError:
+                pass
+            self.temp_path = None
+        if self.ring_decoder is not None:
+            self.ring_decoder.close()
+            self.ring_decoder = None
+    
+    def start_decode_process(self, slots=4):
+        """启动解码子进程，帧通过共享内存环形缓冲区传递"""
+        self.ring_decoder = RingDecoder(self.cimbar_path, self.output_dir, slots=slots,
+                                        use_native=self.use_native).start()
+    
+    def handle_roi(self, roi, verbose=False, bbox=None):
+        """解码检测到的区域：交给解码子进程（异步）或在当前线程解码；roi和bbox为列表时是多个候选区域
+
+        在当前线程解码时返回是否解出了数据；交给解码子进程时结果还不知道，返回None，
+        结果返回后由这里把解出数据的帧记入重复帧过滤
+        """
+        if isinstance(roi, list) and self.ring_decoder is None:
+            success, message = self.decode_candidates(roi, bbox, verbose)
+            self.report_decode(success, message, verbose)
+            return success
+        if isinstance(roi, list):
+            # 解码子进程每帧只接收一个区域
+            roi = roi[0]
+        if self.ring_decoder is None:
+            success, message = self.decode_frame(roi, verbose)
+            self.report_decode(success, message, verbose)
+            return success
+        
+        # 解码跟不上时环形缓冲区会丢弃最旧的帧
+        with self.stats.time('handoff'):
+            seq = self.ring_decoder.submit(roi)
+        if seq is not None and self.dedup is not None:
+            self.pending_hashes[seq] = self.dedup.last_hash
+        for seq, nbytes, new_files, streams in self.ring_decoder.poll():
+            dedup_hash = self.take_pending_hash(seq)
+            if nbytes < 0:
+                self.report_decode(False, f"解码错误: {new_files}", verbose)
+            else:
+                if nbytes > 0 and dedup_hash is not None and self.dedup is not None:
+                    self.dedup.record(dedup_hash)
+                with self.stats.time('discover'):
+                    result = self.decode_result(nbytes, new_files, streams)
+                self.report_decode(*result, verbose)
+        return None
+    
+    def take_pending_hash(self, seq):
+        """取出第seq帧提交时的哈希；更早的帧已被环形缓冲区丢弃，不会再有结果，一起清掉"""
+        for key in [key for key in self.pending_hashes if key < seq]:
+            del self.pending_hashes[key]
+        return self.pending_hashes.pop(seq, None)
+    
+    def report_decode(self, success, message, verbose=False):
+        """输出一次解码结果"""
+        if success:
+            self.decode_count += 1
+            print(f"[{time.strftime('%H:%M:%S')}] ✓ {message}")
+        elif verbose:
+            print(f"[{time.strftime('%H:%M:%S')}] ✗ {message}")
+    
+    def on_watched_file(self, path):
+        """监视线程：输出目录中出现了sink输出文件
+
+        本进程写入的文件要等这一帧解码返回（#frame应答）后才由解码器报告，inotify的通知可能先到，
+        所以这里只记下，由flush_watched()报告宽限期过后仍没有被解码器认领的文件（例如由其他cimbar实例写入）
+        """
+        with self._watch_lock:
+            self.watched_pending.setdefault(path, time.monotonic())
+    
+    def flush_watched(self, grace=None):
+        """报告监视到、超过宽限期仍未被解码器认领的文件"""
+        grace = self.WATCH_CLAIM_GRACE if grace is None else grace
+        now = time.monotonic()
+        with self._watch_lock:
+            due = [path for path, seen in self.watched_pending.items() if now - seen >= grace]
+            for path in due:
+                del self.watched_pending[path]
+        for path in due:
+            if self.completed.add(path):
+                self.stats.count('files')
+                print(f"\n[{time.strftime('%H:%M:%S')}] ✓ 输出目录出现新文件: {os.path.basename(path)}")
+    
+    def print_event(self, event):
+        """以JSON行输出进度事件"""
+        print(json_line(event), flush=True)
+    
     def decode_image(self, image_path, verbose=False):
         """解码图像"""
         try:
-            # 构造命令
-            if os.name == 'nt':
-                cmd = [self.cimbar_path + '.exe']
-            else:
-                cmd = [self.cimbar_path]
-                
-            cmd.extend([image_path, '-o', self.output_dir, '--no-deskew'])
-            
+            session = self.get_session()
             if verbose:
-                print(f"执行命令: {' '.join(cmd)}")
+                print(f"解码: {image_path} (cimbar会话: {' '.join(session.command())})")
             
-            # 执行解码
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            # 交给常驻cimbar进程解码，fountain状态在帧之间保留
+            with self.stats.time('decode'):
+                nbytes, new_files = session.decode_file(image_path)
             
-            if result.returncode == 0:
-                # 检查新文件
-                current_files = set(os.listdir(self.output_dir))
-                new_files = current_files - self.decoded_files
-                self.decoded_files = current_files
-                
-                if new_files:
-                    return True, f"成功解码，新文件: {', '.join(new_files)}"
-                else:
-                    return True, "解码成功（等待更多数据）"
-            else:
-                return False, f"解码失败: {result.stderr}"
+            with self.stats.time('discover'):
+                return self.decode_result(nbytes, new_files, session.streams)
                 
         except Exception as e:
             return False, f"解码错误: {str(e)}"
     
+    def decode_frame(self, image, verbose=False):
+        """解码内存中的帧（优先进程内native解码，否则写临时PNG交给常驻cimbar进程）"""
+        try:
+            native = self.get_native()
+            if native is not None:
+                with self.stats.time('decode'):
+                    result = native.decode(image)
+                if result.bytes > 0:
+                    self.stats.count('blocks', result.bytes // native.chunk_size())
+                with self.stats.time('discover'):
+                    return self.decode_result(result.bytes, result.new_files, native.streams())
+        except Exception as e:
+            return False, f"解码错误: {str(e)}"
+        
+        with self.stats.time('handoff'):
+            path = self.write_temp_frame(image)
+        return self.decode_image(path, verbose)
+    
+    def decode_candidates(self, rois, bboxes, verbose=False):
+        """解码按优先级排序的候选区域：libcimbar_py时并行解码前candidates个，否则依次尝试直到解出数据"""
+        rois, bboxes = rois[:self.candidates], bboxes[:self.candidates]
+        try:
+            decoder = self.get_candidate_decoder()
+            if decoder is not None:
+                with self.stats.time('decode'):
+                    nbytes, new_files, streams, hits = decoder.decode(rois, bboxes)
+                if nbytes > 0:
+                    self.stats.count('blocks', nbytes // self.native.chunk_size())
+                if hits and hits[0] > 0:
+                    self.stats.count('candidate_rescues')
+                with self.stats.time('discover'):
+                    return self.decode_result(nbytes, new_files, streams)
+        except Exception as e:
+            return False, f"解码错误: {str(e)}"
+        
+        # 常驻cimbar进程只有一个fountain sink，不能并行
+        for index, roi in enumerate(rois):
+            success, message = self.decode_frame(roi, verbose)
+            if success:
+                self.candidate_memory.record(bboxes, [index])
+                if index > 0:
+                    self.stats.count('candidate_rescues')
+                return success, message
+        self.candidate_memory.record(bboxes, [])
+        return success, message
+    
+    def write_temp_frame(self, image):
+        """把帧写入本实例的临时PNG，返回路径"""
+        # 每个解码器实例使用自己的临时文件，多个实例同时运行时不会互相覆盖
+        if self.temp_path is None:
+            fd, self.temp_path = tempfile.mkstemp(prefix="cimbar_frame_", suffix=".png")
+            os.close(fd)
+        cv2.imwrite(self.temp_path, image)
+        return self.temp_path
+    
+    def decode_result(self, nbytes, new_files, streams=None):
+        """把解码字节数和新文件转换为 (成功, 消息)；streams为解码器报告的数据流进度"""
+        if streams is not None:
+            self.progress.update(streams, new_files)
+        if nbytes > 0:
+            new_files = [os.path.basename(entry.path) for entry in map(self.completed.add, new_files) if entry]
+            self.stats.count('decoded_bytes', nbytes)
+            self.stats.count('files', len(new_files))
+            
+            if new_files:
+                return True, f"成功解码，新文件: {', '.join(new_files)}"
+            else:
+                return True, "解码成功（等待更多数据）"
+        else:
+            return False, "解码失败: 未解出数据"
+    
     def find_cimbar_in_image(self, image):
         """在图像中查找cimbar码"""
-        # 转换为灰度图
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return self.detector.detect(image, self.normalizer)
+    
+    def find_candidates(self, image):
+        """在图像中查找cimbar码的候选区域，返回 (found, rois, bboxes)（按检测器的可信度排序）"""
+        return self.detector.detect_all(image, self.MAX_CANDIDATES, self.normalizer)
+    
+    def detect_function(self):
+        """流水线使用的检测函数：candidates大于1时返回所有候选"""
+        return self.find_candidates if self.candidates > 1 else self.find_cimbar_in_image
+    
+    def create_deduplicator(self):
+        """创建重复帧过滤器（dedup_threshold为负数时返回None）"""
+        if self.dedup_threshold is not None and self.dedup_threshold < 0:
+            return None
+        return FrameDeduplicator(threshold=self.dedup_threshold)
+    
+    def run_pipeline(self, source, duration=None, interval=0.0, verbose=False, fps=60.0, detect_workers=1,
+                     adaptive=None):
+        """运行 捕获 → 检测 → 解码 流水线，直到超时、出错或用户中断
+
+        adaptive: 是否按传输状态自动调整捕获帧率和解码间隔，None表示使用构造时的设置（--fixed-rate关闭）
+        """
+        adaptive = self.adaptive if adaptive is None else adaptive
+        def on_error(stage, e):
+            print(f"\n[{stage}] 错误: {str(e)}")
         
-        # 应用自适应阈值
-        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                     cv2.THRESH_BINARY, 11, 2)
+        recorder = None
+        if self.record_path:
+            recorder = FrameRecorder(self.record_path, self.record_codec).start()
         
-        # 查找轮廓
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        self.dedup = self.create_deduplicator()
+        self.pending_hashes.clear()
+        pipeline = DecodePipeline(
+            source,
+            detect=self.detect_function(),
+            decode=lambda roi, bbox: self.handle_roi(roi, verbose, bbox),
+            detect_workers=detect_workers,
+            fps=fps,
+            decode_interval=interval,
+            on_error=on_error,
+            dedup=self.dedup,
+            tracker=RoiTracker(rescan_interval=self.rescan_interval) if self.track_roi else None,
+            stats=self.stats,
+            recorder=recorder,
+            rank=self.candidate_memory.rank if self.candidates > 1 else None,
+        )
         
-        # 筛选可能的cimbar码区域
-        candidates = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area < 10000:
-                continue
-                
-            x, y, w, h = cv2.boundingRect(contour)
-            aspect_ratio = w / h
-            
-            if 0.8 < aspect_ratio < 1.2:
-                roi = image[y:y+h, x:x+w]
-                candidates.append((roi, (x, y, w, h), area))
+        watcher = None
+        if self.watch_output:
+            watcher = CompletionWatcher(self.output_dir, self.on_watched_file).start()
         
-        # 返回最大的候选区域
-        if candidates:
-            candidates.sort(key=lambda x: x[2], reverse=True)
-            return True, candidates[0][0], candidates[0][1]
-            
-        return False, None, None
-    
-    def monitor_screen(self, monitor_index=1, duration=None, interval=0.5, verbose=False):
-        """监控屏幕并解码"""
-        print(f"开始监控显示器 {monitor_index}")
-        print(f"输出目录: {self.output_dir}")
-        print("按 Ctrl+C 停止监控\n")
+        # --fps / --rate 是自适应调整的上限 / 下限
+        controller = RateController(max_fps=fps, min_interval=interval) if adaptive else None
         
         start_time = time.time()
-        last_decode_time = 0
-        
-        with mss.mss() as sct:
-            if monitor_index >= len(sct.monitors):
-                print(f"错误: 显示器索引 {monitor_index} 无效")
-                return
+        pipeline.start()
+        self.stats_exporter.start()
+        try:
+            while not pipeline.wait(0.5):
+                # 检查是否超时
+                if duration and (time.time() - start_time) > duration:
+                    print("\n监控时间已到")
+                    break
                 
-            monitor = sct.monitors[monitor_index]
-            print(f"监控区域: {monitor['width']}x{monitor['height']}")
-            
-            try:
-                while True:
-                    # 检查是否超时
-                    if duration and (time.time() - start_time) > duration:
-                        print("\n监控时间已到")
-                        break
-                    
-                    # 捕获屏幕
-                    screenshot = sct.grab(monitor)
-                    image = np.array(screenshot)
-                    image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
-                    
-                    self.frame_count += 1
-                    
-                    # 控制解码频率
-                    current_time = time.time()
-                    if current_time - last_decode_time < interval:
-                        continue
-                    
-                    # 查找并解码
-                    found, roi, bbox = self.find_cimbar_in_image(image)
-                    if found:
-                        # 保存到临时文件
-                        temp_path = os.path.join(tempfile.gettempdir(), "cimbar_temp.png")
-                        cv2.imwrite(temp_path, roi)
-                        
-                        # 解码
-                        success, message = self.decode_image(temp_path, verbose)
-                        if success:
-                            self.decode_count += 1
-                            print(f"[{time.strftime('%H:%M:%S')}] ✓ {message}")
-                        elif verbose:
-                            print(f"[{time.strftime('%H:%M:%S')}] ✗ {message}")
-                        
-                        # 清理临时文件
-                        try:
-                            os.remove(temp_path)
-                        except:
-                            pass
-                            
-                        last_decode_time = current_time
-                    
-                    # 显示统计信息
-                    if self.frame_count % 30 == 0:
-                        elapsed = time.time() - start_time
-                        fps = self.frame_count / elapsed
-                        print(f"\r帧数: {self.frame_count}, 解码次数: {self.decode_count}, FPS: {fps:.1f}", end="")
-                    
-                    time.sleep(0.033)  # 约30 FPS
-                    
-            except KeyboardInterrupt:
-                print("\n\n用户中断")
-            
+                # 预期的文件都已完成，停止捕获
+                if self.progress.done:
+                    print(f"\n已完成预期的 {self.progress.expected_files} 个文件")
+                    break
+                
+                if watcher is not None:
+                    self.flush_watched()
+                
+                if controller is not None:
+                    controller.update(pipeline, self.progress.new_blocks, self.stats.percentile('decode', 50))
+                else:
+                    # 当前文件都已收完时降低解码频率，出现新的数据流后恢复
+                    pipeline.decode_interval = (max(interval, self.IDLE_DECODE_INTERVAL) if self.progress.idle
+                                                else interval)
+                
+                # 显示统计信息：捕获帧率和真正解码的帧率，以及每个未完成文件的进度
+                elapsed = time.time() - start_time
+                status = self.progress.status_line()
+                if controller is not None:
+                    status = f"{controller.describe()} {status}".rstrip()
+                print(f"\r帧数: {pipeline.captured}, 检测: {pipeline.detected}, "
+                      f"解码次数: {self.decode_count}, 重复: {pipeline.deduplicated}, 丢帧: {pipeline.dropped}, "
+                      f"捕获FPS: {pipeline.captured / elapsed:.1f}, 解码FPS: {pipeline.decoded / elapsed:.1f}"
+                      f"{f' | {status}' if status else ''}", end="")
+                
+        except KeyboardInterrupt:
+            print("\n\n用户中断")
+        finally:
+            pipeline.stop()
+            self.stats_exporter.stop()
+            if watcher is not None:
+                watcher.stop()
+                # 流水线已停止，不会再有解码器认领文件，剩下的都按其他实例写入的报告
+                self.flush_watched(grace=0)
+            if recorder is not None:
+                recorder.close()
+        
+        self.frame_count += pipeline.captured
+        
         # 显示统计
         elapsed = time.time() - start_time
         print(f"\n\n监控统计:")
         print(f"  总时长: {elapsed:.1f}秒")
-        print(f"  处理帧数: {self.frame_count}")
+        print(f"  处理帧数: {pipeline.captured}")
+        print(f"  检测到cimbar码: {pipeline.detected}")
+        print(f"  完成文件: {len(self.completed)}")
         print(f"  解码次数: {self.decode_count}")
-        print(f"  平均FPS: {self.frame_count/elapsed:.1f}")
+        if self.candidates > 1:
+            print(f"  由非首选候选解出数据: {self.stats.counters['candidate_rescues']} 次")
+        print(f"  跳过重复帧: {pipeline.deduplicated}")
+        print(f"  丢弃帧数: {pipeline.dropped}")
+        print(f"  检测耗时: 整帧 {pipeline.detect_ms('full'):.1f}ms × {pipeline.detect_time['full'][0]}, "
+              f"跟踪区域 {pipeline.detect_ms('tracked'):.1f}ms × {pipeline.detect_time['tracked'][0]}")
+        print(f"  平均FPS: 捕获 {pipeline.captured/elapsed:.1f}, 解码 {pipeline.decoded/elapsed:.1f}")
+        self.print_stage_stats()
+        if recorder is not None:
+            print(f"  录制: {recorder.frames} 帧，{recorder.bytes / 1e6:.1f}MB → {self.record_path}"
+                  f"{f'（丢弃 {recorder.dropped} 帧）' if recorder.dropped else ''}"
+                  f"{f'（写入失败: {recorder.error}）' if recorder.error else ''}")
         print(f"\n解码文件保存在: {self.output_dir}")
     
-    def monitor_window(self, window_title, duration=None, interval=0.5, verbose=False):
+    def print_stage_stats(self):
+        """输出各阶段耗时分位数"""
+        print(f"  各阶段耗时 (p50 / p90 / p99 ms):")
+        for stage, summary in self.stats.snapshot()['stages'].items():
+            if summary['count']:
+                print(f"    {stage:<9} {summary['p50_ms']:.1f} / {summary['p90_ms']:.1f} / {summary['p99_ms']:.1f}"
+                      f" × {summary['count']}")
+    
+    def monitor_screen(self, monitor_index=1, duration=None, interval=0.0, verbose=False, fps=60.0, detect_workers=1):
+        """监控屏幕并解码"""
+        print(f"开始监控显示器 {monitor_index}")
+        print(f"输出目录: {self.output_dir}")
+        
+        backend = create_backend(self.capture_backend)
+        try:
+            monitors = backend.monitors()
+            print(f"捕获后端: {backend.name}")
+        finally:
+            backend.close()
+        if monitor_index >= len(monitors):
+            print(f"错误: 显示器索引 {monitor_index} 无效")
+            return
+            
+        monitor = monitors[monitor_index]
+        print(f"监控区域: {monitor['width']}x{monitor['height']}")
+        print("按 Ctrl+C 停止监控\n")
+        
+        self.run_pipeline(MonitorSource(monitor_index, self.capture_backend), duration, interval, verbose,
+                          fps, detect_workers)
+    
+    def monitor_window(self, window_title, duration=None, interval=0.0, verbose=False, fps=60.0, detect_workers=1):
         """监控特定窗口并解码"""
         if gw is None:
             print("错误: pygetwindow未安装，无法使用窗口监控功能")
@@ -214,75 +505,131 @@ class CimbarDecoderCLI:
         print(f"输出目录: {self.output_dir}")
         print("按 Ctrl+C 停止监控\n")
         
-        # 使用屏幕监控的逻辑，但限定在窗口区域
-        start_time = time.time()
-        last_decode_time = 0
+        # 与monitor_screen使用同一条流水线，捕获区域跟随窗口位置
+        self.run_pipeline(WindowSource(window_title, self.capture_backend), duration, interval, verbose,
+                          fps, detect_workers)
+    
+    def play_frames(self, inputs, play_fps=0.0, loop=False, duration=None, interval=0.0, verbose=False,
+                    fps=60.0, detect_workers=1):
+        """把磁盘上的图像或视频当作捕获源，经过与屏幕监控相同的检测/解码流水线"""
+        paths = inputs if len(inputs) == 1 and os.path.isfile(inputs[0]) else expand_inputs(inputs)
+        if not paths:
+            print("错误: 没有找到图像文件")
+            return
+        print(f"播放画面: {len(paths)} 个文件，{f'{play_fps:g}fps' if play_fps > 0 else '尽可能快'}"
+              f"{'，循环' if loop else ''}")
+        print(f"输出目录: {self.output_dir}\n")
+        self.run_pipeline(FileSource(paths, play_fps, loop), duration, interval, verbose, fps, detect_workers)
+    
+    def replay(self, path, fast=False, duration=None, interval=0.0, verbose=False, detect_workers=1):
+        """回放 --record 录制的帧：按原来的节奏经过实时流水线，或fast时逐帧检测和解码"""
+        with RecordingReader(path) as reader:
+            print(f"回放录制: {path}（{len(reader)} 帧，{reader.duration:.1f}秒，{reader.codec}）")
+        print(f"输出目录: {self.output_dir}\n")
+        if not fast:
+            # 与录制时相同的流水线，捕获节奏只由录制的时间戳决定（丢帧、跟踪照常发生）：
+            # 流水线不再按帧率限速，也不自动调整帧率，否则空闲探测的2fps会让回放越来越落后于录制
+            self.run_pipeline(RecordingSource(path), duration, interval, verbose, fps=0, detect_workers=detect_workers,
+                              adaptive=False)
+            return
         
-        with mss.mss() as sct:
-            try:
-                while True:
-                    # 检查是否超时
-                    if duration and (time.time() - start_time) > duration:
-                        print("\n监控时间已到")
-                        break
-                    
-                    # 更新窗口位置（窗口可能被移动）
-                    window = gw.getWindowsWithTitle(window_title)[0]
-                    region = {
-                        'left': window.left,
-                        'top': window.top,
-                        'width': window.width,
-                        'height': window.height
-                    }
-                    
-                    # 捕获窗口
-                    screenshot = sct.grab(region)
-                    image = np.array(screenshot)
-                    image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
-                    
+        # 每一帧都按顺序检测和解码，结果可重复，适合比较各阶段耗时
+        dedup = self.dedup = self.create_deduplicator()
+        self.pending_hashes.clear()
+        detected = skipped = 0
+        start_time = time.perf_counter()
+        self.stats_exporter.start()
+        try:
+            with RecordingReader(path) as reader:
+                for timestamp, frame, offset in reader:
                     self.frame_count += 1
-                    
-                    # 后续处理与monitor_screen相同
-                    current_time = time.time()
-                    if current_time - last_decode_time < interval:
+                    with self.stats.time('convert'):
+                        image = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR) if frame.shape[2] == 4 else frame
+                    with self.stats.time('detect'):
+                        found, roi, bbox = self.detect_function()(image)
+                    if not found:
                         continue
-                    
-                    found, roi, bbox = self.find_cimbar_in_image(image)
-                    if found:
-                        temp_path = os.path.join(tempfile.gettempdir(), "cimbar_temp.png")
-                        cv2.imwrite(temp_path, roi)
-                        
-                        success, message = self.decode_image(temp_path, verbose)
-                        if success:
-                            self.decode_count += 1
-                            print(f"[{time.strftime('%H:%M:%S')}] ✓ {message}")
-                        elif verbose:
-                            print(f"[{time.strftime('%H:%M:%S')}] ✗ {message}")
-                        
-                        try:
-                            os.remove(temp_path)
-                        except:
-                            pass
-                            
-                        last_decode_time = current_time
-                    
-                    if self.frame_count % 30 == 0:
-                        elapsed = time.time() - start_time
-                        fps = self.frame_count / elapsed
-                        print(f"\r帧数: {self.frame_count}, 解码次数: {self.decode_count}, FPS: {fps:.1f}", end="")
-                    
-                    time.sleep(0.033)
-                    
-            except KeyboardInterrupt:
-                print("\n\n用户中断")
-            
-        # 显示统计
-        elapsed = time.time() - start_time
-        print(f"\n\n监控统计:")
-        print(f"  总时长: {elapsed:.1f}秒")
+                    detected += 1
+                    if isinstance(roi, list):
+                        # 与流水线相同：候选换算成录制时的捕获源坐标，按成功记录排序
+                        bbox = [(x + offset[0], y + offset[1], w, h) for x, y, w, h in bbox]
+                        order = self.candidate_memory.rank(bbox)
+                        roi, bbox = [roi[i] for i in order], [bbox[i] for i in order]
+                    if dedup is not None and dedup.is_duplicate(roi[0] if isinstance(roi, list) else roi):
+                        skipped += 1
+                        continue
+                    if self.handle_roi(roi, verbose, bbox) and dedup is not None:
+                        dedup.record(dedup.last_hash)
+                    if self.progress.done:
+                        print(f"\n已完成预期的 {self.progress.expected_files} 个文件")
+                        break
+        except KeyboardInterrupt:
+            print("\n\n用户中断")
+        finally:
+            self.stats_exporter.stop()
+        
+        elapsed = time.perf_counter() - start_time
+        print("\n回放统计:")
+        print(f"  总时长: {elapsed:.1f}秒（{self.frame_count / elapsed if elapsed else 0:.1f} 帧/秒）")
         print(f"  处理帧数: {self.frame_count}")
+        print(f"  检测到cimbar码: {detected}")
+        print(f"  跳过重复帧: {skipped}")
         print(f"  解码次数: {self.decode_count}")
-        print(f"  平均FPS: {self.frame_count/elapsed:.1f}")
+        if self.candidates > 1:
+            print(f"  由非首选候选解出数据: {self.stats.counters['candidate_rescues']} 次")
+        print(f"  完成文件: {len(self.completed)}")
+        self.print_stage_stats()
+        print(f"\n解码文件保存在: {self.output_dir}")
+    
+    def monitor_multi(self, specs, duration=None, fps=60.0, jobs=None, verbose=False):
+        """同时监控多个捕获源，每个源有自己的fountain sink，解码线程按各源的新数据量分配"""
+        def on_result(channel, nbytes, new_files):
+            if nbytes > 0:
+                self.decode_count += 1
+                self.stats.count('decoded_bytes', nbytes)
+            for path in new_files:
+                self.completed.add(path)
+                self.stats.count('files')
+                print(f"\n[{time.strftime('%H:%M:%S')}] ✓ [{channel.name}] 完成文件: {os.path.basename(path)}")
+        
+        def on_error(channel, stage, e):
+            if verbose or stage != 'decode':
+                print(f"\n[{channel.name}/{stage}] 错误: {str(e)}")
+        
+        multi = MultiSourceDecoder(specs, self.output_dir, self.find_cimbar_in_image, workers=jobs,
+                                   cimbar_path=self.cimbar_path, use_native=self.use_native, fps=fps,
+                                   dedup_threshold=self.dedup_threshold, track_roi=self.track_roi,
+                                   rescan_interval=self.rescan_interval, on_result=on_result, on_error=on_error,
+                                   capture_backend=self.capture_backend)
+        print(f"同时监控 {len(multi.channels)} 个捕获源，解码线程数: {multi.scheduler.workers}")
+        for channel in multi.channels:
+            print(f"  {channel.name}: {os.path.join(self.output_dir, channel.name)}")
+        print("按 Ctrl+C 停止监控\n")
+        
+        start_time = time.time()
+        multi.start()
+        try:
+            while multi.is_running():
+                time.sleep(1.0)
+                if duration and (time.time() - start_time) > duration:
+                    print("\n监控时间已到")
+                    break
+                shares = multi.scheduler.shares()
+                print("\r" + ", ".join(f"[{c.name}] 帧 {c.pipeline.captured} 解码 {c.decodes} "
+                                       f"文件 {len(c.completed)} 份额 {shares[c.name]:.0%}"
+                                       for c in multi.channels), end="")
+        except KeyboardInterrupt:
+            print("\n\n用户中断")
+        finally:
+            multi.close()
+        
+        elapsed = time.time() - start_time
+        shares = multi.scheduler.shares()
+        print(f"\n\n监控统计（{elapsed:.1f}秒）:")
+        for c in multi.channels:
+            self.frame_count += c.pipeline.captured
+            print(f"  {c.name}: 捕获 {c.pipeline.captured} 帧, 解码 {c.decodes} 次, 新块 {c.new_blocks}, "
+                  f"完成文件 {len(c.completed)}, 解码时间份额 {shares[c.name]:.0%}, 被替换 {c.replaced}")
         print(f"\n解码文件保存在: {self.output_dir}")
     
     def decode_single_image(self, image_path, verbose=False):
@@ -305,22 +652,108 @@ class CimbarDecoderCLI:
         if not found:
             # 尝试直接解码整个图像
             print("未检测到明显的cimbar码区域，尝试解码整个图像...")
-            success, message = self.decode_image(image_path, verbose)
+            success, message = self.decode_frame(image, verbose)
         else:
-            # 保存ROI并解码
-            temp_path = os.path.join(tempfile.gettempdir(), "cimbar_roi.png")
-            cv2.imwrite(temp_path, roi)
-            success, message = self.decode_image(temp_path, verbose)
-            try:
-                os.remove(temp_path)
-            except:
-                pass
+            # 解码ROI
+            success, message = self.decode_frame(roi, verbose)
         
         if success:
             print(f"✓ {message}")
         else:
             print(f"✗ {message}")
 
+    def decode_batch(self, inputs, jobs=None):
+        """并行解码目录 / 通配符 / 文件列表中的所有图像，所有帧共享一个fountain sink"""
+        paths = expand_inputs(inputs)
+        if not paths:
+            print("错误: 没有找到图像文件")
+            return
+        
+        batch = BatchDecoder(self.output_dir, jobs=jobs, cimbar_path=self.cimbar_path, use_native=self.use_native)
+        print(f"批量解码: {len(paths)} 个文件")
+        print(f"输出目录: {self.output_dir}")
+        if batch.use_native:
+            print(f"解码进程数: {batch.jobs}\n")
+        else:
+            print("libcimbar_py不可用，使用单个cimbar进程顺序解码\n")
+        
+        def on_file(path):
+            self.completed.add(path)
+            print(f"[{time.strftime('%H:%M:%S')}] ✓ 完成文件: {os.path.basename(path)}")
+        
+        report = batch.run(paths, on_file)
+        self.frame_count += report.frames
+        
+        print("\n批量解码统计:")
+        for line in report.summary():
+            print(line)
+        print(f"\n解码文件保存在: {self.output_dir}")
+
+    def decode_video(self, source, start_time=None, end_time=None, step=1, jobs=None, duration=None,
+                     interval=0.0, verbose=False, fps=60.0, detect_workers=1):
+        """解码视频文件（离线并行）或摄像头（实时流水线）"""
+        print(f"输出目录: {self.output_dir}")
+        if isinstance(parse_video_source(source), int):
+            print(f"开始监控摄像头 {source}")
+            print("按 Ctrl+C 停止监控\n")
+            self.run_pipeline(VideoSource(source), duration, interval, verbose, fps, detect_workers)
+            return
+        
+        if not os.path.exists(source):
+            print(f"错误: 文件不存在 {source}")
+            return
+        
+        def on_file(path):
+            self.completed.add(path)
+            print(f"[{time.strftime('%H:%M:%S')}] ✓ 完成文件: {os.path.basename(path)}")
+        
+        if self.use_native and cimbar_native.is_available():
+            video = VideoDecoder(self.output_dir, jobs=jobs, step=step, start_time=start_time, end_time=end_time)
+            segments = video.segments(source)
+            print(f"解码视频: {source}（{len(segments)} 段，{video.jobs} 个进程）\n")
+            report = video.run(source, on_file)
+        else:
+            print(f"解码视频: {source}（libcimbar_py不可用，使用cimbar进程顺序解码）\n")
+            report = self.decode_video_sequential(source, start_time, end_time, step, on_file, verbose)
+        self.frame_count += report.frames
+        
+        print("\n视频解码统计:")
+        for line in report.summary():
+            print(line)
+        print(f"\n解码文件保存在: {self.output_dir}")
+    
+    def decode_video_sequential(self, source, start_time, end_time, step, on_file, verbose=False):
+        """逐帧读取视频并交给常驻cimbar进程解码"""
+        report = BatchReport()
+        report.input_bytes = os.path.getsize(source)
+        cap = open_capture(source)
+        try:
+            start, end = frame_range(cap, start_time, end_time)
+            if start:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            index = start
+            while end is None or index < end:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                report.frames += 1
+                found, roi, bbox = self.find_cimbar_in_image(frame)
+                nbytes, new_files = self.get_session().decode_file(self.write_temp_frame(roi if found else frame))
+                if nbytes > 0:
+                    report.decoded_frames += 1
+                    report.decoded_bytes += nbytes
+                for path in new_files:
+                    report.files.append(path)
+                    on_file(path)
+                for _ in range(step - 1):
+                    cap.grab()
+                index += step
+        except KeyboardInterrupt:
+            print("\n\n用户中断")
+        finally:
+            cap.release()
+        return report.finish()
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -336,6 +769,26 @@ def main():
   解码图像文件:
     %(prog)s --image sample.png
     
+  解码录制的视频（只解码第60-120秒，每2帧取1帧，8个进程并行）:
+    %(prog)s --video capture.mp4 --start 60 --end 120 --frame-step 2 --jobs 8
+    
+  实时解码摄像头0:
+    %(prog)s --video 0
+    
+  批量解码目录、通配符或文件列表（@list.txt）:
+    %(prog)s --batch ./captures "./more/*.png" @list.txt --jobs 8
+    
+  同时监控显示器1、显示器2和远程桌面窗口（每个源各自的输出子目录）:
+    %(prog)s --multi monitor:1 monitor:2 "window:Remote Desktop" --jobs 2
+    
+  在没有显示器的机器上，把录好的画面按30fps循环送入实时解码流水线:
+    %(prog)s --play ./frames --play-fps 30 --loop --time 60
+    
+  录制一次慢的传输，之后在完全相同的帧上复现（按原节奏 / 尽可能快）:
+    %(prog)s --monitor 1 --record slow.cimrec
+    %(prog)s --replay slow.cimrec
+    %(prog)s --replay slow.cimrec --replay-fast --stats-json stats.json
+    
   设置输出目录:
     %(prog)s --monitor 1 --output ./decoded
         """
@@ -349,6 +802,16 @@ def main():
                            help='监控特定窗口标题')
     mode_group.add_argument('-i', '--image', type=str, metavar='PATH',
                            help='解码单个图像文件')
+    mode_group.add_argument('-V', '--video', type=str, metavar='SOURCE',
+                           help='解码视频文件（并行离线解码），数字表示摄像头设备号（实时解码）')
+    mode_group.add_argument('-b', '--batch', type=str, nargs='+', metavar='PATH',
+                           help='并行批量解码：目录、通配符或 @文件列表')
+    mode_group.add_argument('-M', '--multi', type=str, nargs='+', metavar='SOURCE',
+                           help='同时监控多个捕获源：monitor:N、window:标题 或 video:路径')
+    mode_group.add_argument('-R', '--replay', type=str, metavar='PATH',
+                           help='回放 --record 录制的帧，经过检测和解码')
+    mode_group.add_argument('-P', '--play', type=str, nargs='+', metavar='PATH',
+                           help='把图像（目录、通配符、@文件列表）或一个视频文件当作捕获源，经过实时解码流水线')
     
     # 其他参数
     parser.add_argument('-o', '--output', type=str, metavar='DIR',
@@ -357,8 +820,62 @@ def main():
                        help='cimbar可执行文件路径（默认：./cimbar）')
     parser.add_argument('-t', '--time', type=int, metavar='SECONDS',
                        help='监控时长（秒），不指定则持续监控')
-    parser.add_argument('-r', '--rate', type=float, default=0.5,
-                       help='解码间隔（秒）（默认：0.5）')
+    parser.add_argument('-r', '--rate', type=float, default=0.0,
+                       help='最小解码间隔（秒）（默认：0，解码线程空闲即处理最新帧）')
+    parser.add_argument('--fps', type=float, default=60.0,
+                       help='目标捕获帧率，自适应时为最高帧率（默认：60）')
+    parser.add_argument('--capture-backend', choices=['auto'] + sorted(BACKENDS), default='auto',
+                       help='屏幕捕获后端（默认：auto，优先使用X11共享内存）')
+    parser.add_argument('--play-fps', type=float, default=0.0, metavar='FPS',
+                       help='--play 的画面切换帧率（默认：0，每次捕获取下一帧）')
+    parser.add_argument('--loop', action='store_true',
+                       help='--play 放完后从头开始')
+    parser.add_argument('--record', type=str, metavar='PATH',
+                       help='把捕获到的帧和时间戳录制到文件，之后用 --replay 复现')
+    parser.add_argument('--record-codec', choices=sorted(CODECS), default='png',
+                       help='录制编码：png（无损，默认）、raw（无损，不压缩）、jpeg（有损，最小）')
+    parser.add_argument('--replay-fast', action='store_true',
+                       help='--replay 时尽可能快地逐帧检测和解码（默认按录制时的节奏经过实时流水线）')
+    parser.add_argument('--no-normalize', action='store_true',
+                       help='不做透视校正，直接把检测到的轴对齐区域交给解码器')
+    parser.add_argument('--candidates', type=int, default=3, metavar='K',
+                       help='每帧并行解码排名前K的候选区域，解码成功过的位置优先（默认：3，1表示只解码最可信的一个）')
+    parser.add_argument('--fixed-rate', action='store_true',
+                       help='不自动调整捕获帧率和解码间隔，始终使用 --fps 和 --rate')
+    parser.add_argument('--detect-workers', type=int, default=1, metavar='N',
+                       help='检测线程数（默认：1）')
+    parser.add_argument('--detector', choices=sorted(DETECTORS), default='anchor',
+                       help='检测方法：anchor=多尺度定位标记检测，contour=轮廓启发式（默认：anchor）')
+    parser.add_argument('--no-track', action='store_true',
+                       help='不跟踪cimbar码区域，每帧都捕获并扫描整个画面')
+    parser.add_argument('--rescan', type=float, default=2.0, metavar='SECONDS',
+                       help='跟踪时全画面重新扫描的间隔（秒）（默认：2）')
+    parser.add_argument('--dedup-threshold', type=int, metavar='BITS',
+                       help='重复帧判定的汉明距离阈值（默认：16，负数关闭重复帧过滤）')
+    parser.add_argument('--decode-process', action='store_true',
+                       help='在独立子进程中解码，帧通过共享内存传递（监控模式）')
+    parser.add_argument('--no-native', action='store_true',
+                       help='不使用进程内libcimbar_py解码，改用常驻cimbar进程')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N',
+                       help='批量/视频解码的进程数，多源监控的解码线程数（默认：CPU核数）')
+    parser.add_argument('--start', type=float, metavar='SECONDS',
+                       help='视频解码的起始时间（秒）')
+    parser.add_argument('--end', type=float, metavar='SECONDS',
+                       help='视频解码的结束时间（秒）')
+    parser.add_argument('--frame-step', type=int, default=1, metavar='N',
+                       help='视频每N帧解码一帧（默认：1，解码所有帧）')
+    parser.add_argument('--expect-files', type=int, metavar='N',
+                       help='完成N个文件后停止监控（默认：一直监控）')
+    parser.add_argument('--progress-json', action='store_true',
+                       help='以JSON行输出fountain进度事件（每个文件的块数、百分比、ETA和完成事件）')
+    parser.add_argument('--watch-output', action='store_true',
+                       help='监视输出目录（Linux上用inotify），报告其他解码器写入的文件（监控模式）')
+    parser.add_argument('--stats-json', type=str, metavar='PATH',
+                       help='定期把各阶段耗时和计数写入JSON文件（监控模式）')
+    parser.add_argument('--stats-prom', type=str, metavar='PATH',
+                       help='定期写入Prometheus文本格式的统计（供node_exporter textfile collector读取）')
+    parser.add_argument('--stats-interval', type=float, default=5.0, metavar='SECONDS',
+                       help='统计导出间隔（秒）（默认：5）')
     parser.add_argument('-v', '--verbose', action='store_true',
                        help='显示详细信息')
     parser.add_argument('--list-windows', action='store_true',
@@ -378,28 +895,59 @@ def main():
         return 0
     
     # 创建解码器
-    decoder = CimbarDecoderCLI(cimbar_path=args.cimbar, output_dir=args.output)
+    decoder = CimbarDecoderCLI(cimbar_path=args.cimbar, output_dir=args.output,
+                               use_native=not args.no_native,
+                               dedup_threshold=args.dedup_threshold,
+                               track_roi=not args.no_track, rescan_interval=args.rescan,
+                               detector=args.detector, stats_json=args.stats_json,
+                               stats_prometheus=args.stats_prom, stats_interval=args.stats_interval,
+                               expect_files=args.expect_files, progress_json=args.progress_json,
+                               watch_output=args.watch_output, adaptive=not args.fixed_rate,
+                               capture_backend=args.capture_backend, record_path=args.record,
+                               record_codec=args.record_codec, candidates=args.candidates,
+                               normalize=not args.no_normalize)
     
     # 检查cimbar
     success, message = decoder.check_cimbar_executable()
-    if not success:
+    native = decoder.get_native() is not None
+    if not success and not native:
         print(f"错误: {message}")
         return 1
     
     if args.verbose:
-        print(f"✓ {message}")
+        print(f"✓ {'使用进程内libcimbar_py解码' if native else message}")
     
     # 执行相应模式
     try:
+        camera = args.video is not None and isinstance(parse_video_source(args.video), int)
+        if args.decode_process and (args.monitor or args.window or camera):
+            decoder.start_decode_process()
         if args.monitor:
-            decoder.monitor_screen(args.monitor, args.time, args.rate, args.verbose)
+            decoder.monitor_screen(args.monitor, args.time, args.rate, args.verbose,
+                                   args.fps, args.detect_workers)
         elif args.window:
-            decoder.monitor_window(args.window, args.time, args.rate, args.verbose)
+            decoder.monitor_window(args.window, args.time, args.rate, args.verbose,
+                                   args.fps, args.detect_workers)
         elif args.image:
             decoder.decode_single_image(args.image, args.verbose)
+        elif args.video:
+            decoder.decode_video(args.video, args.start, args.end, args.frame_step, args.jobs,
+                                 args.time, args.rate, args.verbose, args.fps, args.detect_workers)
+        elif args.batch:
+            decoder.decode_batch(args.batch, args.jobs)
+        elif args.multi:
+            decoder.monitor_multi(args.multi, args.time, args.fps, args.jobs, args.verbose)
+        elif args.replay:
+            decoder.replay(args.replay, args.replay_fast, args.time, args.rate, args.verbose,
+                           args.detect_workers)
+        elif args.play:
+            decoder.play_frames(args.play, args.play_fps, args.loop, args.time, args.rate, args.verbose,
+                                args.fps, args.detect_workers)
     except Exception as e:
         print(f"\n错误: {str(e)}")
         return 1
+    finally:
+        decoder.close()
     
     return 0
 
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cimbar Native - libcimbar_py的ctypes绑定
+在进程内对NumPy帧执行 Extractor::extract + Decoder::decode_fountain，
+fountain_decoder_sink在帧之间保持，不需要写PNG，也不需要启动cimbar进程。
+Encoder是反方向的编码会话（cimbar_js的configure / encode / next_frame），直接把帧渲染到NumPy数组中
+"""
+
+import ctypes
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+
+DecodeResult = namedtuple('DecodeResult', ['bytes', 'new_files', 'progress'])
+# 一个未完成的数据流：已收到的块数 / 还原文件需要的块数，size为文件字节数
+StreamStatus = namedtuple('StreamStatus', ['slot', 'blocks', 'required', 'size'])
+
+
+class _StreamStatus(ctypes.Structure):
+    _fields_ = [('slot', ctypes.c_uint), ('blocks', ctypes.c_uint),
+                ('blocks_required', ctypes.c_uint), ('size', ctypes.c_uint)]
+
+if os.name == 'nt':
+    _LIB_NAMES = ['cimbar_py.dll', 'libcimbar_py.dll']
+elif sys.platform == 'darwin':
+    _LIB_NAMES = ['libcimbar_py.dylib']
+else:
+    _LIB_NAMES = ['libcimbar_py.so']
+
+_lib = None
+
+
+def _candidate_paths():
+    """libcimbar_py的查找顺序：环境变量、当前目录、dist/lib、build目录"""
+    env = os.environ.get('CIMBAR_NATIVE_LIB')
+    if env:
+        yield env
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    root = os.path.dirname(here)
+    for directory in (here, os.path.join(root, 'dist', 'lib'), os.path.join(root, 'build', 'build', 'src', 'lib', 'cimbar_py')):
+        for name in _LIB_NAMES:
+            yield os.path.join(directory, name)
+    # 交给系统加载器在默认路径中查找
+    yield from _LIB_NAMES
+
+
+def load_library():
+    """加载libcimbar_py，找不到时抛出OSError"""
+    global _lib
+    if _lib is not None:
+        return _lib
+
+    errors = []
+    for path in _candidate_paths():
+        if os.path.isabs(path) and not os.path.exists(path):
+            continue
+        try:
+            lib = ctypes.CDLL(path)
+            break
+        except OSError as e:
+            errors.append(f"{path}: {e}")
+    else:
+        raise OSError("找不到libcimbar_py: " + '; '.join(errors or _LIB_NAMES))
+
+    lib.cimbar_decoder_create.argtypes = [ctypes.c_char_p, ctypes.c_uint, ctypes.c_uint, ctypes.c_int, ctypes.c_int]
+    lib.cimbar_decoder_create.restype = ctypes.c_void_p
+    lib.cimbar_decoder_free.argtypes = [ctypes.c_void_p]
+    lib.cimbar_decoder_free.restype = None
+    lib.cimbar_decoder_decode.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                                          ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int]
+    lib.cimbar_decoder_decode.restype = ctypes.c_int
+    lib.cimbar_decoder_decode_chunks.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                                                 ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                                 ctypes.c_char_p, ctypes.c_uint]
+    lib.cimbar_decoder_decode_chunks.restype = ctypes.c_int
+    lib.cimbar_decoder_feed_chunks.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_uint]
+    lib.cimbar_decoder_feed_chunks.restype = ctypes.c_uint
+    lib.cimbar_decoder_chunk_size.argtypes = [ctypes.c_void_p]
+    lib.cimbar_decoder_chunk_size.restype = ctypes.c_uint
+    lib.cimbar_decoder_next_completed.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_uint]
+    lib.cimbar_decoder_next_completed.restype = ctypes.c_uint
+    lib.cimbar_decoder_num_done.argtypes = [ctypes.c_void_p]
+    lib.cimbar_decoder_num_done.restype = ctypes.c_uint
+    lib.cimbar_decoder_get_progress.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_double), ctypes.c_uint]
+    lib.cimbar_decoder_get_progress.restype = ctypes.c_uint
+    lib.cimbar_decoder_get_streams.argtypes = [ctypes.c_void_p, ctypes.POINTER(_StreamStatus), ctypes.c_uint]
+    lib.cimbar_decoder_get_streams.restype = ctypes.c_uint
+
+    lib.cimbar_encoder_create.argtypes = [ctypes.c_uint, ctypes.c_uint, ctypes.c_int, ctypes.c_int, ctypes.c_int]
+    lib.cimbar_encoder_create.restype = ctypes.c_void_p
+    lib.cimbar_encoder_free.argtypes = [ctypes.c_void_p]
+    lib.cimbar_encoder_free.restype = None
+    lib.cimbar_encoder_encode.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    lib.cimbar_encoder_encode.restype = ctypes.c_int
+    lib.cimbar_encoder_frame_size.argtypes = [ctypes.c_void_p]
+    lib.cimbar_encoder_frame_size.restype = ctypes.c_int
+    lib.cimbar_encoder_next_frame.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+    lib.cimbar_encoder_next_frame.restype = ctypes.c_int
+    lib.cimbar_encoder_skip.argtypes = [ctypes.c_void_p, ctypes.c_uint]
+    lib.cimbar_encoder_skip.restype = ctypes.c_uint
+    lib.cimbar_encoder_blocks_required.argtypes = [ctypes.c_void_p]
+    lib.cimbar_encoder_blocks_required.restype = ctypes.c_uint
+    lib.cimbar_encoder_blocks_per_frame.argtypes = [ctypes.c_void_p]
+    lib.cimbar_encoder_blocks_per_frame.restype = ctypes.c_uint
+
+    _lib = lib
+    return _lib
+
+
+def is_available():
+    """libcimbar_py是否可用"""
+    try:
+        load_library()
+        return True
+    except OSError:
+        return False
+
+
+class Decoder:
+    """进程内cimbar解码会话
+
+    decode() 直接读取NumPy数组的内存（BGR或BGRA，行可以有stride，例如ROI切片），
+    ctypes在调用C函数期间会释放GIL，解码时其他Python线程可以继续捕获。
+    """
+
+    MAX_STREAMS = 8
+    # 一帧的fountain块远小于64KB（4C模式约7.5KB）
+    CHUNK_BUFFER_SIZE = 1 << 16
+
+    def __init__(self, output_dir, color_bits=-1, ecc=-1, legacy_mode=False, compressed=True,
+                 no_deskew=True, preprocess=-1):
+        self._lib = load_library()
+        self.output_dir = output_dir
+        self.no_deskew = no_deskew
+        self.preprocess = preprocess
+        # 负数表示使用cimbar::Config的默认值（C接口把越界值视为默认值）
+        self._handle = self._lib.cimbar_decoder_create(
+            os.fsencode(output_dir), ctypes.c_uint(color_bits & 0xFFFFFFFF), ctypes.c_uint(ecc & 0xFFFFFFFF),
+            int(legacy_mode), int(compressed))
+        if not self._handle:
+            raise RuntimeError("创建cimbar解码器失败")
+        self._name_buffer = ctypes.create_string_buffer(256)
+        self._progress_buffer = (ctypes.c_double * self.MAX_STREAMS)()
+        self._stream_buffer = (_StreamStatus * self.MAX_STREAMS)()
+        self._chunk_buffer = None
+
+    def _check_image(self, image):
+        if self._handle is None:
+            raise RuntimeError("解码器已关闭")
+        if image.ndim != 3 or image.shape[2] not in (3, 4) or image.dtype.itemsize != 1:
+            raise ValueError(f"需要BGR/BGRA uint8图像，实际为 {image.shape} {image.dtype}")
+        # 像素在行内必须连续，行之间可以有任意stride
+        if image.strides[2] != 1 or image.strides[1] != image.shape[2]:
+            raise ValueError("图像行内像素不连续，请先调用 np.ascontiguousarray")
+
+    def decode(self, image):
+        """解码一帧，返回 DecodeResult(解码字节数, 新完成的文件路径, 各数据流进度)"""
+        self._check_image(image)
+        height, width, channels = image.shape
+        nbytes = self._lib.cimbar_decoder_decode(
+            self._handle, image.ctypes.data, width, height, channels, image.strides[0],
+            int(self.no_deskew), self.preprocess)
+        if nbytes < 0:
+            raise ValueError("cimbar_decoder_decode参数无效")
+        return DecodeResult(nbytes, self.take_completed(), self.progress())
+
+    def decode_chunks(self, image):
+        """解码一帧但不写入本会话的fountain sink，返回该帧的原始fountain块（bytes）
+
+        用于多进程解码：各进程只做提取和解码，块交给同一个会话的feed_chunks()汇总。
+        """
+        self._check_image(image)
+        if self._chunk_buffer is None:
+            self._chunk_buffer = ctypes.create_string_buffer(self.CHUNK_BUFFER_SIZE)
+        height, width, channels = image.shape
+        size = self._lib.cimbar_decoder_decode_chunks(
+            self._handle, image.ctypes.data, width, height, channels, image.strides[0],
+            int(self.no_deskew), self.preprocess, self._chunk_buffer, self.CHUNK_BUFFER_SIZE)
+        if size < 0:
+            raise ValueError("cimbar_decoder_decode_chunks参数无效")
+        return self._chunk_buffer.raw[:size]
+
+    def feed_chunks(self, chunks):
+        """把decode_chunks()得到的块写入fountain sink，返回 DecodeResult(块字节数, 新完成的文件路径, 各数据流进度)"""
+        if self._handle is None:
+            raise RuntimeError("解码器已关闭")
+        count = self._lib.cimbar_decoder_feed_chunks(self._handle, chunks, len(chunks))
+        return DecodeResult(count * self.chunk_size(), self.take_completed(), self.progress())
+
+    def chunk_size(self):
+        """每个fountain块的字节数（由颜色位数和ECC决定）"""
+        return self._lib.cimbar_decoder_chunk_size(self._handle)
+
+    def take_completed(self):
+        """取出自上次调用以来完成的文件（完整路径）"""
+        completed = []
+        while self._lib.cimbar_decoder_next_completed(self._handle, self._name_buffer, len(self._name_buffer)):
+            completed.append(os.path.join(self.output_dir, self._name_buffer.value.decode('utf-8')))
+        return completed
+
+    def progress(self):
+        """各个未完成数据流的进度（0.0 - 1.0）"""
+        count = self._lib.cimbar_decoder_get_progress(self._handle, self._progress_buffer, self.MAX_STREAMS)
+        return list(self._progress_buffer[:min(count, self.MAX_STREAMS)])
+
+    def streams(self):
+        """各个未完成数据流的详细进度，StreamStatus列表"""
+        count = self._lib.cimbar_decoder_get_streams(self._handle, self._stream_buffer, self.MAX_STREAMS)
+        return [StreamStatus(st.slot, st.blocks, st.blocks_required, st.size)
+                for st in self._stream_buffer[:min(count, self.MAX_STREAMS)]]
+
+    def num_done(self):
+        return self._lib.cimbar_decoder_num_done(self._handle)
+
+    def close(self):
+        if self._handle is not None:
+            self._lib.cimbar_decoder_free(self._handle)
+            self._handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class Encoder:
+    """进程内cimbar编码会话，不写PNG也不启动cimbar进程
+
+    与cimbar_js相同：encode()把数据（压缩后）放进fountain编码流，next_frame()每次渲染一帧，
+    发送完所需块数的8倍后从头开始循环。帧是 frame_size x frame_size 的BGR（或BGRA）uint8数组，
+    可以直接交给cv2显示，也可以直接交给Decoder.decode()。
+    参数与Decoder相同（负数表示cimbar::Config的默认值），compression为0时解码端须用compressed=False。
+    canvas_size大于1024时码居中放在更大的画布上。渲染期间释放GIL，多个会话可以在不同线程中并行渲染。
+    """
+
+    def __init__(self, color_bits=-1, ecc=-1, compression=-1, legacy_mode=False, canvas_size=0):
+        self._lib = load_library()
+        self._handle = self._lib.cimbar_encoder_create(
+            ctypes.c_uint(color_bits & 0xFFFFFFFF), ctypes.c_uint(ecc & 0xFFFFFFFF), compression,
+            int(legacy_mode), canvas_size)
+        if not self._handle:
+            raise RuntimeError("创建cimbar编码器失败")
+        self.frame_size = self._lib.cimbar_encoder_frame_size(self._handle)
+        self.encoded = False
+
+    def _require_handle(self):
+        if self._handle is None:
+            raise RuntimeError("编码器已关闭")
+        return self._handle
+
+    def encode(self, data, encode_id=-1):
+        """开始编码一份数据：bytes等缓冲区协议对象，或有read()的文件对象（读入内存，不经过临时文件）
+
+        encode_id: 0-127，-1表示每份数据自动换一个（解码端按它区分不同的文件）
+        """
+        if hasattr(data, 'read'):
+            data = data.read()
+        if not isinstance(data, bytes):
+            data = np.frombuffer(memoryview(data).cast('B'), dtype=np.uint8)
+        address = data if isinstance(data, bytes) else data.ctypes.data
+        if not self._lib.cimbar_encoder_encode(self._require_handle(), address, len(data), encode_id):
+            raise ValueError("编码失败（数据为空或太小）")
+        self.encoded = True
+
+    def next_frame(self, out=None, channels=3):
+        """渲染下一帧并返回它；out为可选的 (frame_size, frame_size, channels) uint8数组（行之间可以有stride）"""
+        handle = self._require_handle()
+        if not self.encoded:
+            raise RuntimeError("请先调用encode()")
+        if out is None:
+            out = np.empty((self.frame_size, self.frame_size, channels), dtype=np.uint8)
+        elif (out.ndim != 3 or out.shape[:2] != (self.frame_size, self.frame_size) or out.dtype != np.uint8
+              or out.strides[2] != 1 or out.strides[1] != out.shape[2]):
+            raise ValueError(f"输出需要 ({self.frame_size}, {self.frame_size}, 3或4) 的uint8数组，行内连续")
+        if not out.flags.writeable:
+            raise ValueError("输出数组不可写")
+        result = self._lib.cimbar_encoder_next_frame(handle, out.ctypes.data, out.shape[2], out.strides[0])
+        if result < 0:
+            raise ValueError("cimbar_encoder_next_frame参数无效")
+        return out if result else None
+
+    def frames(self, count=None, channels=3):
+        """依次产出帧（每帧一个新数组），count为None时无限循环"""
+        produced = 0
+        while count is None or produced < count:
+            frame = self.next_frame(channels=channels)
+            if frame is None:
+                return
+            produced += 1
+            yield frame
+
+    def skip(self, frames):
+        """跳过若干帧（只推进fountain编码流，不渲染），返回实际跳过的帧数"""
+        return self._lib.cimbar_encoder_skip(self._require_handle(), frames)
+
+    def blocks_required(self):
+        """还原数据至少需要的fountain块数"""
+        return self._lib.cimbar_encoder_blocks_required(self._require_handle())
+
+    def blocks_per_frame(self):
+        return self._lib.cimbar_encoder_blocks_per_frame(self._require_handle())
+
+    def frames_required(self):
+        """无损传输时至少需要的帧数"""
+        per_frame = self.blocks_per_frame()
+        return -(-self.blocks_required() // per_frame) if per_frame else 0
+
+    def close(self):
+        if self._handle is not None:
+            self._lib.cimbar_encoder_free(self._handle)
+            self._handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cimbar Sender - 高帧率发送端（cimbar_send的Python版本）
+渲染和显示分开：几个渲染线程各自持有一个libcimbar_py编码会话（同一份数据、同一个encode_id），
+第w个线程渲染第 w, w+W, w+2W ... 帧（其余的帧用Encoder.skip()跳过，不渲染），提前写入RenderRing中预先分配的画布；
+显示线程按精确的帧率节拍取出下一帧显示，渲染偶尔变慢时环里还有存货，不会掉帧。
+
+每帧带有与cimbar_send（gl_2d_display）相同的shakycam位移：依次为 (0,0) (-4,-4) (0,0) (4,4) 像素，
+画布比码大 2*MARGIN 像素。结束时报告实际帧率、帧间隔抖动、重复帧（到点时下一帧还没渲染好）和跳过的节拍（显示线程被卡住）。
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import cimbar_native
+from stage_stats import StageStats
+
+# gl_2d_display::computeShakePos：8/窗口边长的NDC位移，即4像素
+SHAKE_OFFSETS = ((0, 0), (-4, -4), (0, 0), (4, 4))
+# cimbar_send的窗口比码大32像素
+MARGIN = 16
+# cimbar_send的第一个encode_id；所有渲染线程必须使用相同的值，才是同一个fountain流
+ENCODE_ID = 109
+
+
+class SenderStats(StageStats):
+    """发送端的阶段耗时：render（渲染一帧）、present（显示调用）、jitter（实际帧间隔与目标间隔之差的绝对值）"""
+
+    STAGES = ('render', 'present', 'jitter')
+
+
+class RenderRing:
+    """预先渲染帧的有界环
+
+    size个预先分配的画布，第seq帧写入槽位 seq % size。渲染线程acquire(seq)等到这个槽位空闲
+    （显示端已经release了第 seq-size 帧），渲染后publish(seq)；显示端take(seq)不等待，没渲染好时返回None。
+    """
+
+    def __init__(self, size, shape):
+        self.size = size
+        self.slots = [np.zeros(shape, dtype=np.uint8) for _ in range(size)]
+        self._ready = [-1] * size  # 槽位中已渲染好的帧序号
+        self._read_seq = 0  # 显示端下一个要取的帧序号
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def acquire(self, seq):
+        """等待第seq帧的槽位空闲并返回它的画布，环已关闭时返回None"""
+        with self._cond:
+            while seq >= self._read_seq + self.size and not self._closed:
+                self._cond.wait()
+            return None if self._closed else self.slots[seq % self.size]
+
+    def publish(self, seq):
+        with self._cond:
+            self._ready[seq % self.size] = seq
+
+    def take(self, seq):
+        """第seq帧已渲染好时返回它的画布（release之前不会被覆盖），否则返回None"""
+        with self._cond:
+            slot = seq % self.size
+            return self.slots[slot] if self._ready[slot] == seq else None
+
+    def release(self, seq):
+        with self._cond:
+            self._read_seq = seq + 1
+            self._cond.notify_all()
+
+    def filled(self, seq):
+        """从第seq帧开始已经连续渲染好的帧数"""
+        with self._cond:
+            count = 0
+            while count < self.size and self._ready[(seq + count) % self.size] == seq + count:
+                count += 1
+            return count
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def clear_border(canvas, x, y, size, value=0):
+    """把码区域 (x, y, size, size) 以外的部分填成背景（上一次使用这个画布时码可能在别的位置）"""
+    canvas[:y] = value
+    canvas[y + size:] = value
+    canvas[y:y + size, :x] = value
+    canvas[y:y + size, x + size:] = value
+
+
+class CimbarSender:
+    """按固定帧率显示预先渲染的cimbar帧
+
+    create_encoder: 创建编码会话的函数（每个渲染线程调用一次），返回的对象须提供
+                    encode(data, encode_id) / next_frame(out) / skip(n) / frame_size / close()，默认是cimbar_native.Encoder
+    display: display(image) 显示一帧，返回False时停止；调用返回后画布会被重新使用，不能保留对它的引用
+    workers: 渲染线程数；ring_size: 环的槽位数（提前渲染的帧数上限），默认每个渲染线程2帧
+    """
+
+    def __init__(self, data, fps=15.0, create_encoder=None, display=None, workers=2, ring_size=None,
+                 shake=True, margin=MARGIN, stats=None, on_error=None):
+        self.data = data
+        self.fps = fps
+        self.create_encoder = create_encoder or cimbar_native.Encoder
+        self.display = display or (lambda image: True)
+        self.workers = max(1, workers)
+        self.ring_size = max(ring_size or 2 * self.workers, self.workers)
+        self.shake = shake
+        self.margin = max(margin, max(abs(dx) for dx, _ in SHAKE_OFFSETS)) if shake else margin
+        self.on_error = on_error or (lambda e: None)
+        self.stats = stats if stats is not None else SenderStats()
+
+        self.ring = None
+        self.frame_size = None
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.error = None
+
+        self.rendered = 0
+        self.presented = 0
+        self.repeated = 0  # 到显示时刻时下一帧还没渲染好，上一帧多显示了一个节拍
+        self.skipped = 0   # 显示线程被卡住超过一个节拍，错过的节拍
+        self.start_time = None
+        self.end_time = None
+        self._lock = threading.Lock()
+        for name in ('rendered', 'presented', 'repeated', 'skipped', 'dropped'):
+            self.stats.watch(name, lambda name=name: getattr(self, name))
+
+    @property
+    def dropped(self):
+        """接收端看来少掉的帧：重复的帧和错过的节拍"""
+        return self.repeated + self.skipped
+
+    @property
+    def canvas_size(self):
+        return self.frame_size + 2 * self.margin
+
+    def start(self):
+        # 每个渲染线程的编码会话都要压缩整份数据，在各自的线程里并行进行
+        ready = threading.Barrier(self.workers + 1)
+        for index in range(self.workers):
+            t = threading.Thread(target=self._render_loop, args=(index, ready),
+                                 name=f"cimbar-render-{index}", daemon=True)
+            self.threads.append(t)
+            t.start()
+        ready.wait()
+        if self.error is not None:
+            self.stop()
+            raise self.error
+        return self
+
+    def _render_loop(self, index, ready):
+        encoder = None
+        try:
+            try:
+                encoder = self.create_encoder()
+                encoder.encode(self.data, ENCODE_ID)
+                if index == 0:
+                    self.frame_size = encoder.frame_size
+                    self.ring = RenderRing(self.ring_size, (self.canvas_size, self.canvas_size, 3))
+            except Exception as e:
+                self.error = e
+            finally:
+                ready.wait()
+            if self.error is not None:
+                return
+
+            # 第index, index+W, index+2W ... 帧由这个线程渲染
+            encoder.skip(index)
+            seq = index
+            size = self.frame_size
+            while not self.stop_event.is_set():
+                canvas = self.ring.acquire(seq)
+                if canvas is None:
+                    return
+                dx, dy = SHAKE_OFFSETS[seq % len(SHAKE_OFFSETS)] if self.shake else (0, 0)
+                x, y = self.margin + dx, self.margin + dy
+                start = time.perf_counter()
+                clear_border(canvas, x, y, size)
+                if encoder.next_frame(canvas[y:y + size, x:x + size]) is None:
+                    raise RuntimeError("编码器没有产生帧")
+                self.stats.record('render', time.perf_counter() - start)
+                self.ring.publish(seq)
+                with self._lock:
+                    self.rendered += 1
+                if self.workers > 1:
+                    encoder.skip(self.workers - 1)
+                seq += self.workers
+        except Exception as e:
+            self.error = e
+            self.on_error(e)
+            self.stop_event.set()
+        finally:
+            if encoder is not None:
+                encoder.close()
+
+    def run(self, duration=None, prefill=1.0):
+        """在当前线程中按帧率显示，直到display返回False、duration秒后或stop()
+
+        prefill: 开始计时前等待环填满的比例（最多等待1秒），避免一开始就重复帧
+        """
+        interval = 1.0 / self.fps
+        deadline = time.perf_counter() + 1.0
+        wanted = max(1, int(self.ring_size * prefill))
+        while self.ring.filled(0) < wanted and time.perf_counter() < deadline and not self.stop_event.is_set():
+            time.sleep(0.001)
+
+        seq = 0
+        tick = 0
+        last_present = None
+        self.start_time = time.perf_counter()
+        while not self.stop_event.is_set():
+            target = self.start_time + tick * interval
+            if duration is not None and target - self.start_time >= duration:
+                break
+            wait_until(target)
+
+            canvas = self.ring.take(seq)
+            if canvas is None:
+                self.repeated += 1
+                last_present = None
+            else:
+                start = time.perf_counter()
+                keep_going = self.display(canvas)
+                now = time.perf_counter()
+                self.ring.release(seq)
+                seq += 1
+                self.presented += 1
+                self.stats.record('present', now - start)
+                if last_present is not None:
+                    self.stats.record('jitter', abs(start - last_present - interval))
+                last_present = start
+                if keep_going is False:
+                    break
+
+            tick += 1
+            # 被卡住超过一个节拍时不补帧（补帧会连续快速显示几帧），直接跳到下一个节拍
+            behind = int((time.perf_counter() - self.start_time) / interval) - tick
+            if behind > 0:
+                self.skipped += behind
+                tick += behind
+                last_present = None
+        self.end_time = time.perf_counter()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.ring is not None:
+            self.ring.close()
+        for t in self.threads:
+            if t is not threading.current_thread():
+                t.join(timeout=5)
+
+    def summary(self):
+        elapsed = (self.end_time or time.perf_counter()) - (self.start_time or time.perf_counter())
+        stages = self.stats.snapshot()['stages']
+        return {
+            'elapsed': elapsed,
+            'target_fps': self.fps,
+            'actual_fps': self.presented / elapsed if elapsed > 0 else 0.0,
+            'rendered': self.rendered,
+            'presented': self.presented,
+            'repeated': self.repeated,
+            'skipped': self.skipped,
+            'dropped': self.dropped,
+            'jitter_ms': {k: stages['jitter'][k] for k in ('p50_ms', 'p99_ms', 'max_ms')},
+            'render_ms': {k: stages['render'][k] for k in ('p50_ms', 'p99_ms', 'max_ms')},
+        }
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def wait_until(target, spin=0.002):
+    """睡到target前spin秒，再让出CPU轮询到target（time.sleep的精度不够按帧率节拍）"""
+    delay = target - time.perf_counter() - spin
+    if delay > 0:
+        time.sleep(delay)
+    while time.perf_counter() < target:
+        time.sleep(0)
+
+
+class WindowDisplay:
+    """用cv2窗口显示，按Esc或q停止"""
+
+    def __init__(self, title="Cimbar Sender", fullscreen=False):
+        self.title = title
+        cv2.namedWindow(title, cv2.WINDOW_AUTOSIZE if not fullscreen else cv2.WINDOW_NORMAL)
+        if fullscreen:
+            cv2.setWindowProperty(title, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+
+    def __call__(self, image):
+        cv2.imshow(self.title, image)
+        return cv2.waitKey(1) & 0xFF not in (27, ord('q'))
+
+    def close(self):
+        cv2.destroyWindow(self.title)
+
+
+def read_input(path):
+    if path == '-':
+        return sys.stdin.buffer.read()
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cimbar Sender - 按固定帧率显示cimbar码（cimbar_send的Python版本）",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""示例:
+  以60fps发送一个文件，4个渲染线程:
+    %(prog)s payload.bin -f 60 --workers 4
+
+  不显示窗口，只测试渲染能否跟上120fps:
+    %(prog)s payload.bin -f 120 --headless --time 10
+        """
+    )
+    parser.add_argument('input', help='要发送的文件（-表示标准输入）')
+    parser.add_argument('-c', '--colorbits', type=int, default=-1, help='颜色位数 [0-3]（默认cimbar::Config的值）')
+    parser.add_argument('-e', '--ecc', type=int, default=-1, help='ECC字节数（默认cimbar::Config的值）')
+    parser.add_argument('-f', '--fps', type=float, default=15.0, help='目标帧率（默认15，与cimbar_send相同）')
+    parser.add_argument('-m', '--mode', choices=['B', '4C', 'b', '4c'], default='B', help='cimbar模式（默认B，与cimbar_send和接收端相同）')
+    parser.add_argument('-z', '--compression', type=int, default=-1, help='压缩级别，0表示不压缩')
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), metavar='N',
+                        help='渲染线程数（默认CPU核数，最多4）')
+    parser.add_argument('--ring', type=int, metavar='N', help='提前渲染的帧数上限（默认每个渲染线程2帧）')
+    parser.add_argument('--no-shake', action='store_true', help='关闭shakycam位移')
+    parser.add_argument('--fullscreen', action='store_true', help='全屏显示')
+    parser.add_argument('--headless', action='store_true', help='不显示窗口（测试渲染和节拍）')
+    parser.add_argument('-t', '--time', type=float, metavar='SECONDS', help='发送时长（默认直到按Esc / q）')
+    parser.add_argument('--stats-json', type=str, metavar='PATH', help='结束时把统计写成JSON')
+    args = parser.parse_args()
+
+    if not cimbar_native.is_available():
+        print("错误: 找不到libcimbar_py，请先编译安装（make install）")
+        return 1
+
+    data = read_input(args.input)
+    legacy_mode = args.mode.upper() == '4C'
+    display = None if args.headless else WindowDisplay(fullscreen=args.fullscreen)
+
+    def create_encoder():
+        return cimbar_native.Encoder(args.colorbits, args.ecc, args.compression, legacy_mode)
+
+    sender = CimbarSender(data, args.fps, create_encoder, display, args.workers, args.ring,
+                          shake=not args.no_shake)
+    try:
+        with sender:
+            print(f"发送 {args.input}（{len(data)} 字节），目标 {args.fps:g} fps，{sender.workers} 个渲染线程，"
+                  f"环 {sender.ring_size} 帧")
+            try:
+                sender.run(args.time)
+            except KeyboardInterrupt:
+                pass
+    except Exception as e:
+        print(f"\n错误: {str(e)}")
+        return 1
+    finally:
+        if display is not None:
+            display.close()
+
+    summary = sender.summary()
+    print("\n发送统计:")
+    print(f"  时长: {summary['elapsed']:.1f}s，实际帧率: {summary['actual_fps']:.2f} fps（目标 {args.fps:g}）")
+    print(f"  显示: {summary['presented']} 帧，渲染: {summary['rendered']} 帧")
+    print(f"  掉帧: {summary['dropped']}（重复 {summary['repeated']}，跳过的节拍 {summary['skipped']}）")
+    jitter, render = summary['jitter_ms'], summary['render_ms']
+    print(f"  帧间隔抖动 (p50 / p99 / max ms): {jitter['p50_ms']:.2f} / {jitter['p99_ms']:.2f} / {jitter['max_ms']:.2f}")
+    print(f"  渲染耗时 (p50 / p99 / max ms): {render['p50_ms']:.1f} / {render['p99_ms']:.1f} / {render['max_ms']:.1f}")
+    if args.stats_json:
+        with open(args.stats_json, 'w') as f:
+            json.dump(summary, f, indent=2)
+    if sender.error is not None:
+        print(f"错误: {sender.error}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cimbar Decode Session - 常驻cimbar解码进程
+只启动一次cimbar，通过stdin逐行发送图像路径，保留fountain解码状态，
+多帧文件可以跨帧拼接完成
+"""
+
+import json
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+from collections import deque
+
+from cimbar_native import StreamStatus
+
+
+FRAME_ACK_PREFIX = '#frame '
+
+
+class CimbarSessionError(RuntimeError):
+    """cimbar解码进程异常"""
+
+
+def cimbar_executable(cimbar_path):
+    """返回当前平台下cimbar可执行文件的路径"""
+    if os.name == 'nt' and not cimbar_path.endswith('.exe'):
+        return cimbar_path + '.exe'
+    return cimbar_path
+
+
+class CimbarDecodeSession:
+    """常驻的cimbar解码会话
+
+    cimbar以 `--ack` 模式运行：每处理完一帧输出一行 `#frame <字节数>`，
+    在此之前输出的路径行即为该帧完成的文件（fountain_decoder_sink的log_writes输出）。
+    progress=True 时加上 `--progress`，每帧还会输出每个未完成数据流的JSON行，
+    解析后保存在 streams 中（最近一帧的StreamStatus列表）。
+    """
+
+    def __init__(self, cimbar_path="./cimbar", output_dir=None, no_deskew=True,
+                 extra_args=None, timeout=30.0, progress=True):
+        self.cimbar_path = cimbar_path
+        self.output_dir = output_dir or tempfile.mkdtemp(prefix="cimbar_decode_")
+        self.no_deskew = no_deskew
+        self.extra_args = list(extra_args or [])
+        self.timeout = timeout
+        self.progress = progress
+        self.streams = []
+
+        self.process = None
+        self.restarts = 0
+        self._lines = None
+        self._stderr_tail = deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    def command(self):
+        """构造cimbar命令行"""
+        cmd = [cimbar_executable(self.cimbar_path), '-o', self.output_dir, '--ack']
+        if self.no_deskew:
+            cmd.append('--no-deskew')
+        if self.progress:
+            cmd.append('--progress')
+        cmd.extend(self.extra_args)
+        return cmd
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """启动cimbar进程（已在运行则直接返回）"""
+        if self.is_running():
+            return
+        if self.process is not None:
+            # 进程意外退出，fountain状态已丢失
+            self.restarts += 1
+
+        self._lines = queue.Queue()
+        self._stderr_tail.clear()
+        self.process = subprocess.Popen(
+            self.command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(target=self._read_stdout, args=(self.process, self._lines), daemon=True).start()
+        threading.Thread(target=self._read_stderr, args=(self.process,), daemon=True).start()
+
+    def _read_stdout(self, process, lines):
+        for line in process.stdout:
+            lines.put(line.rstrip('\r\n'))
+        lines.put(None)
+
+    def _read_stderr(self, process):
+        for line in process.stderr:
+            self._stderr_tail.append(line.rstrip('\r\n'))
+
+    def last_error(self):
+        """cimbar最近的stderr输出"""
+        return '\n'.join(self._stderr_tail)
+
+    def decode_file(self, image_path):
+        """解码一帧图像，返回 (解码字节数, 新完成的文件列表)"""
+        with self._lock:
+            self.start()
+            try:
+                self.process.stdin.write(os.path.abspath(image_path) + '\n')
+                self.process.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                raise CimbarSessionError(f"cimbar进程已退出: {e}")
+
+            new_files = []
+            streams = []
+            while True:
+                try:
+                    line = self._lines.get(timeout=self.timeout)
+                except queue.Empty:
+                    self.close()
+                    raise CimbarSessionError("cimbar解码超时")
+
+                if line is None:
+                    raise CimbarSessionError(f"cimbar进程已退出: {self.last_error()}")
+                if line.startswith(FRAME_ACK_PREFIX):
+                    self.streams = streams
+                    return int(line[len(FRAME_ACK_PREFIX):]), new_files
+                if line.startswith('{'):
+                    st = json.loads(line)
+                    streams.append(StreamStatus(st['slot'], st['blocks'], st['required'], st['size']))
+                elif line:
+                    new_files.append(line)
+
+    def close(self):
+        """关闭cimbar进程"""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
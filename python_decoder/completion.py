@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Completion - 已完成文件的发现和索引
+完成的文件首先由解码器报告（libcimbar_py的take_completed()，或cimbar进程的log_writes路径行）。
+CompletionWatcher是备用方案：监视输出目录（Linux上用inotify，其他平台在目录修改时间变化时扫描），
+用于输出目录由其他解码器写入的情况。
+CompletedIndex按 (encode_id, 文件大小) 记录完成的文件，不再保存见过的每个文件名：
+最近的文件保留完整记录，更早的只保留一个整数键，用于去重和计数。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+
+CompletedFile = namedtuple('CompletedFile', ['encode_id', 'size', 'path', 'time'])
+
+
+def parse_output_name(name):
+    """fountain_decoder_sink的输出文件名是 <encode_id>.<文件大小>，返回 (encode_id, size)，不匹配时返回None"""
+    encode_id, sep, size = os.path.basename(name).partition('.')
+    if not sep or not encode_id.isdigit() or not size.isdigit():
+        return None
+    return int(encode_id), int(size)
+
+
+def _pack_key(key):
+    encode_id, size = key
+    return encode_id << 64 | size
+
+
+class CompletedIndex:
+    """线程安全的已完成文件索引，按完成顺序最多保留max_entries条完整记录
+
+    被挤出的文件只保留 (encode_id, size) 压成的整数，再次出现时仍视为已记录，len()不会重复计数。
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.total = 0
+        self._files = OrderedDict()
+        self._evicted = set()
+        self._lock = threading.Lock()
+
+    def add(self, path, when=None):
+        """记录一个完成的文件，返回CompletedFile；已经记录过（或文件名不是sink的输出）时返回None"""
+        key = parse_output_name(path)
+        if key is None:
+            return None
+        with self._lock:
+            if key in self._files or _pack_key(key) in self._evicted:
+                return None
+            entry = CompletedFile(key[0], key[1], path, time.time() if when is None else when)
+            self._files[key] = entry
+            self.total += 1
+            if len(self._files) > self.max_entries:
+                evicted, _ = self._files.popitem(last=False)
+                self._evicted.add(_pack_key(evicted))
+            return entry
+
+    def get(self, encode_id, size):
+        with self._lock:
+            return self._files.get((encode_id, size))
+
+    def __contains__(self, path):
+        key = parse_output_name(path)
+        with self._lock:
+            return key is not None and (key in self._files or _pack_key(key) in self._evicted)
+
+    def __len__(self):
+        return self.total
+
+    def entries(self):
+        """按完成顺序返回保留的CompletedFile"""
+        with self._lock:
+            return list(self._files.values())
+
+
+# <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_inotify():
+    """返回libc（支持inotify时），否则返回None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class CompletionWatcher:
+    """后台线程监视输出目录，每出现一个sink输出文件调用一次 on_file(path)
+
+    inotify只在文件写完关闭（或改名移入）时通知，不会读到写了一半的文件；
+    没有inotify时每隔poll_interval秒检查目录修改时间，变化时才扫描目录。
+    启动前已经存在的文件不会报告。
+    """
+
+    def __init__(self, output_dir, on_file, poll_interval=1.0):
+        self.output_dir = output_dir
+        self.on_file = on_file
+        self.poll_interval = poll_interval
+        self.backend = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        libc = _load_inotify()
+        fd = -1
+        if libc is not None:
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(self.output_dir),
+                                                  _IN_CLOSE_WRITE | _IN_MOVED_TO) < 0:
+                os.close(fd)
+                fd = -1
+        if fd >= 0:
+            self.backend = 'inotify'
+            target, args = self._run_inotify, (fd,)
+        else:
+            self.backend = 'poll'
+            target, args = self._run_poll, ()
+        self._thread = threading.Thread(target=target, args=args, name="cimbar-watch", daemon=True)
+        self._thread.start()
+        return self
+
+    def _report(self, name):
+        if parse_output_name(name) is not None:
+            self.on_file(os.path.join(self.output_dir, name))
+
+    def _run_inotify(self, fd):
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([fd], [], [], 0.2)
+                if not ready:
+                    continue
+                try:
+                    buf = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                offset = 0
+                while offset + _EVENT_HEADER.size <= len(buf):
+                    _, _, _, length = _EVENT_HEADER.unpack_from(buf, offset)
+                    offset += _EVENT_HEADER.size
+                    name = buf[offset:offset + length].rstrip(b'\0')
+                    offset += length
+                    if name:
+                        self._report(os.fsdecode(name))
+        finally:
+            os.close(fd)
+
+    def _run_poll(self):
+        seen = set(self._scan())
+        mtime = self._mtime()
+        while not self._stop.wait(self.poll_interval):
+            current = self._mtime()
+            if current == mtime:
+                continue
+            mtime = current
+            for name in self._scan():
+                if name not in seen:
+                    seen.add(name)
+                    self._report(name)
+
+    def _mtime(self):
+        try:
+            return os.stat(self.output_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan(self):
+        try:
+            with os.scandir(self.output_dir) as it:
+                return [entry.name for entry in it if parse_output_name(entry.name) is not None]
+        except OSError:
+            return []
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
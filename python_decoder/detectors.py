@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cimbar Detectors - cimbar码检测器
+Detector.find() 返回按可信度排序的候选区域，Detector.detect() 兼容原来的
+find_cimbar_in_image 返回值 (found, roi, bbox)
+
+ContourDetector: 原来的轮廓启发式（全分辨率自适应阈值 + 最大的近似正方形轮廓）
+AnchorDetector: 在缩小的图像金字塔上寻找角上的定位标记（bitmap/anchor-*.png 的嵌套方框），
+                返回全分辨率下的四个角点
+"""
+
+from collections import namedtuple
+from itertools import combinations
+
+import cv2
+import numpy as np
+
+
+# bbox: 轴对齐边界框 (x, y, w, h)
+# corners: 4x2 float32 角点，顺序为 左上、右上、右下、左下
+# score: 越大越可信
+# centers: 4x2 float32 四个定位标记的中心（顺序同corners），只有AnchorDetector提供
+Detection = namedtuple('Detection', ['bbox', 'corners', 'score', 'centers'], defaults=[None])
+
+
+def bbox_corners(bbox):
+    """轴对齐边界框的四个角点"""
+    x, y, w, h = bbox
+    return np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h]], dtype=np.float32)
+
+
+def corners_bbox(corners, width, height):
+    """角点的轴对齐边界框，裁剪到图像范围内"""
+    x0, y0 = np.floor(corners.min(axis=0)).astype(int)
+    x1, y1 = np.ceil(corners.max(axis=0)).astype(int)
+    x0, y0 = max(0, x0), max(0, y0)
+    x1, y1 = min(width, x1), min(height, y1)
+    return (int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+
+
+class Detector:
+    """检测器接口"""
+
+    name = 'base'
+
+    def find(self, image):
+        """返回按score从高到低排序的Detection列表（BGR图像）"""
+        raise NotImplementedError
+
+    def detect(self, image, normalizer=None):
+        """返回 (found, roi, bbox)，roi是原图的切片（不拷贝）
+
+        normalizer: 可选的PerspectiveNormalizer，roi换成校正到标准网格的图像
+        """
+        candidates = self.find(image)
+        if not candidates:
+            return False, None, None
+        return True, self._roi(image, candidates[0], normalizer), candidates[0].bbox
+
+    def detect_all(self, image, limit=None, normalizer=None):
+        """返回 (found, rois, bboxes)，包含最多limit个候选（按score排序）"""
+        candidates = self.find(image)[:limit]
+        rois = [self._roi(image, c, normalizer) for c in candidates]
+        return bool(candidates), rois, [c.bbox for c in candidates]
+
+    @staticmethod
+    def _roi(image, detection, normalizer):
+        if normalizer is not None:
+            return normalizer.warp(image, detection)
+        x, y, w, h = detection.bbox
+        return image[y:y+h, x:x+w]
+
+    def __call__(self, image):
+        return self.detect(image)
+
+
+class ContourDetector(Detector):
+    """自适应阈值 + 轮廓筛选（原 find_cimbar_in_image 的实现）
+
+    first_match=True 时按轮廓顺序取第一个符合条件的区域（原GUI行为），否则取面积最大的（原CLI行为）。
+    """
+
+    name = 'contour'
+
+    def __init__(self, min_area=10000, aspect_range=(0.8, 1.2), block_size=11, constant=2, first_match=False):
+        self.min_area = min_area
+        self.aspect_range = aspect_range
+        self.block_size = block_size
+        self.constant = constant
+        self.first_match = first_match
+
+    def find(self, image):
+        # 转换为灰度图
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        # 应用自适应阈值
+        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                       cv2.THRESH_BINARY, self.block_size, self.constant)
+
+        # 查找轮廓
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        # 筛选可能的cimbar码区域
+        candidates = []
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if area < self.min_area:
+                continue
+
+            x, y, w, h = cv2.boundingRect(contour)
+            aspect_ratio = w / h
+            if self.aspect_range[0] < aspect_ratio < self.aspect_range[1]:
+                bbox = (x, y, w, h)
+                candidates.append(Detection(bbox, bbox_corners(bbox), float(area)))
+                if self.first_match:
+                    break
+
+        # 面积最大的排在最前
+        candidates.sort(key=lambda c: c.score, reverse=True)
+        return candidates
+
+
+class AnchorDetector(Detector):
+    """基于定位标记的多尺度检测器
+
+    定位标记是嵌套的方框（外框 / 间隔 / 内芯），在二值图的轮廓树中表现为
+    "轮廓 → 孔 → 内芯" 三层嵌套。三个主定位标记构成等腰直角三角形（右下角是内芯更小的副标记），
+    码的四个角就是各标记离码中心最远的外角。
+
+    金字塔层按预期的码尺寸选：定位标记约占码边长的 60/1024，缩放到标记约 anchor_px 像素
+    就能稳定识别。没有预期尺寸时从能放进画面的最大码开始，每层放大一倍，直到 min_code
+    大小的码也能看清为止；不会为了更小（本来也解不出来）的码去处理全分辨率图像。
+    检测成功后记住码的尺寸，下一帧直接从对应的层开始。
+    """
+
+    name = 'anchor'
+
+    # 定位标记边长 / 码边长
+    ANCHOR_FRACTION = 60 / 1024
+
+    def __init__(self, code_size=None, min_code=640, anchor_px=24, min_anchor=8, max_candidates=12):
+        """
+        code_size: 预期的码边长（原图像素），None表示未知
+        min_code: 要找的最小码边长（原图像素）
+        anchor_px: 金字塔层上定位标记的目标边长
+        """
+        self.code_size = code_size
+        self.min_code = min_code
+        self.anchor_px = anchor_px
+        self.min_anchor = min_anchor
+        self.max_candidates = max_candidates
+
+    def find(self, image):
+        height, width = image.shape[:2]
+        for scale in self._scales(width, height):
+            small, factor = self._downscale(image, scale)
+            detections = self._find_at_level(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+            if detections:
+                detections = [Detection(corners_bbox(d.corners / factor, width, height), d.corners / factor, d.score,
+                                        d.centers / factor)
+                              for d in detections]
+                # 平均边长作为下一帧的预期尺寸
+                corners = detections[0].corners
+                self.code_size = float(np.linalg.norm(corners - np.roll(corners, 1, axis=0), axis=1).mean())
+                return detections
+        return []
+
+    @staticmethod
+    def _downscale(image, scale):
+        """缩小到约scale倍，返回 (图像, x/y的实际缩放比例)
+
+        先用INTER_AREA逐级减半（整数倍走快速路径），剩下不到一半的用INTER_LINEAR；
+        直接用INTER_AREA做非整数倍缩放要慢一个数量级
+        """
+        height, width = image.shape[:2]
+        small, ratio = image, 1.0
+        while scale <= ratio / 2:
+            h, w = small.shape[:2]
+            small = cv2.resize(small[:h - h % 2, :w - w % 2], (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+            ratio /= 2
+        if scale < ratio:
+            size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+            small = cv2.resize(small, size, interpolation=cv2.INTER_LINEAR)
+            return small, np.array([size[0] / width, size[1] / height], dtype=np.float32)
+        return small, np.float32(ratio)
+
+    def _scale_for(self, code_size):
+        """code_size像素的码，定位标记缩放到anchor_px所需的比例"""
+        return min(1.0, self.anchor_px / (code_size * self.ANCHOR_FRACTION))
+
+    def _scales(self, width, height):
+        """要试的缩放比例，从粗到细"""
+        largest = min(width, height)
+        expected = min(self.code_size or largest, largest)
+        scale = self._scale_for(expected)
+        limit = self._scale_for(min(self.min_code, expected))
+        scales = [scale]
+        while scale < limit:
+            scale = min(scale * 2, limit)
+            scales.append(scale)
+        return scales
+
+    def _find_at_level(self, gray):
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # 清晰的定位标记在两种极性的二值图里都是三层嵌套，先只找一种，不够再加上反色的
+        anchors = self._find_anchors(binary)
+        detections = self._match_anchors(anchors)
+        if not detections:
+            detections = self._match_anchors(anchors + self._find_anchors(255 - binary))
+        return detections
+
+    def _match_anchors(self, anchors):
+        if len(anchors) < 3:
+            return []
+
+        anchors.sort(key=lambda a: a['size'], reverse=True)
+        anchors = anchors[:self.max_candidates]
+
+        detections = []
+        for trio in combinations(anchors, 3):
+            detection = self._match_triangle(trio, anchors)
+            if detection is not None:
+                detections.append(detection)
+        detections.sort(key=lambda d: d.score, reverse=True)
+        return self._suppress_overlaps(detections)
+
+    def _find_anchors(self, binary):
+        """找出 轮廓 → 孔 → 内芯 三层嵌套的近似正方形"""
+        contours, hierarchy = cv2.findContours(binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        if hierarchy is None:
+            return []
+        # 先用numpy筛出有孔、孔里还有内芯的轮廓；码的单元格会产生成千上万个轮廓
+        holes = hierarchy[0][:, 2]
+        cores = np.where(holes >= 0, hierarchy[0][holes, 2], -1)
+
+        anchors = []
+        for i in np.flatnonzero(cores >= 0):
+            contour, core = contours[i], cores[i]
+            x, y, w, h = cv2.boundingRect(contour)
+            if w < self.min_anchor or h < self.min_anchor or not 0.7 < w / h < 1.4:
+                continue
+            outer_area = cv2.contourArea(contour)
+            if outer_area < 0.6 * w * h:
+                continue
+            core_area = cv2.contourArea(contours[core])
+            ratio = core_area / outer_area
+            if not 0.02 < ratio < 0.5:
+                continue
+
+            rect = cv2.minAreaRect(contour)
+            anchors.append({
+                'center': np.array(rect[0], dtype=np.float32),
+                'size': (w + h) / 2.0,
+                'box': cv2.boxPoints(rect).astype(np.float32),
+                # 副标记（右下角）的内芯明显更小
+                'primary': ratio > 0.14,
+            })
+        return anchors
+
+    def _match_triangle(self, trio, anchors):
+        # 三角形只由主标记组成：缺了一个主标记时，副标记和另外两个也能拼出等腰直角三角形，但方向是错的
+        if not all(a['primary'] for a in trio):
+            return None
+        sizes = [a['size'] for a in trio]
+        if max(sizes) > 1.5 * min(sizes):
+            return None
+
+        # 找直角顶点：它到另外两个点的距离相等，且夹角约90度
+        best = None
+        for b in range(3):
+            a_, c_ = [trio[i] for i in range(3) if i != b]
+            va = a_['center'] - trio[b]['center']
+            vc = c_['center'] - trio[b]['center']
+            la, lc = np.linalg.norm(va), np.linalg.norm(vc)
+            if la < 3 * sizes[b] or lc < 3 * sizes[b]:
+                continue
+            cos = abs(float(np.dot(va, vc) / (la * lc)))
+            length_error = abs(la - lc) / max(la, lc)
+            if cos < 0.15 and length_error < 0.15:
+                error = cos + length_error
+                if best is None or error < best[0]:
+                    best = (error, b)
+        if best is None:
+            return None
+
+        error, b = best
+        top_left = trio[b]
+        others = [trio[i] for i in range(3) if i != b]
+        va = others[0]['center'] - top_left['center']
+        vc = others[1]['center'] - top_left['center']
+        # 图像坐标y向下：右上角 × 左下角 的叉积为正
+        if va[0] * vc[1] - va[1] * vc[0] < 0:
+            others.reverse()
+        top_right, bottom_left = others
+
+        predicted = top_right['center'] + bottom_left['center'] - top_left['center']
+        code_center = (top_right['center'] + bottom_left['center']) / 2
+
+        def outer_corner(anchor):
+            box = anchor['box']
+            return box[np.argmax(np.linalg.norm(box - code_center, axis=1))]
+
+        tl, tr, bl = outer_corner(top_left), outer_corner(top_right), outer_corner(bottom_left)
+        br = tr + bl - tl
+        br_center = predicted
+        score = 1.0 - error
+
+        # 如果在预测位置找到了副标记，用它的外角代替平行四边形估计
+        for anchor in anchors:
+            if any(anchor is a for a in trio):
+                continue
+            if np.linalg.norm(anchor['center'] - predicted) < top_left['size']:
+                br = outer_corner(anchor)
+                br_center = anchor['center']
+                score += 0.5
+                break
+
+        corners = np.array([tl, tr, br, bl], dtype=np.float32)
+        centers = np.array([top_left['center'], top_right['center'], br_center, bottom_left['center']],
+                           dtype=np.float32)
+        return Detection(None, corners, score, centers)
+
+    @staticmethod
+    def _suppress_overlaps(detections):
+        """同一个码可能匹配出多个三角形，只保留得分最高的"""
+        kept = []
+        for d in detections:
+            center = d.corners.mean(axis=0)
+            if all(np.linalg.norm(center - k.corners.mean(axis=0)) > 0.25 * np.linalg.norm(k.corners[0] - k.corners[2])
+                   for k in kept):
+                kept.append(d)
+        return kept
+
+
+DETECTORS = {
+    ContourDetector.name: ContourDetector,
+    AnchorDetector.name: AnchorDetector,
+}
+
+
+def create_detector(name='anchor', **kwargs):
+    """按名字创建检测器"""
+    if name not in DETECTORS:
+        raise ValueError(f"未知的检测器: {name}（可选: {', '.join(DETECTORS)}）")
+    return DETECTORS[name](**kwargs)
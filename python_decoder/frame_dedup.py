@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Frame Dedup - 重复帧过滤
+发送端每帧显示时间比捕获间隔长时，同一帧会被解码多次，却拿不到新的fountain块。
+解码前对ROI计算平均哈希（与 src/lib/image_hash 的 average_hash / hamming_distance 相同的算法），
+和最近解出了数据的帧比较，足够相似就跳过。
+只记录解出了数据的帧：解码失败的帧（模糊、切换中的画面）不能让之后相似的帧被跳过
+"""
+
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def average_hash(image, hash_size=8, interpolation=cv2.INTER_LINEAR):
+    """平均哈希：缩放到 hash_size x hash_size 灰度图，高于均值的像素记为1
+
+    默认参数与 image_hash::average_hash 一致（行优先，最高位为左上角），返回int。
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if gray.shape[0] > hash_size or gray.shape[1] > hash_size:
+        gray = cv2.resize(gray, (hash_size, hash_size), interpolation=interpolation)
+
+    bits = (gray > int(gray.mean())).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big') >> (-bits.size % 8)
+
+
+def hamming_distance(a, b):
+    """两个哈希之间不同的位数"""
+    return bin(a ^ b).count('1')
+
+
+class FrameDeduplicator:
+    """用最近解出数据的帧的哈希（LRU）过滤重复帧
+
+    cimbar的单元格很小，8x8哈希会把不同的帧平均成几乎一样的结果，
+    所以默认使用32x32（1024位）哈希，阈值默认取位数的1/64。
+    is_duplicate()只比较不记录，解码出数据后再用record(last_hash)记录这一帧，
+    record()可以在其他线程中调用（例如解码结果异步返回时）。
+    """
+
+    def __init__(self, threshold=None, history=8, hash_size=32):
+        self.hash_size = hash_size
+        self.threshold = hash_size * hash_size // 64 if threshold is None else threshold
+        self.history = history
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self.last_hash = None  # 最近一次is_duplicate()返回False的帧的哈希
+
+        self.checked = 0
+        self.skipped = 0
+
+    def is_duplicate(self, image):
+        """image与最近解出数据的帧相似时返回True；否则把它的哈希存入last_hash并返回False"""
+        self.checked += 1
+        # 大幅缩小时INTER_AREA比默认的双线性插值更稳定
+        h = average_hash(image, self.hash_size, cv2.INTER_AREA)
+
+        with self._lock:
+            for recent in self._recent:
+                if hamming_distance(h, recent) <= self.threshold:
+                    # 命中的哈希移到最近使用的位置
+                    self._recent.move_to_end(recent)
+                    self.skipped += 1
+                    return True
+        self.last_hash = h
+        return False
+
+    def record(self, h):
+        """记录一帧解出了数据的帧的哈希（is_duplicate()之后的last_hash）"""
+        with self._lock:
+            self._recent[h] = None
+            self._recent.move_to_end(h)
+            if len(self._recent) > self.history:
+                self._recent.popitem(last=False)
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+        self.last_hash = None
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Frame Record - 捕获画面录制和回放
+FrameRecorder把流水线捕获到的每一帧连同捕获时间和偏移写入一个录制文件（编码和写盘在后台线程中进行，
+不拖慢捕获），RecordingSource按原来的时间间隔把它们重新送入流水线，RecordingReader顺序读取每一帧，
+用于复现传输慢的现场、分析各阶段耗时、在完全相同的画面上对比流水线的改动。
+
+录制文件格式（小端）:
+  文件头  b'CIMBREC1' + 编码方式(u8: 0=raw 1=png 2=jpeg) + 3字节保留
+  每帧    记录头 <diiHHBI: 时间戳(相对第一帧的秒数) 偏移x 偏移y 宽 高 通道数 数据长度，随后是数据
+          raw为原始像素，png/jpeg为cv2.imencode的结果
+  索引    每帧记录头的文件位置(u64 × 帧数)，随后是 <QI8s: 索引位置 帧数 b'CIMBIDX1'
+录制中途被中断（没有写入索引）的文件仍可顺序读取。
+"""
+
+import os
+import queue
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from roi_tracker import clip_crop
+
+MAGIC = b'CIMBREC1'
+INDEX_MAGIC = b'CIMBIDX1'
+CODECS = {'raw': 0, 'png': 1, 'jpeg': 2}
+FILE_HEADER = struct.Struct('<8sB3x')
+FRAME_HEADER = struct.Struct('<diiHHBI')
+INDEX_TRAILER = struct.Struct('<QI8s')
+
+
+class FrameRecorder:
+    """录制捕获到的帧
+
+    codec: raw（无损，最大）、png（无损，屏幕画面压缩率高，默认）或 jpeg（有损，最小）
+    quality: jpeg质量
+    max_pending: 等待编码的帧数上限，磁盘或编码跟不上时丢弃新帧并计入dropped（不阻塞捕获）
+    """
+
+    def __init__(self, path, codec='png', quality=95, max_pending=64):
+        if codec not in CODECS:
+            raise ValueError(f"未知的录制编码: {codec}（可选: {', '.join(CODECS)}）")
+        self.path = path
+        self.codec = codec
+        self.quality = quality
+        self.frames = 0
+        self.dropped = 0
+        self.bytes = 0
+        self._pending = queue.Queue(max_pending)
+        self._positions = []
+        self._start = None
+        self._file = None
+        self._thread = None
+        self._error = None
+
+    def start(self):
+        self._file = open(self.path, 'wb')
+        self._file.write(FILE_HEADER.pack(MAGIC, CODECS[self.codec]))
+        self._thread = threading.Thread(target=self._write_loop, name="cimbar-record", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, frame, offset=(0, 0), timestamp=None):
+        """记录一帧（在捕获线程中调用，只入队）；帧在入队后不能再被修改"""
+        now = time.perf_counter() if timestamp is None else timestamp
+        if self._start is None:
+            self._start = now
+        try:
+            self._pending.put_nowait((now - self._start, frame, offset))
+        except queue.Full:
+            self.dropped += 1
+
+    def _encode(self, frame):
+        if self.codec == 'raw':
+            return np.ascontiguousarray(frame).tobytes()
+        if self.codec == 'png':
+            ok, data = cv2.imencode('.png', frame, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        else:
+            ok, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise RuntimeError("帧编码失败")
+        return data.tobytes()
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+            timestamp, frame, (x, y) = item
+            try:
+                data = self._encode(frame)
+                height, width = frame.shape[:2]
+                channels = frame.shape[2] if frame.ndim == 3 else 1
+                self._positions.append(self._file.tell())
+                self._file.write(FRAME_HEADER.pack(timestamp, x, y, width, height, channels, len(data)))
+                self._file.write(data)
+            except Exception as e:
+                # 例如磁盘已满：停止录制，不影响解码
+                self._error = e
+                continue
+            self.frames += 1
+            self.bytes += len(data)
+
+    def close(self):
+        """写完已入队的帧和索引"""
+        if self._file is None:
+            return
+        self._pending.put(None)
+        self._thread.join()
+        if self._error is None:
+            index_position = self._file.tell()
+            self._file.write(struct.pack(f'<{len(self._positions)}Q', *self._positions))
+            self._file.write(INDEX_TRAILER.pack(index_position, len(self._positions), INDEX_MAGIC))
+        self._file.close()
+        self._file = None
+
+    @property
+    def error(self):
+        """录制因写入失败而停止时的异常"""
+        return self._error
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class RecordingReader:
+    """读取录制文件，read(i) / 迭代产生 (时间戳, 帧, 偏移)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        magic, codec = FILE_HEADER.unpack(self._file.read(FILE_HEADER.size))
+        if magic != MAGIC:
+            self._file.close()
+            raise ValueError(f"不是cimbar录制文件: {path}")
+        self.codec = {v: k for k, v in CODECS.items()}[codec]
+        self.positions = self._read_index()
+
+    def _read_index(self):
+        size = os.fstat(self._file.fileno()).st_size
+        if size >= FILE_HEADER.size + INDEX_TRAILER.size:
+            self._file.seek(size - INDEX_TRAILER.size)
+            position, count, magic = INDEX_TRAILER.unpack(self._file.read(INDEX_TRAILER.size))
+            if magic == INDEX_MAGIC:
+                self._file.seek(position)
+                return list(struct.unpack(f'<{count}Q', self._file.read(count * 8)))
+
+        # 没有索引（录制被中断）：顺序扫描记录头，忽略最后不完整的一帧
+        positions = []
+        position = FILE_HEADER.size
+        while position + FRAME_HEADER.size <= size:
+            self._file.seek(position)
+            length = FRAME_HEADER.unpack(self._file.read(FRAME_HEADER.size))[-1]
+            if position + FRAME_HEADER.size + length > size:
+                break
+            positions.append(position)
+            position += FRAME_HEADER.size + length
+        return positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def duration(self):
+        """第一帧到最后一帧的秒数"""
+        return self.timestamp(len(self) - 1) if self.positions else 0.0
+
+    def timestamp(self, index):
+        self._file.seek(self.positions[index])
+        return FRAME_HEADER.unpack(self._file.read(FRAME_HEADER.size))[0]
+
+    def read(self, index):
+        self._file.seek(self.positions[index])
+        timestamp, x, y, width, height, channels, length = FRAME_HEADER.unpack(self._file.read(FRAME_HEADER.size))
+        data = self._file.read(length)
+        if self.codec == 'raw':
+            frame = np.frombuffer(data, np.uint8).reshape(height, width, channels)
+        else:
+            frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+            if frame is None:
+                raise RuntimeError(f"无法解码第 {index} 帧")
+        return timestamp, frame, (x, y)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.read(index)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class RecordingSource:
+    """回放录制文件的捕获源（接口与MonitorSource相同）
+
+    realtime: 按录制时的时间间隔提供帧（复现原来的捕获节奏），否则每次grab()都立即返回下一帧
+    录制的帧可能只是跟踪区域，偏移原样返回；流水线请求的crop与录制的帧取交集。
+    放完时grab()抛出EOFError。
+    """
+
+    def __init__(self, path, realtime=True):
+        self.path = path
+        self.realtime = realtime
+        self.reader = None
+        self.index = 0
+        self.start_time = None
+
+    def open(self):
+        self.reader = RecordingReader(self.path)
+        self.index = 0
+        self.start_time = time.perf_counter()
+
+    def grab(self, crop=None):
+        if self.index >= len(self.reader):
+            raise EOFError("录制的帧已全部回放")
+        timestamp, frame, (x, y) = self.reader.read(self.index)
+        self.index += 1
+        if self.realtime:
+            delay = self.start_time + timestamp - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        if crop is not None:
+            # crop是捕获源坐标，换算到这一帧内
+            cx, cy, cw, ch = crop
+            crop = clip_crop((cx - x, cy - y, cw, ch), frame.shape[1], frame.shape[0])
+        if crop is None:
+            return frame, (x, y)
+        cx, cy, cw, ch = crop
+        return frame[cy:cy+ch, cx:cx+cw], (x + cx, y + cy)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Frame Ring - 基于共享内存的帧环形缓冲区
+捕获端把原始像素写入固定大小的槽位，解码端（子进程或native绑定）直接读取，
+不再经过PNG临时文件；解码跟不上时丢弃最旧的帧
+"""
+
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# 槽位状态
+FREE = 0
+WRITING = 1
+READY = 2
+READING = 3
+
+_SLOT_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('state', '<u4'),
+    ('height', '<u4'),
+    ('width', '<u4'),
+    ('channels', '<u4'),
+    ('timestamp', '<f8'),
+])
+_RING_DTYPE = np.dtype([
+    ('write_seq', '<u8'),
+    ('read_seq', '<u8'),
+    ('dropped', '<u8'),
+])
+
+
+def _align(n, alignment=64):
+    return (n + alignment - 1) // alignment * alignment
+
+
+class _NoResourceTracker:
+    """不登记也不注销的resource_tracker，附加共享内存时临时替换shared_memory模块中的引用"""
+
+    @staticmethod
+    def register(name, rtype):
+        pass
+
+    @staticmethod
+    def unregister(name, rtype):
+        pass
+
+
+_attach_lock = threading.Lock()
+
+
+def _attach_untracked(name):
+    """附加已有的共享内存，不登记到resource_tracker
+
+    附加方登记后，它的resource_tracker会在退出时删除共享内存（创建方还在使用）；
+    和同一个tracker共用时，单独unregister又会把创建方的登记一起删掉。
+    Python 3.13+用track=False，之前的版本在构造期间把shared_memory使用的resource_tracker换成空实现。
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    with _attach_lock:
+        tracker = shared_memory.resource_tracker
+        shared_memory.resource_tracker = _NoResourceTracker
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            shared_memory.resource_tracker = tracker
+
+
+class RingFrame:
+    """环形缓冲区中的一帧（只读视图，release之前槽位不会被覆盖）"""
+
+    def __init__(self, ring, slot, seq, image, timestamp):
+        self.ring = ring
+        self.slot = slot
+        self.seq = seq
+        self.image = image
+        self.timestamp = timestamp
+
+    def release(self):
+        if self.ring is not None:
+            self.ring.release(self)
+            self.ring = None
+            self.image = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class FrameRing:
+    """multiprocessing.shared_memory上的帧环形缓冲区
+
+    槽位头部记录序号和帧尺寸，状态切换由一把跨进程锁保护（只在更新头部时持有，
+    拷贝像素时不持锁）。FrameRing可以作为multiprocessing.Process的参数传给子进程，
+    子进程会自动附加到同一块共享内存。
+    """
+
+    def __init__(self, slots=4, max_shape=(2160, 3840, 4), name=None, lock=None, create=True):
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.slot_size = _align(int(np.prod(self.max_shape)))
+        self._header_size = _align(_RING_DTYPE.itemsize + _SLOT_DTYPE.itemsize * slots)
+        # 创建共享内存的进程号：fork出的子进程直接继承这个对象（不经过__setstate__），不能由它删除共享内存
+        self._owner = os.getpid() if create else None
+
+        size = self._header_size + self.slot_size * slots
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = _attach_untracked(name)
+        self.name = self.shm.name
+        self._cond = multiprocessing.Condition(lock)
+        self._map()
+        if create:
+            self._ring[...] = 0
+            self._headers[...] = 0
+
+    def _map(self):
+        buf = self.shm.buf
+        self._ring = np.ndarray((), dtype=_RING_DTYPE, buffer=buf)
+        self._headers = np.ndarray((self.slots,), dtype=_SLOT_DTYPE, buffer=buf, offset=_RING_DTYPE.itemsize)
+        self._pixels = np.ndarray((self.slots, self.slot_size), dtype=np.uint8, buffer=buf, offset=self._header_size)
+
+    def __getstate__(self):
+        # 传给子进程时只传名字和锁，子进程重新附加共享内存
+        return {
+            'slots': self.slots,
+            'max_shape': self.max_shape,
+            'name': self.name,
+            'cond': self._cond,
+        }
+
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.max_shape = state['max_shape']
+        self.slot_size = _align(int(np.prod(self.max_shape)))
+        self._header_size = _align(_RING_DTYPE.itemsize + _SLOT_DTYPE.itemsize * self.slots)
+        self._owner = None
+        # 附加方不登记到resource_tracker，避免子进程退出时误删共享内存
+        self.shm = _attach_untracked(state['name'])
+        self.name = self.shm.name
+        self._cond = state['cond']
+        self._map()
+
+    @property
+    def dropped(self):
+        """因解码跟不上而被覆盖的帧数"""
+        return int(self._ring['dropped'])
+
+    @property
+    def written(self):
+        return int(self._ring['write_seq'])
+
+    def write(self, image, timestamp=None):
+        """写入一帧（拷贝一次像素），返回帧序号；没有可用槽位时返回None"""
+        if image.ndim == 2:
+            image = image[:, :, np.newaxis]
+        height, width, channels = image.shape
+        nbytes = height * width * channels
+        if nbytes > self.slot_size or image.dtype != np.uint8:
+            raise ValueError(f"帧 {image.shape} {image.dtype} 超出槽位容量 {self.max_shape}")
+
+        with self._cond:
+            slot = self._claim_slot()
+            if slot is None:
+                return None
+            seq = int(self._ring['write_seq']) + 1
+            self._ring['write_seq'] = seq
+            header = self._headers[slot]
+            header['state'] = WRITING
+
+        dest = self._pixels[slot, :nbytes].reshape(height, width, channels)
+        np.copyto(dest, image)
+
+        with self._cond:
+            header = self._headers[slot]
+            header['seq'] = seq
+            header['height'] = height
+            header['width'] = width
+            header['channels'] = channels
+            header['timestamp'] = time.time() if timestamp is None else timestamp
+            header['state'] = READY
+            self._cond.notify_all()
+        return seq
+
+    def _claim_slot(self):
+        """优先使用空闲槽位，否则覆盖最旧的未读帧（计入丢帧）"""
+        states = self._headers['state']
+        free = np.flatnonzero(states == FREE)
+        if free.size:
+            return int(free[0])
+
+        ready = np.flatnonzero(states == READY)
+        if not ready.size:
+            return None
+        oldest = int(ready[np.argmin(self._headers['seq'][ready])])
+        self._ring['dropped'] += 1
+        return oldest
+
+    def acquire(self, timeout=None, latest=False):
+        """取出一帧（按顺序或只取最新帧），返回RingFrame；超时返回None
+
+        latest=True时，比最新帧更旧的未读帧都会被丢弃。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                ready = np.flatnonzero(self._headers['state'] == READY)
+                if ready.size:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+            seqs = self._headers['seq'][ready]
+            slot = int(ready[np.argmax(seqs)] if latest else ready[np.argmin(seqs)])
+            if latest:
+                for stale in ready:
+                    if stale != slot:
+                        self._headers[stale]['state'] = FREE
+                        self._ring['dropped'] += 1
+
+            header = self._headers[slot]
+            header['state'] = READING
+            seq = int(header['seq'])
+            shape = (int(header['height']), int(header['width']), int(header['channels']))
+            timestamp = float(header['timestamp'])
+            self._ring['read_seq'] = seq
+
+        image = self._pixels[slot, :int(np.prod(shape))].reshape(shape)
+        return RingFrame(self, slot, seq, image, timestamp)
+
+    def release(self, frame):
+        with self._cond:
+            header = self._headers[frame.slot]
+            if int(header['seq']) == frame.seq:
+                header['state'] = FREE
+            self._cond.notify_all()
+
+    def close(self):
+        """断开共享内存（创建它的进程同时释放它）"""
+        self._ring = self._headers = self._pixels = None
+        self.shm.close()
+        if self._owner == os.getpid():
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def ring_decode_worker(ring, results, cimbar_path, output_dir, use_native=True, stop=None):
+    """解码子进程：从环形缓冲区取帧解码，把 (序号, 字节数, 新文件, 数据流进度) 放入results队列"""
+    import cimbar_native
+    from cimbar_session import CimbarDecodeSession
+
+    native = None
+    session = None
+    temp_path = None
+    if use_native and cimbar_native.is_available():
+        native = cimbar_native.Decoder(output_dir)
+    else:
+        import cv2
+        session = CimbarDecodeSession(cimbar_path, output_dir)
+        fd, temp_path = tempfile.mkstemp(prefix="cimbar_frame_", suffix=".png")
+        os.close(fd)
+
+    try:
+        while stop is None or not stop.is_set():
+            frame = ring.acquire(timeout=0.2)
+            if frame is None:
+                continue
+            with frame:
+                try:
+                    if native is not None:
+                        # 直接读取共享内存中的像素
+                        nbytes, new_files, _ = native.decode(frame.image)
+                        streams = native.streams()
+                    else:
+                        cv2.imwrite(temp_path, frame.image)
+                        nbytes, new_files = session.decode_file(temp_path)
+                        streams = session.streams
+                except Exception as e:
+                    results.put((frame.seq, -1, str(e), []))
+                    continue
+            results.put((frame.seq, nbytes, new_files, [tuple(st) for st in streams]))
+    finally:
+        if native is not None:
+            native.close()
+        if session is not None:
+            session.close()
+            os.remove(temp_path)
+        ring.close()
+
+
+class RingDecoder:
+    """在子进程中解码的前端：submit()写入共享内存环，poll()取回解码结果"""
+
+    def __init__(self, cimbar_path, output_dir, slots=4, max_shape=(2160, 3840, 4), use_native=True):
+        self.ring = FrameRing(slots=slots, max_shape=max_shape)
+        self.results = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(
+            target=ring_decode_worker,
+            args=(self.ring, self.results, cimbar_path, output_dir, use_native, self.stop_event),
+            daemon=True,
+        )
+
+    def start(self):
+        self.process.start()
+        return self
+
+    def submit(self, image, timestamp=None):
+        return self.ring.write(image, timestamp)
+
+    def poll(self):
+        """取回所有已完成的解码结果"""
+        done = []
+        while True:
+            try:
+                done.append(self.results.get_nowait())
+            except queue.Empty:
+                return done
+
+    def close(self):
+        self.stop_event.set()
+        if self.process.is_alive():
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.ring.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi Source - 同时监控多个捕获源
+每个捕获源有自己的捕获/检测流水线和自己的fountain sink（输出到各自的子目录），
+检测到的区域交给DecodeScheduler，由共享的解码线程按各源产生新数据的多少分配解码时间：
+正在传输的源得到大部分CPU，空闲的屏幕只在解码线程有空时才被探测，不会拖慢正在进行的传输。
+"""
+
+import os
+import re
+import tempfile
+import threading
+import time
+
+import cv2
+
+import cimbar_native
+from cimbar_session import CimbarDecodeSession
+from completion import CompletedIndex
+from frame_dedup import FrameDeduplicator
+from pipeline import DecodePipeline, MonitorSource, WindowSource
+from progress import ProgressTracker
+from roi_tracker import RoiTracker
+from video_decode import VideoSource
+
+
+def parse_source_spec(spec, backend='auto'):
+    """把 monitor:1 / window:标题 / video:路径或设备号 解析为捕获源，纯数字视为显示器编号
+
+    backend: 显示器和窗口使用的屏幕捕获后端（见capture_backends.py）
+    """
+    kind, sep, value = spec.partition(':')
+    if not sep:
+        if spec.isdigit():
+            return MonitorSource(int(spec), backend)
+        raise ValueError(f"无法识别的捕获源: {spec}（应为 monitor:N、window:标题 或 video:路径）")
+    if kind == 'monitor':
+        return MonitorSource(int(value), backend)
+    if kind == 'window':
+        return WindowSource(value, backend)
+    if kind == 'video':
+        return VideoSource(value)
+    raise ValueError(f"无法识别的捕获源类型: {kind}")
+
+
+def channel_name(index, spec):
+    """输出子目录名，例如 1-monitor-2 / 2-window-Chrome"""
+    slug = re.sub(r'[^\w.-]+', '-', spec.replace(':', '-')).strip('-')[:40]
+    return f"{index}-{slug}"
+
+
+class FrameDecoder:
+    """一个捕获源的解码会话：libcimbar_py，或常驻cimbar进程（写临时PNG）"""
+
+    def __init__(self, output_dir, cimbar_path="./cimbar", use_native=True):
+        self.output_dir = output_dir
+        self.native = None
+        self.session = None
+        self.temp_path = None
+        if use_native and cimbar_native.is_available():
+            self.native = cimbar_native.Decoder(output_dir)
+        else:
+            self.session = CimbarDecodeSession(cimbar_path, output_dir)
+            fd, self.temp_path = tempfile.mkstemp(prefix="cimbar_frame_", suffix=".png")
+            os.close(fd)
+
+    def decode(self, roi):
+        """返回 (解码字节数, 新完成的文件, 数据流进度)"""
+        if self.native is not None:
+            result = self.native.decode(roi)
+            return result.bytes, result.new_files, self.native.streams()
+        cv2.imwrite(self.temp_path, roi)
+        nbytes, new_files = self.session.decode_file(self.temp_path)
+        return nbytes, new_files, self.session.streams
+
+    def close(self):
+        if self.native is not None:
+            self.native.close()
+        if self.session is not None:
+            self.session.close()
+            os.remove(self.temp_path)
+
+
+class SourceChannel:
+    """一个捕获源：流水线、解码会话、待解码的最新区域和调度状态"""
+
+    def __init__(self, name, source, decoder):
+        self.name = name
+        self.source = source
+        self.decoder = decoder
+        self.pipeline = None
+        self.dedup = None
+        self.progress = ProgressTracker()
+        self.completed = CompletedIndex()
+
+        self.pending = None
+        self.pending_hash = None  # 待解码区域的重复帧哈希，解出数据后记入dedup
+        self.busy = False
+        self.vtime = 0.0
+        self.yield_rate = None
+        self.decodes = 0
+        self.decode_time = 0.0
+        self.new_blocks = 0
+        self.replaced = 0
+
+
+class DecodeScheduler:
+    """在多个捕获源之间分配解码线程（按比例分配CPU时间的stride调度）
+
+    每个源的权重是最近每次解码得到的新块数（指数平滑），不低于min_weight；
+    每次解码后该源的虚拟时间增加 解码耗时/权重，空闲的解码线程总是挑选有待解码区域、虚拟时间最小的源。
+    同一个源同时只有一个解码线程（每个源一个fountain sink）。没有其他源等待时，空闲的源也会被解码。
+    """
+
+    def __init__(self, channels, workers=None, min_weight=0.2, smoothing=0.3, on_result=None, on_error=None):
+        self.channels = list(channels)
+        self.workers = max(1, workers or min(len(self.channels), os.cpu_count() or 1))
+        self.min_weight = min_weight
+        self.smoothing = smoothing
+        self.on_result = on_result or (lambda channel, nbytes, new_files: None)
+        self.on_error = on_error or (lambda channel, e: None)
+        self.clock = 0.0
+        self._cond = threading.Condition()
+        self._stop = False
+        self._threads = []
+
+    def offer(self, channel, roi):
+        """流水线的解码回调：记录源的最新区域（未解码的旧区域被替换）
+
+        解码是异步的，返回None；解出数据后由解码线程把区域的哈希记入channel.dedup
+        """
+        with self._cond:
+            if channel.pending is not None:
+                channel.replaced += 1
+            channel.pending = roi
+            channel.pending_hash = channel.dedup.last_hash if channel.dedup is not None else None
+            self._cond.notify()
+
+    def weight(self, channel):
+        # 还没有解码过的源按活跃源对待，先让它证明自己有没有数据
+        rate = 1.0 if channel.yield_rate is None else channel.yield_rate
+        return max(self.min_weight, rate)
+
+    def _next(self):
+        with self._cond:
+            while not self._stop:
+                ready = [c for c in self.channels if c.pending is not None and not c.busy]
+                if ready:
+                    channel = min(ready, key=lambda c: max(c.vtime, self.clock))
+                    # 空闲期间不积累额度，否则长期空闲的源一旦有画面会独占解码线程
+                    channel.vtime = max(channel.vtime, self.clock)
+                    self.clock = channel.vtime
+                    roi, channel.pending = channel.pending, None
+                    dedup_hash, channel.pending_hash = channel.pending_hash, None
+                    channel.busy = True
+                    return channel, roi, dedup_hash
+                self._cond.wait()
+        return None, None, None
+
+    def _worker(self):
+        while True:
+            channel, roi, dedup_hash = self._next()
+            if channel is None:
+                return
+            start = time.perf_counter()
+            try:
+                nbytes, new_files, streams = channel.decoder.decode(roi)
+            except Exception as e:
+                nbytes, new_files, streams = 0, [], []
+                self.on_error(channel, e)
+            elapsed = time.perf_counter() - start
+            if nbytes > 0 and dedup_hash is not None:
+                channel.dedup.record(dedup_hash)
+
+            new_files = [entry.path for entry in map(channel.completed.add, new_files) if entry]
+            # 本次解码新收到的块数；完成的文件按1计（它的数据流已经从sink中移除）
+            before = channel.progress.new_blocks
+            channel.progress.update(streams, new_files)
+            new_blocks = channel.progress.new_blocks - before + len(new_files)
+            with self._cond:
+                channel.decodes += 1
+                channel.decode_time += elapsed
+                channel.new_blocks += new_blocks
+                if channel.yield_rate is None:
+                    channel.yield_rate = float(new_blocks)
+                else:
+                    channel.yield_rate += self.smoothing * (new_blocks - channel.yield_rate)
+                channel.vtime += elapsed / self.weight(channel)
+                channel.busy = False
+                self._cond.notify()
+            self.on_result(channel, nbytes, new_files)
+
+    def start(self):
+        self._stop = False
+        self._threads = [threading.Thread(target=self._worker, name=f"cimbar-sched-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+
+    def shares(self):
+        """各个源占用的解码时间比例"""
+        total = sum(c.decode_time for c in self.channels)
+        return {c.name: (c.decode_time / total if total else 0.0) for c in self.channels}
+
+
+class MultiSourceDecoder:
+    """同时监控多个捕获源，每个源的文件写入 output_dir/<源名称>
+
+    specs: 捕获源描述（见parse_source_spec）
+    workers: 共享的解码线程数（默认 min(源数, CPU核数)）
+    """
+
+    def __init__(self, specs, output_dir, detect, workers=None, cimbar_path="./cimbar", use_native=True,
+                 fps=60.0, dedup_threshold=None, track_roi=True, rescan_interval=2.0,
+                 on_result=None, on_error=None, capture_backend='auto'):
+        self.output_dir = output_dir
+        self.detect = detect
+        self.fps = fps
+        self.dedup_threshold = dedup_threshold
+        self.track_roi = track_roi
+        self.rescan_interval = rescan_interval
+        self.on_error = on_error or (lambda channel, stage, e: None)
+        self.channels = []
+        for index, spec in enumerate(specs, 1):
+            name = channel_name(index, spec)
+            directory = os.path.join(output_dir, name)
+            os.makedirs(directory, exist_ok=True)
+            self.channels.append(SourceChannel(name, parse_source_spec(spec, capture_backend),
+                                               FrameDecoder(directory, cimbar_path, use_native)))
+        self.scheduler = DecodeScheduler(self.channels, workers, on_result=on_result,
+                                         on_error=lambda channel, e: self.on_error(channel, 'decode', e))
+
+    def start(self):
+        self.scheduler.start()
+        for channel in self.channels:
+            channel.dedup = None
+            if self.dedup_threshold is None or self.dedup_threshold >= 0:
+                channel.dedup = FrameDeduplicator(threshold=self.dedup_threshold)
+            channel.pipeline = DecodePipeline(
+                channel.source,
+                detect=self.detect,
+                decode=lambda roi, bbox, channel=channel: self.scheduler.offer(channel, roi),
+                fps=self.fps,
+                on_error=lambda stage, e, channel=channel: self.on_error(channel, stage, e),
+                dedup=channel.dedup,
+                tracker=RoiTracker(rescan_interval=self.rescan_interval) if self.track_roi else None,
+            ).start()
+        return self
+
+    def is_running(self):
+        """还有捕获源在运行"""
+        return any(c.pipeline is not None and c.pipeline.is_running() for c in self.channels)
+
+    def stop(self):
+        for channel in self.channels:
+            if channel.pipeline is not None:
+                channel.pipeline.stop()
+        self.scheduler.stop()
+
+    def close(self):
+        self.stop()
+        for channel in self.channels:
+            channel.decoder.close()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perspective - 透视校正到解码器的标准网格
+两个前端都以 --no-deskew 调用解码器（跳过Extractor对整个区域的定位标记扫描），解码器把输入当作已经提取好的
+image_size x image_size 图像。屏幕捕获带来的倾斜、透视和缩放如果不校正就会直接导致解码失败。
+
+PerspectiveNormalizer用检测器给出的定位标记中心（或角点）做一次warpPerspective，得到与Extractor输出相同的
+1024x1024图像；区域稳定时沿用缓存的单应矩阵，稳定状态下每帧只需要一次warp。
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+
+class PerspectiveNormalizer:
+    """把检测到的码校正为标准网格
+
+    size / anchor_offset: 输出边长和定位标记中心到边缘的距离，与cimbar::Config的image_size() / anchor_size()一致
+    tolerance: 检测到的点移动不超过这么多像素时沿用缓存的单应矩阵
+    cache_size: 缓存的单应矩阵数（同时有多个候选或多个捕获源时各占一个）
+    """
+
+    def __init__(self, size=1024, anchor_offset=30, tolerance=1.5, cache_size=4, interpolation=cv2.INTER_LINEAR):
+        self.size = size
+        self.tolerance = tolerance
+        self.cache_size = cache_size
+        self.interpolation = interpolation
+        # 顺序与Detection.corners / centers相同：左上、右上、右下、左下
+        far = size - anchor_offset
+        self._center_targets = np.array([[anchor_offset, anchor_offset], [far, anchor_offset],
+                                         [far, far], [anchor_offset, far]], dtype=np.float32)
+        self._corner_targets = np.array([[0, 0], [size, 0], [size, size], [0, size]], dtype=np.float32)
+        self._cache = []  # [(源点, 单应矩阵)]，最近使用的在前
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def homography(self, detection):
+        """检测结果到标准网格的单应矩阵：有定位标记中心时用中心（与Extractor相同），否则用四个角点"""
+        if detection.centers is not None:
+            points, targets = np.asarray(detection.centers, dtype=np.float32), self._center_targets
+        else:
+            points, targets = np.asarray(detection.corners, dtype=np.float32), self._corner_targets
+
+        with self._lock:
+            for i, (cached, matrix) in enumerate(self._cache):
+                if np.abs(cached - points).max() <= self.tolerance:
+                    if i:
+                        self._cache.insert(0, self._cache.pop(i))
+                    self.hits += 1
+                    return matrix
+
+        matrix = cv2.getPerspectiveTransform(points, targets)
+        with self._lock:
+            self.misses += 1
+            self._cache.insert(0, (points, matrix))
+            del self._cache[self.cache_size:]
+        return matrix
+
+    def warp(self, image, detection):
+        """返回 size x size 的校正图像（检测结果的坐标相对于image）"""
+        return cv2.warpPerspective(image, self.homography(detection), (self.size, self.size),
+                                   flags=self.interpolation, borderMode=cv2.BORDER_REPLICATE)
+
+    def clear(self):
+        with self._lock:
+            self._cache = []
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cimbar Pipeline - 捕获 → 检测 → 解码 流水线
+三个阶段运行在各自的线程中，用有界队列连接，队列满时丢弃最旧的帧（最新帧优先），
+捕获不再等待解码，解码总是处理最新的帧
+"""
+
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from capture_backends import create_backend
+from roi_tracker import clip_crop
+from stage_stats import StageStats
+
+try:
+    import pygetwindow as gw
+except ImportError:
+    gw = None
+
+
+class LatestQueue:
+    """有界队列，满时丢弃最旧的元素"""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """取出最旧的元素，超时或队列关闭时返回None"""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class MonitorSource:
+    """捕获整个显示器
+
+    backend: 捕获后端名称（见capture_backends.BACKENDS），默认auto选择开销最低的可用后端
+    """
+
+    def __init__(self, monitor_index=1, backend='auto'):
+        self.monitor_index = monitor_index
+        self.backend_name = backend
+        self.backend = None
+        self.region = None
+
+    def open(self):
+        # 捕获后端（mss实例、X连接）不能跨线程使用，必须在捕获线程中创建
+        self.backend = create_backend(self.backend_name)
+        monitors = self.backend.monitors()
+        if self.monitor_index >= len(monitors):
+            raise ValueError(f"显示器索引 {self.monitor_index} 无效")
+        self.region = monitors[self.monitor_index]
+
+    def grab(self, crop=None):
+        """返回 (BGRA帧, 帧左上角在捕获源中的坐标)；crop为 (x, y, w, h) 时只捕获该区域"""
+        region = self.region
+        offset = (0, 0)
+        if crop is not None:
+            crop = clip_crop(crop, region['width'], region['height'])
+        if crop is not None:
+            x, y, w, h = crop
+            region = {'left': region['left'] + x, 'top': region['top'] + y, 'width': w, 'height': h}
+            offset = (x, y)
+        return self.backend.grab(region), offset
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+
+
+class WindowSource(MonitorSource):
+    """捕获特定窗口（每次捕获都更新窗口位置，窗口可能被移动）"""
+
+    def __init__(self, window_title, backend='auto'):
+        super().__init__(backend=backend)
+        self.window_title = window_title
+
+    def open(self):
+        if gw is None:
+            raise RuntimeError("pygetwindow未安装，无法使用窗口监控功能")
+        self.backend = create_backend(self.backend_name)
+
+    def grab(self, crop=None):
+        windows = gw.getWindowsWithTitle(self.window_title)
+        if not windows:
+            raise RuntimeError(f"找不到窗口 '{self.window_title}'")
+        window = windows[0]
+        self.region = {
+            'left': window.left,
+            'top': window.top,
+            'width': window.width,
+            'height': window.height
+        }
+        return super().grab(crop)
+
+
+class DecodePipeline:
+    """捕获、检测、解码分别在独立线程中运行的流水线
+
+    source: 提供open()/grab(crop)/close()的捕获源，grab()返回 (BGRA帧, 偏移)
+    detect: detect(bgr_image) -> (found, roi, bbox)，可以有多个检测线程并行调用；
+            roi和bbox也可以是按优先级排序的等长列表（多个候选区域），此时decode收到的也是列表
+    decode: decode(roi, bbox) 在解码线程中调用，返回真值表示解出了数据（这一帧计入重复帧过滤）；
+            异步解码时结果还不知道，返回None，由解码端在解出数据后自己调用dedup.record()
+    rank: 可选，rank(bboxes) 返回候选区域的尝试顺序（下标列表，bbox为捕获源坐标），
+          区域跟踪和重复帧过滤使用排在第一的候选
+    dedup: 可选的FrameDeduplicator，与最近解出数据的帧相似的ROI直接跳过
+    tracker: 可选的RoiTracker，命中后只捕获和检测码所在的区域
+    stats: StageStats，记录grab/convert/detect/queue阶段耗时（handoff/decode/discover由解码回调记录）
+    recorder: 可选的FrameRecorder，录制捕获到的每一帧（用于回放复现）
+    """
+
+    def __init__(self, source, detect, decode, detect_workers=1, fps=60.0,
+                 decode_interval=0.0, queue_size=1, on_error=None, dedup=None, tracker=None, stats=None,
+                 recorder=None, rank=None):
+        self.source = source
+        self.detect = detect
+        self.decode = decode
+        self.dedup = dedup
+        self.tracker = tracker
+        self.recorder = recorder
+        self.rank = rank
+        self.detect_workers = max(1, detect_workers)
+        self.fps = fps
+        self.decode_interval = decode_interval
+        self.on_error = on_error or (lambda stage, e: None)
+
+        self.frames = LatestQueue(queue_size)
+        self.rois = LatestQueue(queue_size)
+        self.stop_event = threading.Event()
+        self.threads = []
+
+        self.captured = 0
+        self.detected = 0
+        self.decoded = 0
+        self.stale = 0
+        self.start_time = None
+        self.latest_frame = None
+        self.latest_capture = None  # (帧, 偏移)，跟踪区域时帧只是画面的一部分
+        # 检测耗时统计：整帧扫描 / 跟踪区域，各为 [帧数, 总秒数]
+        self.detect_time = {'full': [0, 0.0], 'tracked': [0, 0.0]}
+        self._last_roi_seq = 0
+        self._lock = threading.Lock()
+
+        self.stats = stats if stats is not None else StageStats()
+        for name in ('captured', 'detected', 'decoded', 'deduplicated', 'dropped', 'stale'):
+            self.stats.watch(name, lambda name=name: getattr(self, name))
+
+    @property
+    def dropped(self):
+        """被更新的帧替换掉的帧数"""
+        return self.frames.dropped + self.rois.dropped + self.stale
+
+    @property
+    def deduplicated(self):
+        """因与最近解码的帧重复而跳过的帧数"""
+        return self.dedup.skipped if self.dedup is not None else 0
+
+    def detect_ms(self, kind):
+        """平均每帧检测耗时（毫秒），kind为 'full' 或 'tracked'"""
+        count, total = self.detect_time[kind]
+        return total * 1000.0 / count if count else 0.0
+
+    def start(self):
+        self.start_time = time.time()
+        self.threads = [threading.Thread(target=self._capture_loop, name="cimbar-capture", daemon=True)]
+        self.threads += [threading.Thread(target=self._detect_loop, name=f"cimbar-detect-{i}", daemon=True)
+                         for i in range(self.detect_workers)]
+        self.threads.append(threading.Thread(target=self._decode_loop, name="cimbar-decode", daemon=True))
+        for t in self.threads:
+            t.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.frames.close()
+        self.rois.close()
+        for t in self.threads:
+            if t is not threading.current_thread():
+                t.join(timeout=5)
+
+    def is_running(self):
+        return not self.stop_event.is_set()
+
+    def wait(self, timeout=None):
+        """等待流水线结束（出错或被stop），返回是否已结束"""
+        return self.stop_event.wait(timeout)
+
+    def _capture_loop(self):
+        try:
+            self.source.open()
+            next_time = time.perf_counter()
+            while not self.stop_event.is_set():
+                crop = self.tracker.next_crop() if self.tracker is not None else None
+                with self.stats.time('grab'):
+                    frame, offset = self.source.grab(crop)
+                self.captured += 1
+                self.latest_frame = frame
+                self.latest_capture = (frame, offset)
+                if self.recorder is not None:
+                    self.recorder.write(frame, offset)
+                self.frames.put((self.captured, frame, offset, crop is not None))
+
+                # 按目标帧率节拍捕获，解码的快慢不影响捕获（fps可以在运行中调整）
+                next_time += 1.0 / self.fps if self.fps > 0 else 0
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_time = time.perf_counter()
+        except Exception as e:
+            self.on_error('capture', e)
+            self.stop_event.set()
+        finally:
+            self.source.close()
+            self.frames.close()
+
+    def _detect_loop(self):
+        while not self.stop_event.is_set():
+            item = self.frames.get(timeout=0.5)
+            if item is None:
+                continue
+            seq, frame, offset, tracked = item
+            try:
+                start = time.perf_counter()
+                image = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR) if frame.shape[2] == 4 else frame
+                converted = time.perf_counter()
+                found, roi, bbox = self.detect(image)
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                self.on_error('detect', e)
+                continue
+            self.stats.record('convert', converted - start)
+            self.stats.record('detect', elapsed - (converted - start))
+
+            best = bbox
+            if found and isinstance(bbox, list):
+                # 多个候选：全部换算成捕获源坐标后排序
+                bbox = [(x + offset[0], y + offset[1], w, h) for x, y, w, h in bbox]
+                if self.rank is not None:
+                    order = self.rank(bbox)
+                    roi, bbox = [roi[i] for i in order], [bbox[i] for i in order]
+                best = bbox[0]
+            elif found:
+                # 检测结果换算成捕获源坐标
+                x, y, w, h = bbox
+                best = bbox = (x + offset[0], y + offset[1], w, h)
+            with self._lock:
+                timing = self.detect_time['tracked' if tracked else 'full']
+                timing[0] += 1
+                timing[1] += elapsed
+            if self.tracker is not None:
+                self.tracker.update(tracked, found, best)
+            if not found:
+                continue
+            with self._lock:
+                self.detected += 1
+                # 多个检测线程可能乱序完成，比已交给解码的帧更旧的结果直接丢弃
+                if seq <= self._last_roi_seq:
+                    self.stale += 1
+                    continue
+                self._last_roi_seq = seq
+            self.rois.put((seq, roi, bbox, time.perf_counter()))
+
+    def _decode_loop(self):
+        last_decode = 0
+        while not self.stop_event.is_set():
+            item = self.rois.get(timeout=0.5)
+            if item is None:
+                continue
+            if self.decode_interval > 0:
+                wait = last_decode + self.decode_interval - time.perf_counter()
+                if wait > 0:
+                    # 限速时等待，然后换成等待期间到达的最新帧
+                    time.sleep(wait)
+                    item = self.rois.get(timeout=0) or item
+            seq, roi, bbox, queued = item
+            # 检测完成到解码线程取走之间的等待时间
+            self.stats.record('queue', time.perf_counter() - queued)
+            dedup_hash = None
+            if self.dedup is not None:
+                if self.dedup.is_duplicate(roi[0] if isinstance(roi, list) else roi):
+                    continue
+                dedup_hash = self.dedup.last_hash
+            try:
+                if self.decode(roi, bbox) and dedup_hash is not None:
+                    # 只记录解出了数据的帧，解码失败的帧不会让之后相似的帧被跳过
+                    self.dedup.record(dedup_hash)
+            except Exception as e:
+                self.on_error('decode', e)
+            last_decode = time.perf_counter()
+            self.decoded += 1
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Progress - fountain解码进度事件
+解码器每帧报告未完成数据流的状态（槽位、已收到块数、需要的块数、文件大小，
+来自libcimbar_py的streams()或cimbar --progress输出的JSON行），
+ProgressTracker据此计算每个文件的完成百分比和预计剩余时间，产生结构化事件：
+
+  {"event": "progress", "slot": 3, "blocks": 120, "required": 300, "size": 2000000, "percent": 40.0, "eta": 3.2}
+  {"event": "complete", "path": "/tmp/out/1234.2000000", "size": 2000000}
+
+所有预期文件完成后 done 为True（调用方据此停止捕获）；没有未完成数据流时 idle 为True（可降低解码频率）。
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class FileProgress:
+    """一个数据流的进度，按首次出现以来的收块速度估计剩余时间"""
+
+    def __init__(self, slot, blocks, required, size, now):
+        self.slot = slot
+        self.required = required
+        self.size = size
+        self.blocks = blocks
+        self.start_time = now
+        self.start_blocks = blocks
+        self.updated = now
+
+    def update(self, blocks, now):
+        changed = blocks != self.blocks
+        self.blocks = blocks
+        self.updated = now
+        return changed
+
+    @property
+    def percent(self):
+        return min(100.0, self.blocks * 100.0 / self.required) if self.required else 0.0
+
+    @property
+    def eta(self):
+        """预计剩余秒数，还没有足够数据估计速度时为None"""
+        elapsed = self.updated - self.start_time
+        received = self.blocks - self.start_blocks
+        if elapsed <= 0 or received <= 0:
+            return None
+        return max(0, self.required - self.blocks) * elapsed / received
+
+    def event(self):
+        eta = self.eta
+        return {
+            'event': 'progress',
+            'slot': self.slot,
+            'blocks': self.blocks,
+            'required': self.required,
+            'size': self.size,
+            'percent': round(self.percent, 1),
+            'eta': None if eta is None else round(eta, 1),
+        }
+
+    def describe(self):
+        eta = self.eta
+        return f"{self.size}字节 {self.percent:.0f}% ETA {'?' if eta is None else f'{eta:.0f}s'}"
+
+
+def json_line(event):
+    """事件序列化为一行JSON"""
+    return json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+
+
+class ProgressTracker:
+    """线程安全的进度跟踪
+
+    expected_files: 预期文件数，全部完成后 done 为True（None表示一直接收）
+    on_event: 每个事件（dict）的回调，例如打印JSON行
+    """
+
+    def __init__(self, expected_files=None, on_event=None):
+        self.expected_files = expected_files
+        self.on_event = on_event
+        self.files = {}
+        self.completed = []
+        self.new_blocks = 0  # 累计收到的新fountain块数（各数据流块数的增量之和）
+        self._lock = threading.Lock()
+
+    def update(self, streams, new_files=(), now=None):
+        """用解码器报告的数据流状态（StreamStatus或 (slot, blocks, required, size)）更新进度，返回产生的事件"""
+        now = time.time() if now is None else now
+        events = []
+        with self._lock:
+            current = {}
+            for slot, blocks, required, size in streams:
+                progress = self.files.get(slot)
+                # 同一槽位换成了另一个文件（大小不同或块数回退），重新计时
+                if progress is None or progress.size != size or blocks < progress.blocks:
+                    self.new_blocks += blocks
+                    progress = FileProgress(slot, blocks, required, size, now)
+                    events.append(progress.event())
+                else:
+                    self.new_blocks += blocks - progress.blocks
+                    if progress.update(blocks, now):
+                        events.append(progress.event())
+                current[slot] = progress
+            # 不再报告的数据流已经完成（sink完成后会移除数据流）
+            self.files = current
+
+            for path in new_files:
+                self.completed.append(path)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    size = None
+                events.append({'event': 'complete', 'path': path, 'size': size})
+
+        if self.on_event is not None:
+            for event in events:
+                self.on_event(event)
+        return events
+
+    @property
+    def done(self):
+        """预期文件是否已全部完成"""
+        return self.expected_files is not None and len(self.completed) >= self.expected_files
+
+    @property
+    def idle(self):
+        """已经完成过文件，且当前没有未完成的数据流"""
+        return bool(self.completed) and not self.files
+
+    def status_line(self):
+        """每个未完成文件的进度，例如 "槽位3: 2000000字节 40% ETA 3s" """
+        with self._lock:
+            files = sorted(self.files.values(), key=lambda p: p.slot)
+        return ', '.join(f"槽位{p.slot}: {p.describe()}" for p in files)
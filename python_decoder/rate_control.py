@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rate Control - 自适应捕获/解码频率
+根据观测到的信号调整流水线的捕获帧率（pipeline.fps）和最小解码间隔（pipeline.decode_interval）：
+
+- 检测命中率：画面上没有cimbar码时降到很低的探测帧率
+- 每次解码得到的新fountain块数：正在传输时逐步提高到最高帧率，码还在但没有新数据（已经收完）时放慢
+- 解码耗时：捕获帧率不超过解码速度的若干倍，多捕获的帧只会被丢弃
+- CPU余量：进程CPU占用超过目标时降低帧率
+"""
+
+import os
+import time
+
+
+class RateController:
+    """定期调用update()，按最近一段时间的信号调整流水线的节奏
+
+    max_fps / min_fps: 传输进行中 / 码在画面上但没有新数据时的捕获帧率范围
+    idle_fps: 没有检测到cimbar码时的探测帧率
+    min_interval / idle_interval: 有新数据时 / 没有新数据时的最小解码间隔（秒）
+    cpu_target: 进程CPU占用（占全部核的比例）超过它时降低帧率
+    """
+
+    def __init__(self, max_fps=60.0, min_fps=5.0, idle_fps=2.0, min_interval=0.0, idle_interval=0.5,
+                 cpu_target=0.85, min_hit_rate=0.05, ramp_up=2.0, back_off=0.7, period=0.5):
+        self.max_fps = max_fps
+        self.min_fps = min(min_fps, max_fps)
+        self.idle_fps = min(idle_fps, self.min_fps)
+        self.min_interval = min_interval
+        self.idle_interval = max(idle_interval, min_interval)
+        self.cpu_target = cpu_target
+        self.min_hit_rate = min_hit_rate
+        self.ramp_up = ramp_up
+        self.back_off = back_off
+        self.period = period
+
+        self.fps = max_fps
+        self.decode_interval = min_interval
+        self.state = 'active'
+        self.hit_rate = 0.0
+        self.yield_rate = 0.0
+        self.cpu = 0.0
+        self.latency = 0.0
+        self._last = None
+
+    def _sample(self, pipeline, new_blocks):
+        return {
+            'time': time.perf_counter(),
+            'cpu': time.process_time(),
+            'captured': pipeline.captured,
+            'detected': pipeline.detected,
+            'decoded': pipeline.decoded,
+            'blocks': new_blocks,
+        }
+
+    def update(self, pipeline, new_blocks, decode_latency=None):
+        """new_blocks: 到目前为止收到的新fountain块总数；decode_latency: 最近的单帧解码耗时（秒）
+
+        距离上次调整不足period秒时直接返回，返回值表示是否做了调整。
+        """
+        sample = self._sample(pipeline, new_blocks)
+        last = self._last
+        if last is not None and sample['time'] - last['time'] < self.period:
+            return False
+        self._last = sample
+        if last is None:
+            self.apply(pipeline)
+            return True
+
+        elapsed = sample['time'] - last['time']
+        captured = sample['captured'] - last['captured']
+        decoded = sample['decoded'] - last['decoded']
+        self.hit_rate = (sample['detected'] - last['detected']) / captured if captured else 0.0
+        self.yield_rate = (sample['blocks'] - last['blocks']) / decoded if decoded else 0.0
+        self.cpu = (sample['cpu'] - last['cpu']) / elapsed / (os.cpu_count() or 1)
+        self.latency = decode_latency or 0.0
+
+        if captured and self.hit_rate < self.min_hit_rate:
+            # 画面上没有码：只保留便宜的探测
+            self.state = 'idle'
+            self.fps = self.idle_fps
+            self.decode_interval = self.min_interval
+        elif self.yield_rate > 0:
+            # 传输进行中：尽快提高到最高帧率，每一帧都可能带来新数据
+            if self.state == 'idle':
+                self.fps = self.min_fps
+            self.state = 'active'
+            self.fps = min(self.max_fps, self.fps * self.ramp_up)
+            self.decode_interval = self.min_interval
+        else:
+            # 码还在画面上，但没有新数据（文件已收完、发送端暂停，或重复帧都被过滤了）
+            self.state = 'waiting'
+            self.fps = max(self.min_fps, self.fps * self.back_off)
+            self.decode_interval = self.idle_interval
+
+        if self.cpu > self.cpu_target:
+            self.fps = max(self.idle_fps, self.fps * self.back_off)
+        if self.latency > 0 and self.state == 'active':
+            # 捕获超过解码速度两倍以上的帧只会被丢弃
+            self.fps = max(self.min_fps, min(self.fps, 2.0 / self.latency))
+
+        self.apply(pipeline)
+        return True
+
+    def apply(self, pipeline):
+        pipeline.fps = self.fps
+        pipeline.decode_interval = self.decode_interval
+
+    def describe(self):
+        names = {'idle': '空闲', 'waiting': '等待', 'active': '传输'}
+        return f"{names[self.state]} {self.fps:.0f}fps"
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ROI Tracker - cimbar码区域跟踪
+记住上一次检测成功的边界框，之后只捕获并检测该区域（加边距），
+检测失败或定时器到期时才重新扫描整个画面
+"""
+
+import threading
+import time
+
+
+def clip_crop(crop, width, height):
+    """把 (x, y, w, h) 裁剪到 width x height 范围内，完全在外面时返回None"""
+    x, y, w, h = crop
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(width, x + w), min(height, y + h)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+class RoiTracker:
+    """跟踪最近一次成功检测的边界框（坐标相对于捕获源）
+
+    margin: 边界框每边扩展的比例，给码的轻微移动留出余量
+    rescan_interval: 即使一直命中，也每隔这么多秒做一次全画面扫描
+    """
+
+    def __init__(self, margin=0.15, rescan_interval=2.0):
+        self.margin = margin
+        self.rescan_interval = rescan_interval
+        self.bbox = None
+        self.last_full_scan = 0.0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def next_crop(self):
+        """下一帧应捕获的区域 (x, y, w, h)；返回None表示捕获整个画面"""
+        with self._lock:
+            now = time.monotonic()
+            if self.bbox is None or now - self.last_full_scan > self.rescan_interval:
+                self.last_full_scan = now
+                return None
+
+            x, y, w, h = self.bbox
+            mx, my = int(w * self.margin), int(h * self.margin)
+            return (x - mx, y - my, w + 2 * mx, h + 2 * my)
+
+    def update(self, tracked, found, bbox):
+        """记录一帧的检测结果；bbox为捕获源坐标"""
+        with self._lock:
+            if found:
+                self.bbox = bbox
+                return
+            if tracked and self.bbox is not None:
+                self.misses += 1
+            # 丢失了码，下一帧重新扫描整个画面
+            self.bbox = None
+
+    def reset(self):
+        with self._lock:
+            self.bbox = None
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stage Stats - 各阶段耗时和计数统计
+每个阶段（捕获、颜色转换、检测、排队、交给解码器、解码、结果发现）保留最近N次耗时，计算滚动百分位数；
+计数器记录捕获、检测、解码、重复、丢弃的帧数和收到的fountain块数。
+StatsExporter定期把快照写成JSON和Prometheus文本文件（node_exporter textfile collector格式）
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """一个阶段的耗时统计：总次数、总耗时，以及最近window次耗时的百分位数"""
+
+    def __init__(self, window=1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    def percentile(self, q):
+        """最近window次耗时的第q百分位数（秒）"""
+        recent = sorted(self._recent)
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, int(q / 100.0 * len(recent)))]
+
+    def summary(self):
+        """毫秒为单位的统计摘要"""
+        return {
+            'count': self.count,
+            'mean_ms': self.total * 1000.0 / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(50) * 1000.0,
+            'p90_ms': self.percentile(90) * 1000.0,
+            'p99_ms': self.percentile(99) * 1000.0,
+            'max_ms': self.max * 1000.0,
+        }
+
+
+class StageStats:
+    """线程安全的阶段耗时和计数器集合
+
+    watch(name, fn) 注册在快照时才读取的计数器（例如流水线已有的计数），避免重复计数。
+    """
+
+    STAGES = ('grab', 'convert', 'detect', 'queue', 'handoff', 'decode', 'discover')
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.start_time = time.time()
+        self.timers = {name: StageTimer(window) for name in self.STAGES}
+        self.counters = {}
+        self._watched = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            timer = self.timers.get(stage)
+            if timer is None:
+                timer = self.timers[stage] = StageTimer(self.window)
+            timer.record(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        """with stats.time('detect'): ... 记录代码块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def percentile(self, stage, q):
+        """某个阶段最近耗时的第q百分位数（秒），没有记录时为None"""
+        with self._lock:
+            timer = self.timers.get(stage)
+            return timer.percentile(q) if timer is not None and timer.count else None
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def watch(self, name, fn):
+        self._watched[name] = fn
+
+    def snapshot(self):
+        """当前统计的字典（可直接序列化为JSON）"""
+        with self._lock:
+            counters = dict(self.counters)
+            stages = {name: timer.summary() for name, timer in self.timers.items()}
+        for name, fn in self._watched.items():
+            counters[name] = fn()
+        now = time.time()
+        return {
+            'time': now,
+            'uptime': now - self.start_time,
+            'counters': counters,
+            'stages': stages,
+        }
+
+    def to_prometheus(self, prefix='cimbar_decoder'):
+        """Prometheus文本格式"""
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {prefix}_uptime_seconds gauge",
+                 f"{prefix}_uptime_seconds {snapshot['uptime']:.3f}"]
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+
+        lines.append(f"# TYPE {prefix}_stage_seconds summary")
+        for stage, summary in snapshot['stages'].items():
+            for q in (50, 90, 99):
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{q / 100}"}} '
+                             f"{summary[f'p{q}_ms'] / 1000.0:.6f}")
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} '
+                         f"{summary['mean_ms'] * summary['count'] / 1000.0:.6f}")
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {summary["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def write_atomic(path, text):
+    """先写临时文件再改名，读取方不会看到写了一半的文件"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class StatsExporter:
+    """后台线程，每隔interval秒导出一次统计；stop()时再导出最后一次"""
+
+    def __init__(self, stats, json_path=None, prometheus_path=None, interval=5.0):
+        self.stats = stats
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def export(self):
+        if self.json_path:
+            write_atomic(self.json_path, json.dumps(self.stats.snapshot(), indent=2, ensure_ascii=False))
+        if self.prometheus_path:
+            write_atomic(self.prometheus_path, self.stats.to_prometheus())
+
+    def start(self):
+        if not (self.json_path or self.prometheus_path):
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cimbar-stats", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.export()
+            except OSError:
+                pass
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        self.export()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Video Decode - 视频文件和摄像头输入
+VideoSource: 基于cv2.VideoCapture的捕获源，可以直接交给DecodePipeline（摄像头实时解码）
+VideoDecoder: 离线解码录制的视频。按时间范围和帧间隔选帧，把视频切成多段，
+              由进程池并行读取和解码，所有fountain块汇总到同一个sink
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+import cimbar_native
+from batch_decode import BatchReport, init_worker, worker_decode
+from roi_tracker import clip_crop
+
+
+def parse_video_source(source):
+    """纯数字表示摄像头设备号，其他视为文件路径或URL"""
+    return int(source) if str(source).isdigit() else source
+
+
+def open_capture(source):
+    """打开视频源，失败时抛出RuntimeError"""
+    cap = cv2.VideoCapture(parse_video_source(source))
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频源: {source}")
+    return cap
+
+
+class VideoSource:
+    """视频文件或摄像头捕获源（接口与MonitorSource相同）
+
+    文件读完时grab()抛出EOFError，流水线随之结束。
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.cap = None
+
+    def open(self):
+        self.cap = open_capture(self.source)
+
+    def grab(self, crop=None):
+        ok, frame = self.cap.read()
+        if not ok:
+            raise EOFError("视频已结束")
+        if crop is not None:
+            crop = clip_crop(crop, frame.shape[1], frame.shape[0])
+        if crop is None:
+            return frame, (0, 0)
+        x, y, w, h = crop
+        return frame[y:y+h, x:x+w], (x, y)
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+def frame_range(cap, start_time=None, end_time=None):
+    """把时间范围（秒）换算成帧号范围 [start, end)；帧数未知时end为None"""
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    if (start_time or end_time) and fps <= 0:
+        raise RuntimeError("视频没有帧率信息，无法按时间范围读取")
+
+    start = int(start_time * fps) if start_time else 0
+    end = count if count > 0 else None
+    if end_time:
+        end = min(end, int(end_time * fps)) if end is not None else int(end_time * fps)
+    return start, end
+
+
+def split_segments(start, end, step, segments):
+    """把 [start, end) 切成若干段，每段起点都落在 start + k*step 上"""
+    total = (end - start + step - 1) // step
+    per_segment = max(1, (total + segments - 1) // segments)
+    bounds = []
+    for first in range(0, total, per_segment):
+        last = min(total, first + per_segment)
+        bounds.append((start + first * step, min(end, start + last * step)))
+    return bounds
+
+
+def _decode_segment(source, start, end, step):
+    """在子进程中解码 [start, end) 中每隔step的帧，返回 (读取帧数, fountain块列表)"""
+    cap = open_capture(source)
+    frames = 0
+    chunks = []
+    try:
+        if start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        index = start
+        while end is None or index < end:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames += 1
+            data = worker_decode(frame)
+            if data:
+                chunks.append(data)
+            # 跳过的帧只grab不解码像素
+            for _ in range(step - 1):
+                if not cap.grab():
+                    return frames, chunks
+            index += step
+    finally:
+        cap.release()
+    return frames, chunks
+
+
+class VideoDecoder:
+    """离线并行解码视频文件
+
+    start_time / end_time: 只解码这个时间范围（秒）
+    step: 每隔step帧解码一帧（发送端每帧显示多个视频帧时可以跳过重复帧）
+    jobs: 解码进程数（默认CPU核数），视频被切成 jobs*segments_per_job 段
+    """
+
+    def __init__(self, output_dir, jobs=None, step=1, start_time=None, end_time=None, segments_per_job=4,
+                 color_bits=-1, ecc=-1, legacy_mode=False, no_deskew=False, preprocess=-1):
+        if not cimbar_native.is_available():
+            raise RuntimeError("并行视频解码需要libcimbar_py")
+        self.output_dir = output_dir
+        self.jobs = max(1, jobs or os.cpu_count() or 1)
+        self.step = max(1, step)
+        self.start_time = start_time
+        self.end_time = end_time
+        self.segments_per_job = segments_per_job
+        self.color_bits = color_bits
+        self.ecc = ecc
+        self.legacy_mode = legacy_mode
+        self.no_deskew = no_deskew
+        self.preprocess = preprocess
+
+    def segments(self, source):
+        """要并行解码的帧号区间列表"""
+        cap = open_capture(source)
+        try:
+            start, end = frame_range(cap, self.start_time, self.end_time)
+        finally:
+            cap.release()
+        if end is None:
+            # 帧数未知（例如部分流媒体格式），只能顺序读到结尾
+            return [(start, None)]
+        return split_segments(start, end, self.step, self.jobs * self.segments_per_job)
+
+    def run(self, source, on_file=None):
+        """解码整个视频，返回BatchReport；每完成一个文件调用 on_file(path)"""
+        report = BatchReport()
+        on_file = on_file or (lambda path: None)
+        if os.path.isfile(source):
+            report.input_bytes = os.path.getsize(source)
+
+        segments = self.segments(source)
+        if not segments:
+            return report.finish()
+        sink = cimbar_native.Decoder(self.output_dir, self.color_bits, self.ecc, self.legacy_mode)
+        initargs = (self.color_bits, self.ecc, self.legacy_mode, self.no_deskew, self.preprocess)
+        try:
+            with ProcessPoolExecutor(min(self.jobs, len(segments)), initializer=init_worker,
+                                     initargs=initargs) as pool:
+                futures = [pool.submit(_decode_segment, source, start, end, self.step) for start, end in segments]
+                # 各段完成的顺序无关紧要，fountain块可以按任意顺序写入sink
+                for future in as_completed(futures):
+                    frames, chunks = future.result()
+                    report.frames += frames
+                    report.decoded_frames += len(chunks)
+                    for data in chunks:
+                        result = sink.feed_chunks(data)
+                        report.decoded_bytes += result.bytes
+                        for path in result.new_files:
+                            report.files.append(path)
+                            on_file(path)
+        finally:
+            sink.close()
+        return report.finish()
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Wirehair - wirehair fountain码的ctypes绑定
+取代 src/third_party_lib/wirehair/python/whirehair.py 示例脚本，可以直接import用于fountain实验：
+
+    with WirehairEncoder(message, block_bytes=1400) as encoder, \\
+         WirehairDecoder(len(message), block_bytes=1400) as decoder:
+        block_id = 0
+        while not decoder.decode(block_id, encoder.encode(block_id)):
+            block_id += 1
+        data = decoder.recover()
+
+消息和块都可以是任意支持缓冲区协议的连续对象（bytes、bytearray、memoryview、NumPy数组），直接传地址，不拷贝；
+块缓冲区预先分配并在调用之间复用。ctypes在调用C函数期间释放GIL。
+错误码映射为WirehairError的子类，原始结果码在 .result 中。
+
+块很小时（例如32字节）每块一次ctypes调用的开销比编解码本身还大，encode_batch() / decode_batch() 一次调用处理
+一整个 (块数, 块字节数) 的NumPy数组（libcimbar_py的cimbar_wirehair_*_batch，整批期间释放GIL）；
+加载的库没有这两个函数时（单独构建的libwirehair）退回逐块调用，结果相同。
+
+依次查找：环境变量WIREHAIR_LIB、libcimbar_py（静态链接了wirehair）、单独构建的libwirehair-shared / libwirehair。
+"""
+
+import ctypes
+import os
+import sys
+import threading
+
+import numpy as np
+
+import cimbar_native
+
+# wirehair.h 中的 WirehairResult
+SUCCESS = 0
+NEED_MORE = 1
+INVALID_INPUT = 2
+BAD_DENSE_SEED = 3
+BAD_PEEL_SEED = 4
+BAD_INPUT_SMALL_N = 5
+BAD_INPUT_LARGE_N = 6
+EXTRA_INSUFFICIENT = 7
+ERROR = 8
+OOM = 9
+UNSUPPORTED_PLATFORM = 10
+
+RESULT_NAMES = {
+    SUCCESS: 'Wirehair_Success',
+    NEED_MORE: 'Wirehair_NeedMore',
+    INVALID_INPUT: 'Wirehair_InvalidInput',
+    BAD_DENSE_SEED: 'Wirehair_BadDenseSeed',
+    BAD_PEEL_SEED: 'Wirehair_BadPeelSeed',
+    BAD_INPUT_SMALL_N: 'Wirehair_BadInput_SmallN',
+    BAD_INPUT_LARGE_N: 'Wirehair_BadInput_LargeN',
+    EXTRA_INSUFFICIENT: 'Wirehair_ExtraInsufficient',
+    ERROR: 'Wirehair_Error',
+    OOM: 'Wirehair_OOM',
+    UNSUPPORTED_PLATFORM: 'Wirehair_UnsupportedPlatform',
+}
+
+# wirehair.h 中的 WIREHAIR_VERSION
+WIREHAIR_VERSION = 2
+# 块数 N = ceil(消息字节数 / 块字节数) 的范围
+MIN_BLOCKS = 2
+MAX_BLOCKS = 64000
+
+
+class WirehairError(RuntimeError):
+    """wirehair调用失败，result为WirehairResult结果码"""
+
+    def __init__(self, result, message=None):
+        self.result = result
+        super().__init__(message or f"{RESULT_NAMES.get(result, result)}")
+
+
+class WirehairInputError(WirehairError, ValueError):
+    """参数无效，或块数不在 2..64000 范围内"""
+
+
+class WirehairSeedError(WirehairError):
+    """编码器需要更好的种子（换一个块大小通常可以解决）"""
+
+
+class WirehairInsufficientError(WirehairError):
+    """收到的块不足以还原，只能放弃"""
+
+
+class WirehairMemoryError(WirehairError, MemoryError):
+    """内存不足"""
+
+
+_ERRORS = {
+    INVALID_INPUT: WirehairInputError,
+    BAD_INPUT_SMALL_N: WirehairInputError,
+    BAD_INPUT_LARGE_N: WirehairInputError,
+    BAD_DENSE_SEED: WirehairSeedError,
+    BAD_PEEL_SEED: WirehairSeedError,
+    EXTRA_INSUFFICIENT: WirehairInsufficientError,
+    OOM: WirehairMemoryError,
+}
+
+
+def _check(result, need_more_ok=True):
+    """错误结果码转换为异常；need_more_ok为False时NeedMore（还没有收到足够的块）也是错误"""
+    if result == SUCCESS or (result == NEED_MORE and need_more_ok):
+        return result
+    if result == NEED_MORE:
+        raise WirehairError(result, "还没有收到足够的块")
+    raise _ERRORS.get(result, WirehairError)(result, load_library().wirehair_result_string(result).decode())
+
+
+if os.name == 'nt':
+    _LIB_NAMES = ['wirehair-shared.dll', 'wirehair.dll', 'libwirehair.dll']
+elif sys.platform == 'darwin':
+    _LIB_NAMES = ['libwirehair-shared.dylib', 'libwirehair.dylib']
+else:
+    _LIB_NAMES = ['libwirehair-shared.so', 'libwirehair.so', 'libwirehair.so.2']
+
+_lib = None
+_lock = threading.Lock()
+
+
+def _candidate_paths():
+    env = os.environ.get('WIREHAIR_LIB')
+    if env:
+        yield env
+    # libcimbar_py静态链接了wirehair，导出wirehair_*符号
+    yield from cimbar_native._candidate_paths()
+    here = os.path.dirname(os.path.abspath(__file__))
+    root = os.path.dirname(here)
+    for directory in (here, os.path.join(root, 'dist', 'lib')):
+        for name in _LIB_NAMES:
+            yield os.path.join(directory, name)
+    yield from _LIB_NAMES
+
+
+def load_library():
+    """加载并初始化wirehair，找不到时抛出OSError"""
+    global _lib
+    with _lock:
+        if _lib is not None:
+            return _lib
+
+        errors = []
+        for path in _candidate_paths():
+            if os.path.isabs(path) and not os.path.exists(path):
+                continue
+            try:
+                lib = ctypes.CDLL(path)
+                lib.wirehair_init_
+                break
+            except (OSError, AttributeError) as e:
+                errors.append(f"{path}: {e}")
+        else:
+            raise OSError("找不到wirehair库: " + '; '.join(errors or _LIB_NAMES))
+
+        codec = ctypes.c_void_p
+        lib.wirehair_result_string.argtypes = [ctypes.c_int]
+        lib.wirehair_result_string.restype = ctypes.c_char_p
+        lib.wirehair_init_.argtypes = [ctypes.c_int]
+        lib.wirehair_init_.restype = ctypes.c_int
+        lib.wirehair_encoder_create.argtypes = [codec, ctypes.c_void_p, ctypes.c_uint64, ctypes.c_uint32]
+        lib.wirehair_encoder_create.restype = codec
+        lib.wirehair_encode.argtypes = [codec, ctypes.c_uint, ctypes.c_void_p, ctypes.c_uint32,
+                                        ctypes.POINTER(ctypes.c_uint32)]
+        lib.wirehair_encode.restype = ctypes.c_int
+        lib.wirehair_decoder_create.argtypes = [codec, ctypes.c_uint64, ctypes.c_uint32]
+        lib.wirehair_decoder_create.restype = codec
+        lib.wirehair_decode.argtypes = [codec, ctypes.c_uint, ctypes.c_void_p, ctypes.c_uint32]
+        lib.wirehair_decode.restype = ctypes.c_int
+        lib.wirehair_recover.argtypes = [codec, ctypes.c_void_p, ctypes.c_uint64]
+        lib.wirehair_recover.restype = ctypes.c_int
+        lib.wirehair_recover_block.argtypes = [codec, ctypes.c_uint, ctypes.c_void_p, ctypes.POINTER(ctypes.c_uint32)]
+        lib.wirehair_recover_block.restype = ctypes.c_int
+        lib.wirehair_decoder_becomes_encoder.argtypes = [codec]
+        lib.wirehair_decoder_becomes_encoder.restype = ctypes.c_int
+        lib.wirehair_free.argtypes = [codec]
+        lib.wirehair_free.restype = None
+        if hasattr(lib, 'cimbar_wirehair_encode_batch'):
+            uint_p = ctypes.POINTER(ctypes.c_uint)
+            lib.cimbar_wirehair_encode_batch.argtypes = [codec, ctypes.c_void_p, ctypes.c_uint, ctypes.c_void_p,
+                                                         ctypes.c_uint, ctypes.c_void_p, uint_p]
+            lib.cimbar_wirehair_encode_batch.restype = ctypes.c_int
+            lib.cimbar_wirehair_decode_batch.argtypes = [codec, ctypes.c_void_p, ctypes.c_uint, ctypes.c_void_p,
+                                                         ctypes.c_uint, ctypes.c_void_p, uint_p]
+            lib.cimbar_wirehair_decode_batch.restype = ctypes.c_int
+
+        result = lib.wirehair_init_(WIREHAIR_VERSION)
+        if result != SUCCESS:
+            raise WirehairError(result, f"wirehair初始化失败: {RESULT_NAMES.get(result, result)}")
+        _lib = lib
+        return _lib
+
+
+def is_available():
+    """wirehair库是否可用"""
+    try:
+        load_library()
+        return True
+    except OSError:
+        return False
+
+
+def has_batch():
+    """加载的库是否提供批量编解码（否则encode_batch / decode_batch逐块调用）"""
+    return hasattr(load_library(), 'cimbar_wirehair_encode_batch')
+
+
+def block_count(message_bytes, block_bytes):
+    """消息分成的块数 N"""
+    return (message_bytes + block_bytes - 1) // block_bytes
+
+
+def _buffer(obj, writable=False):
+    """缓冲区协议对象 -> (保持引用的uint8视图, 地址, 字节数)，不拷贝"""
+    if isinstance(obj, bytes) and not writable:
+        # bytes直接按c_void_p传递，省去NumPy视图
+        return obj, obj, len(obj)
+    view = memoryview(obj)
+    if not view.c_contiguous:
+        raise ValueError("需要连续的缓冲区")
+    if writable and view.readonly:
+        raise ValueError("需要可写的缓冲区")
+    array = np.frombuffer(view, dtype=np.uint8) if view.nbytes else np.empty(0, np.uint8)
+    return array, array.ctypes.data, view.nbytes
+
+
+def _block_ids(ids):
+    """块编号 -> 连续的uint32数组"""
+    ids = np.ascontiguousarray(ids, dtype=np.uint32)
+    if ids.ndim != 1:
+        raise ValueError("块编号必须是一维的")
+    return ids
+
+
+def _block_array(blocks, count, block_bytes, writable=False):
+    """(块数, 行字节数) 的uint8数组，行之间可以有间隔（行字节数 >= block_bytes），每行内部连续"""
+    if not isinstance(blocks, np.ndarray) or blocks.dtype != np.uint8 or blocks.ndim != 2:
+        raise ValueError("块必须是二维的uint8 NumPy数组")
+    if blocks.shape[0] < count:
+        raise ValueError(f"块数组的行数不足: {blocks.shape[0]} < {count}")
+    if blocks.shape[1] < block_bytes or blocks.strides[1] != 1 or blocks.strides[0] < block_bytes:
+        raise ValueError(f"块数组的每行必须是至少 {block_bytes} 字节的连续内存")
+    if writable and not blocks.flags.writeable:
+        raise ValueError("需要可写的块数组")
+    return blocks
+
+
+def _check_size(message_bytes, block_bytes):
+    if message_bytes < 1 or block_bytes < 1:
+        raise WirehairInputError(INVALID_INPUT, "消息和块的字节数必须大于0")
+    n = block_count(message_bytes, block_bytes)
+    if n < MIN_BLOCKS:
+        raise WirehairInputError(BAD_INPUT_SMALL_N, f"块数 {n} 太少（至少{MIN_BLOCKS}），请减小块大小")
+    if n > MAX_BLOCKS:
+        raise WirehairInputError(BAD_INPUT_LARGE_N, f"块数 {n} 太多（最多{MAX_BLOCKS}），请增大块大小")
+
+
+class _Codec:
+    """WirehairCodec句柄：close()或退出with时调用wirehair_free"""
+
+    def __init__(self, message_bytes, block_bytes):
+        self._lib = load_library()
+        self._handle = None
+        self.message_bytes = message_bytes
+        self.block_bytes = block_bytes
+        self.block_count = block_count(message_bytes, block_bytes)
+        # 预先分配的块缓冲区，encode / recover_block 没有指定输出时复用
+        self._block = np.empty(block_bytes, dtype=np.uint8)
+        self._block_address = self._block.ctypes.data
+        self._written = ctypes.c_uint32(0)
+
+    def _require_handle(self):
+        if self._handle is None:
+            raise ValueError("wirehair codec已关闭")
+        return self._handle
+
+    def _output(self, out, size):
+        """输出缓冲区：out或预先分配的块缓冲区，返回 (视图, 地址)"""
+        if out is None:
+            return self._block, self._block_address
+        array, address, nbytes = _buffer(out, writable=True)
+        if nbytes < size:
+            raise ValueError(f"输出缓冲区太小: {nbytes} < {size}")
+        return array, address
+
+    def close(self):
+        if self._handle is not None:
+            self._lib.wirehair_free(self._handle)
+            self._handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class WirehairEncoder(_Codec):
+    """把消息编码成无限多的fountain块
+
+    message: 消息（缓冲区协议对象）。wirehair直接读取它的内存而不拷贝，编码器存活期间会保持引用，调用方不能修改它
+    block_bytes: 每块字节数
+    前N个块就是消息本身（系统码），之后的块按需生成。
+    """
+
+    def __init__(self, message, block_bytes, _handle=None):
+        if _handle is not None:
+            # 由WirehairDecoder.to_encoder()转换而来，消息在codec内部
+            super().__init__(message, block_bytes)
+            self._message = None
+            self._handle = _handle
+            return
+
+        array, address, nbytes = _buffer(message)
+        _check_size(nbytes, block_bytes)
+        super().__init__(nbytes, block_bytes)
+        self._message = array
+        handle = self._lib.wirehair_encoder_create(None, address, nbytes, block_bytes)
+        if not handle:
+            # wirehair_encoder_create失败时不返回结果码；参数已检查过，通常是内存不足
+            raise WirehairError(ERROR, "wirehair_encoder_create失败")
+        self._handle = handle
+
+    def encode(self, block_id, out=None):
+        """生成一个块，返回写入数据的memoryview
+
+        out为None时写入预先分配的块缓冲区，返回的视图在下一次encode()之前有效；
+        否则写入out（至少block_bytes字节的可写缓冲区）并返回out的视图。最后一个原始块可能比block_bytes短。
+        """
+        array, address = self._output(out, self.block_bytes)
+        _check(self._lib.wirehair_encode(self._require_handle(), block_id, address, self.block_bytes,
+                                         ctypes.byref(self._written)))
+        return memoryview(array)[:self._written.value]
+
+    def encode_batch(self, ids, out=None):
+        """一次生成多个块，返回 (块数组, 各块字节数)
+
+        ids: 块编号序列；out: 可选的 (len(ids), >=block_bytes) uint8数组，为None时新分配 (len(ids), block_bytes)。
+        块i写入第i行，只有最后一个原始块（编号N-1）比block_bytes短，短出的部分不写入。
+        """
+        ids = _block_ids(ids)
+        count = len(ids)
+        if out is None:
+            out = np.empty((count, self.block_bytes), dtype=np.uint8)
+        out = _block_array(out, count, self.block_bytes, writable=True)
+        lengths = np.empty(count, dtype=np.uint32)
+        handle = self._require_handle()
+
+        if not has_batch():
+            for i, block_id in enumerate(ids):
+                lengths[i] = len(self.encode(int(block_id), out[i]))
+            return out, lengths
+
+        done = ctypes.c_uint(0)
+        _check(self._lib.cimbar_wirehair_encode_batch(handle, ids.ctypes.data, count, out.ctypes.data,
+                                                      out.strides[0], lengths.ctypes.data, ctypes.byref(done)),
+               False)
+        return out, lengths
+
+
+class WirehairDecoder(_Codec):
+    """从收到的fountain块还原消息（参数须与编码器相同）"""
+
+    def __init__(self, message_bytes, block_bytes):
+        _check_size(message_bytes, block_bytes)
+        super().__init__(message_bytes, block_bytes)
+        handle = self._lib.wirehair_decoder_create(None, message_bytes, block_bytes)
+        if not handle:
+            raise WirehairError(ERROR, "wirehair_decoder_create失败")
+        self._handle = handle
+        self.done = False
+        self.received = 0
+        self._message = None
+
+    def decode(self, block_id, block):
+        """提供一个块（同一个block_id不能提供两次），收到足够的块、可以还原时返回True"""
+        if self.done:
+            return True
+        _, address, nbytes = _buffer(block)
+        result = _check(self._lib.wirehair_decode(self._require_handle(), block_id, address, nbytes))
+        self.received += 1
+        self.done = result == SUCCESS
+        return self.done
+
+    def decode_batch(self, ids, blocks, lengths=None):
+        """依次提供多个块（blocks的第i行是块ids[i]），可以还原时立即停止并返回True
+
+        blocks: (len(ids), >=block_bytes) uint8数组；lengths: 可选的各块字节数，默认每块block_bytes
+        （最后一个原始块后面的填充不影响结果）。实际用掉的块数累计在received中。
+        """
+        if self.done:
+            return True
+        ids = _block_ids(ids)
+        count = len(ids)
+        blocks = _block_array(blocks, count, self.block_bytes)
+        if lengths is not None:
+            lengths = np.ascontiguousarray(lengths, dtype=np.uint32)
+            if len(lengths) < count:
+                raise ValueError(f"块长度数不足: {len(lengths)} < {count}")
+        handle = self._require_handle()
+
+        if not has_batch():
+            for i, block_id in enumerate(ids):
+                size = self.block_bytes if lengths is None else lengths[i]
+                if self.decode(int(block_id), blocks[i, :size]):
+                    break
+            return self.done
+
+        if lengths is None and blocks.strides[0] != self.block_bytes:
+            # C端默认每块stride字节，行之间有间隔时明确给出块长度
+            lengths = np.full(count, self.block_bytes, dtype=np.uint32)
+        done = ctypes.c_uint(0)
+        result = self._lib.cimbar_wirehair_decode_batch(handle, ids.ctypes.data, count, blocks.ctypes.data,
+                                                        blocks.strides[0],
+                                                        None if lengths is None else lengths.ctypes.data,
+                                                        ctypes.byref(done))
+        self.received += done.value
+        _check(result)
+        self.done = result == SUCCESS
+        return self.done
+
+    def _require_done(self):
+        # wirehair在解码完成前调用recover不会报错，只会写出错误的数据
+        if not self.done:
+            _check(NEED_MORE, need_more_ok=False)
+
+    def recover(self, out=None):
+        """还原整个消息，返回它的memoryview
+
+        out为None时写入解码器持有的缓冲区（只分配一次），否则写入out（至少message_bytes字节）。
+        """
+        self._require_done()
+        if out is None:
+            if self._message is None:
+                self._message = np.empty(self.message_bytes, dtype=np.uint8)
+            out = self._message
+        array, address = self._output(out, self.message_bytes)
+        _check(self._lib.wirehair_recover(self._require_handle(), address, self.message_bytes), False)
+        return memoryview(array)[:self.message_bytes]
+
+    def recover_block(self, block_id, out=None):
+        """还原单个原始块（0 <= block_id < N），返回写入数据的memoryview；比recover()慢，只在需要个别块时使用"""
+        self._require_done()
+        array, address = self._output(out, self.block_bytes)
+        _check(self._lib.wirehair_recover_block(self._require_handle(), block_id, address,
+                                                ctypes.byref(self._written)), False)
+        return memoryview(array)[:self._written.value]
+
+    def to_encoder(self):
+        """还原完成后把解码器转换为编码器（用于转发），本对象随之失效"""
+        self._require_done()
+        handle = self._require_handle()
+        _check(self._lib.wirehair_decoder_becomes_encoder(handle), False)
+        self._handle = None
+        return WirehairEncoder(self.message_bytes, self.block_bytes, _handle=handle)
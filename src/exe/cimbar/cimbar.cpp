@@ -123,42 +123,57 @@ int encode(const FilenameIterable& infiles, const std::string& outpath, int ecc,
 }
 
 template <typename FilenameIterable>
-int decode(const FilenameIterable& infiles, const std::function<int(cv::UMat, unsigned, bool, int)>& decodefun, bool no_deskew, bool undistort, unsigned color_mode, int preprocess, int color_correct)
+int decode(const FilenameIterable& infiles, const std::function<int(cv::UMat, unsigned, bool, int)>& decodefun, bool no_deskew, bool undistort, unsigned color_mode, int preprocess, int color_correct, bool ack=false)
 {
 	int err = 0;
 	for (const string& inf : infiles)
 	{
 		if (inf.empty())
 			continue;
+		int bytes = 0;
 		bool shouldPreprocess = (preprocess == 1);
 		cv::UMat img = cv::imread(inf).getUMat(cv::ACCESS_RW);
-		cv::cvtColor(img, img, cv::COLOR_BGR2RGB);
-
-		if (!no_deskew)
+		if (img.empty())
+			err |= 8;
+		else
 		{
-			// attempt undistort. It's currently a low-effort attempt to *reduce* distortion, not eliminate it.
-			// we rely on the decoder to power through minor distortion
-			if (undistort)
+			cv::cvtColor(img, img, cv::COLOR_BGR2RGB);
+
+			int res = Extractor::SUCCESS;
+			if (!no_deskew)
 			{
-				Undistort<SimpleCameraCalibration> und;
-				if (!und.undistort(img, img))
-					err |= 1;
+				// attempt undistort. It's currently a low-effort attempt to *reduce* distortion, not eliminate it.
+				// we rely on the decoder to power through minor distortion
+				if (undistort)
+				{
+					Undistort<SimpleCameraCalibration> und;
+					if (!und.undistort(img, img))
+						err |= 1;
+				}
+
+				Extractor ext;
+				res = ext.extract(img, img);
+				if (!res)
+					err |= 2;
+				else if (preprocess != 0 and res == Extractor::NEEDS_SHARPEN)
+					shouldPreprocess = true;
 			}
 
-			Extractor ext;
-			int res = ext.extract(img, img);
-			if (!res)
+			if (res)
 			{
-				err |= 2;
-				continue;
+				bytes = decodefun(img, color_mode, shouldPreprocess, color_correct);
+				if (!bytes)
+					err |= 4;
 			}
-			else if (preprocess != 0 and res == Extractor::NEEDS_SHARPEN)
-				shouldPreprocess = true;
 		}
 
-		int bytes = decodefun(img, color_mode, shouldPreprocess, color_correct);
-		if (!bytes)
-			err |= 4;
+		// for long-lived sessions (filenames on stdin), the caller needs to know when a frame is finished.
+		// any output paths for this frame have already been printed by the sink.
+		if (ack)
+		{
+			printf("#frame %d\n", bytes);
+			fflush(stdout);
+		}
 	}
 	return err;
 }
@@ -166,10 +181,15 @@ int decode(const FilenameIterable& infiles, const std::function<int(cv::UMat, un
 // see also "decodefun" for non-fountain decodes, defined as a lambda inline below.
 // this one needs its own function since it's a template (:
 template <typename SINK>
-std::function<int(cv::UMat,unsigned,bool,int)> fountain_decode_fun(SINK& sink, Decoder& d)
+std::function<int(cv::UMat,unsigned,bool,int)> fountain_decode_fun(SINK& sink, Decoder& d, bool progress=false)
 {
-	return [&sink, &d] (cv::UMat m, unsigned cm, bool pre, int cc) {
-		return d.decode_fountain(m, sink, cm, pre, cc);
+	return [&sink, &d, progress] (cv::UMat m, unsigned cm, bool pre, int cc) {
+		int bytes = d.decode_fountain(m, sink, cm, pre, cc);
+		// one json line per in-flight stream, printed before the frame's ack
+		if (progress)
+			for (auto&& st : sink.get_stream_status())
+				printf("{\"slot\":%u,\"blocks\":%u,\"required\":%u,\"size\":%u}\n", st.slot, st.blocks, st.blocks_required, st.size);
+		return bytes;
 	};
 }
 
@@ -194,6 +214,8 @@ int main(int argc, char** argv)
 		("no-fountain", "Disable fountain encode/decode. Will also disable compression.", cxxopts::value<bool>())
 		("undistort", "Attempt undistort step -- useful if image distortion is significant.", cxxopts::value<bool>())
 		("preprocess", "Run sharpen filter on the input image. 1 == on. 0 == off. -1 == guess.", cxxopts::value<int>()->default_value("-1"))
+		("ack", "Decode only. After each input image, print '#frame <bytes>' and flush stdout. For feeding filenames over stdin from another process.", cxxopts::value<bool>())
+		("progress", "Decode only (fountain). After each input image, print a json line per in-flight stream: slot, blocks received, blocks required, file size.", cxxopts::value<bool>())
 		("h,help", "Print usage")
 	;
 	options.show_positional_help();
@@ -256,6 +278,8 @@ int main(int argc, char** argv)
 	if (result.count("color-correction-file"))
 		color_correction_file = result["color-correction-file"].as<string>();
 	int preprocess = result["preprocess"].as<int>();
+	bool ack = result.count("ack");
+	bool progress = result.count("progress");
 
 	unsigned color_mode = legacy_mode? 0 : 1;
 	Decoder d(ecc, colorBits);
@@ -271,9 +295,9 @@ int main(int argc, char** argv)
 			return d.decode(m, f, cm, pre, cc);
 		};
 		if (useStdin)
-			return decode(StdinLineReader(), decodefun, no_deskew, undistort, color_mode, preprocess, color_correct);
+			return decode(StdinLineReader(), decodefun, no_deskew, undistort, color_mode, preprocess, color_correct, ack);
 		else
-			return decode(infiles, decodefun, no_deskew, undistort, color_mode, preprocess, color_correct);
+			return decode(infiles, decodefun, no_deskew, undistort, color_mode, preprocess, color_correct, ack);
 	}
 
 	// else, the good stuff
@@ -283,16 +307,20 @@ int main(int argc, char** argv)
 	if (compressionLevel <= 0)
 	{
 		fountain_decoder_sink<std::ofstream> sink(outpath, chunkSize, true);
-		res = decode(infiles, fountain_decode_fun(sink, d), no_deskew, undistort, color_mode, preprocess, color_correct);
+
+		if (useStdin)
+			res = decode(StdinLineReader(), fountain_decode_fun(sink, d, progress), no_deskew, undistort, color_mode, preprocess, color_correct, ack);
+		else
+			res = decode(infiles, fountain_decode_fun(sink, d, progress), no_deskew, undistort, color_mode, preprocess, color_correct, ack);
 	}
 	else // default case, all bells and whistles
 	{
 		fountain_decoder_sink<cimbar::zstd_decompressor<std::ofstream>> sink(outpath, chunkSize, true);
 
 		if (useStdin)
-			res = decode(StdinLineReader(), fountain_decode_fun(sink, d), no_deskew, undistort, color_mode, preprocess, color_correct);
+			res = decode(StdinLineReader(), fountain_decode_fun(sink, d, progress), no_deskew, undistort, color_mode, preprocess, color_correct, ack);
 		else
-			res = decode(infiles, fountain_decode_fun(sink, d), no_deskew, undistort, color_mode, preprocess, color_correct);
+			res = decode(infiles, fountain_decode_fun(sink, d, progress), no_deskew, undistort, color_mode, preprocess, color_correct, ack);
 	}
 	if (not color_correction_file.empty())
 		d.save_ccm(color_correction_file);
@@ -0,0 +1,299 @@
+/* This code is subject to the terms of the Mozilla Public License, v.2.0. http://mozilla.org/MPL/2.0/. */
+#include "cimbar_py.h"
+
+#include "cimb_translator/Config.h"
+#include "compression/zstd_decompressor.h"
+#include "encoder/Decoder.h"
+#include "extractor/Extractor.h"
+#include "fountain/fountain_decoder_sink.h"
+
+#include <opencv2/opencv.hpp>
+#include <algorithm>
+#include <cstring>
+#include <memory>
+#include <string>
+#include <vector>
+
+
+namespace {
+	// collects the aligned fountain chunks of a frame instead of decoding them,
+	// so another session's sink can consume them later (see feed_chunks())
+	class chunk_buffer
+	{
+	public:
+		chunk_buffer(unsigned chunk_size)
+			: _chunkSize(chunk_size)
+		{}
+
+		unsigned chunk_size() const
+		{
+			return _chunkSize;
+		}
+
+		bool good() const
+		{
+			return true;
+		}
+
+		bool write(const char* data, unsigned length)
+		{
+			_data.append(data, length);
+			return true;
+		}
+
+		const std::string& data() const
+		{
+			return _data;
+		}
+
+		void clear()
+		{
+			_data.clear();
+		}
+
+	protected:
+		unsigned _chunkSize;
+		std::string _data;
+	};
+
+	class decoder_session
+	{
+	public:
+		decoder_session(unsigned color_bits, unsigned ecc, bool legacy_mode)
+			: _decoder(ecc, color_bits)
+			, _colorMode(legacy_mode? 0 : 1)
+			, _chunks(cimbar::Config::fountain_chunk_size(ecc, color_bits + cimbar::Config::symbol_bits(), legacy_mode))
+		{}
+
+		virtual ~decoder_session() {}
+
+		int decode(const cv::Mat& frame, bool no_deskew, int preprocess)
+		{
+			bool shouldPreprocess;
+			const cv::Mat* img = prepare(frame, no_deskew, preprocess, shouldPreprocess);
+			if (!img)
+				return 0;
+			return decode_fountain(*img, shouldPreprocess);
+		}
+
+		const std::string& decode_chunks(const cv::Mat& frame, bool no_deskew, int preprocess)
+		{
+			_chunks.clear();
+			bool shouldPreprocess;
+			const cv::Mat* img = prepare(frame, no_deskew, preprocess, shouldPreprocess);
+			if (img)
+				_decoder.decode_fountain(*img, _chunks, _colorMode, shouldPreprocess);
+			return _chunks.data();
+		}
+
+		unsigned chunk_size() const
+		{
+			return _chunks.chunk_size();
+		}
+
+		virtual unsigned feed_chunks(const char* data, unsigned size) = 0;
+
+		// the sink keeps completed files in completion order, so everything past the ones we reported is new
+		bool next_completed(std::string& name)
+		{
+			if (_reported >= num_done())
+				return false;
+			name = get_done(_reported++);
+			return true;
+		}
+
+		virtual unsigned num_done() const = 0;
+		virtual std::vector<double> get_progress() const = 0;
+		virtual std::vector<cimbar_stream_status> get_streams() const = 0;
+
+	protected:
+		// returns the image to decode, or nullptr if extraction failed
+		const cv::Mat* prepare(const cv::Mat& frame, bool no_deskew, int preprocess, bool& should_preprocess)
+		{
+			// the only copy we make: BGR(A) -> RGB, into a buffer we keep between frames
+			cv::cvtColor(frame, _rgb, frame.channels() == 4? cv::COLOR_BGRA2RGB : cv::COLOR_BGR2RGB);
+
+			should_preprocess = (preprocess == 1);
+			if (no_deskew)
+				return &_rgb;
+
+			Extractor ext;
+			int res = ext.extract(_rgb, _extracted);
+			if (!res)
+				return nullptr;
+			else if (preprocess != 0 and res == Extractor::NEEDS_SHARPEN)
+				should_preprocess = true;
+			return &_extracted;
+		}
+
+		virtual int decode_fountain(const cv::Mat& img, bool should_preprocess) = 0;
+		virtual std::string get_done(unsigned i) const = 0;
+
+	protected:
+		Decoder _decoder;
+		unsigned _colorMode;
+		cv::Mat _rgb;
+		cv::Mat _extracted;
+		chunk_buffer _chunks;
+
+		unsigned _reported = 0;
+	};
+
+	template <typename SINK>
+	class fountain_decoder_session : public decoder_session
+	{
+	public:
+		fountain_decoder_session(std::string output_dir, unsigned color_bits, unsigned ecc, bool legacy_mode)
+			: decoder_session(color_bits, ecc, legacy_mode)
+			, _sink(output_dir, cimbar::Config::fountain_chunk_size(ecc, color_bits + cimbar::Config::symbol_bits(), legacy_mode))
+		{}
+
+		unsigned num_done() const override
+		{
+			return _sink.num_done();
+		}
+
+		std::vector<double> get_progress() const override
+		{
+			return _sink.get_progress();
+		}
+
+		std::vector<cimbar_stream_status> get_streams() const override
+		{
+			std::vector<cimbar_stream_status> streams;
+			for (auto&& st : _sink.get_stream_status())
+				streams.push_back({st.slot, st.blocks, st.blocks_required, st.size});
+			return streams;
+		}
+
+		unsigned feed_chunks(const char* data, unsigned size) override
+		{
+			unsigned chunkSize = _sink.chunk_size();
+			unsigned count = 0;
+			for (; size >= chunkSize; data += chunkSize, size -= chunkSize, ++count)
+				_sink.write(data, chunkSize);
+			return count;
+		}
+
+	protected:
+		int decode_fountain(const cv::Mat& img, bool should_preprocess) override
+		{
+			return _decoder.decode_fountain(img, _sink, _colorMode, should_preprocess);
+		}
+
+		std::string get_done(unsigned i) const override
+		{
+			return _sink.get_done(i);
+		}
+
+	protected:
+		SINK _sink;
+	};
+}
+
+extern "C" {
+
+void* cimbar_decoder_create(const char* output_dir, unsigned color_bits, unsigned ecc, int legacy_mode, int compressed)
+{
+	if (!output_dir)
+		return nullptr;
+	if (color_bits > 3)
+		color_bits = cimbar::Config::color_bits();
+	if (ecc >= 150)
+		ecc = cimbar::Config::ecc_bytes();
+
+	if (compressed)
+		return new fountain_decoder_session<fountain_decoder_sink<cimbar::zstd_decompressor<std::ofstream>>>(output_dir, color_bits, ecc, legacy_mode);
+	return new fountain_decoder_session<fountain_decoder_sink<std::ofstream>>(output_dir, color_bits, ecc, legacy_mode);
+}
+
+void cimbar_decoder_free(void* dec)
+{
+	delete static_cast<decoder_session*>(dec);
+}
+
+int cimbar_decoder_decode(void* dec, const unsigned char* pixels, int width, int height, int channels, int stride, int no_deskew, int preprocess)
+{
+	if (!dec or !pixels or width <= 0 or height <= 0 or (channels != 3 and channels != 4) or stride < width*channels)
+		return -1;
+
+	// wrap the caller's buffer -- no copy
+	cv::Mat frame(height, width, CV_8UC(channels), const_cast<unsigned char*>(pixels), stride);
+	return static_cast<decoder_session*>(dec)->decode(frame, no_deskew, preprocess);
+}
+
+int cimbar_decoder_decode_chunks(void* dec, const unsigned char* pixels, int width, int height, int channels, int stride, int no_deskew, int preprocess, char* chunks, unsigned size)
+{
+	if (!dec or !pixels or width <= 0 or height <= 0 or (channels != 3 and channels != 4) or stride < width*channels or !chunks)
+		return -1;
+
+	cv::Mat frame(height, width, CV_8UC(channels), const_cast<unsigned char*>(pixels), stride);
+	decoder_session* session = static_cast<decoder_session*>(dec);
+	const std::string& data = session->decode_chunks(frame, no_deskew, preprocess);
+
+	// only whole chunks are useful to the sink
+	unsigned len = std::min<unsigned>(data.size(), size);
+	len -= len % session->chunk_size();
+	std::memcpy(chunks, data.data(), len);
+	return len;
+}
+
+unsigned cimbar_decoder_feed_chunks(void* dec, const char* chunks, unsigned size)
+{
+	if (!dec or !chunks)
+		return 0;
+	return static_cast<decoder_session*>(dec)->feed_chunks(chunks, size);
+}
+
+unsigned cimbar_decoder_chunk_size(void* dec)
+{
+	if (!dec)
+		return 0;
+	return static_cast<decoder_session*>(dec)->chunk_size();
+}
+
+unsigned cimbar_decoder_next_completed(void* dec, char* buffer, unsigned size)
+{
+	if (!dec or !buffer or !size)
+		return 0;
+
+	std::string name;
+	if (!static_cast<decoder_session*>(dec)->next_completed(name))
+		return 0;
+
+	unsigned len = std::min<unsigned>(name.size(), size-1);
+	std::memcpy(buffer, name.data(), len);
+	buffer[len] = 0;
+	return len;
+}
+
+unsigned cimbar_decoder_num_done(void* dec)
+{
+	if (!dec)
+		return 0;
+	return static_cast<decoder_session*>(dec)->num_done();
+}
+
+unsigned cimbar_decoder_get_progress(void* dec, double* progress, unsigned size)
+{
+	if (!dec)
+		return 0;
+
+	std::vector<double> current = static_cast<decoder_session*>(dec)->get_progress();
+	if (progress)
+		std::copy_n(current.begin(), std::min<unsigned>(current.size(), size), progress);
+	return current.size();
+}
+
+unsigned cimbar_decoder_get_streams(void* dec, cimbar_stream_status* streams, unsigned size)
+{
+	if (!dec)
+		return 0;
+
+	std::vector<cimbar_stream_status> current = static_cast<decoder_session*>(dec)->get_streams();
+	if (streams)
+		std::copy_n(current.begin(), std::min<unsigned>(current.size(), size), streams);
+	return current.size();
+}
+
+}
@@ -0,0 +1,74 @@
+/* This code is subject to the terms of the Mozilla Public License, v.2.0. http://mozilla.org/MPL/2.0/. */
+#ifndef CIMBAR_PY_API_H
+#define CIMBAR_PY_API_H
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+// an in-flight fountain stream: blocks received so far vs the number needed to reconstruct a file of `size` bytes
+typedef struct cimbar_stream_status
+{
+	unsigned slot;
+	unsigned blocks;
+	unsigned blocks_required;
+	unsigned size;
+} cimbar_stream_status;
+
+// a decoder session owns a Decoder and a persistent fountain_decoder_sink.
+// files are written to output_dir as they complete.
+void* cimbar_decoder_create(const char* output_dir, unsigned color_bits, unsigned ecc, int legacy_mode, int compressed);
+void cimbar_decoder_free(void* dec);
+
+// pixels: BGR (channels=3) or BGRA (channels=4), rows `stride` bytes apart. Not copied, not modified.
+// returns the number of bytes decoded from the frame, or -1 on bad arguments.
+int cimbar_decoder_decode(void* dec, const unsigned char* pixels, int width, int height, int channels, int stride, int no_deskew, int preprocess);
+
+// split decode: decode a frame into its raw fountain chunks without touching this session's sink,
+// and feed chunks (e.g. produced by sessions in other processes) into the sink.
+// decode_chunks returns the number of bytes written to `chunks` (whole chunks only), or -1 on bad arguments.
+// feed_chunks returns the number of chunks consumed.
+int cimbar_decoder_decode_chunks(void* dec, const unsigned char* pixels, int width, int height, int channels, int stride, int no_deskew, int preprocess, char* chunks, unsigned size);
+unsigned cimbar_decoder_feed_chunks(void* dec, const char* chunks, unsigned size);
+unsigned cimbar_decoder_chunk_size(void* dec);
+
+// pop the name of a file completed since the last call. Returns the name length, or 0 if nothing is pending.
+unsigned cimbar_decoder_next_completed(void* dec, char* buffer, unsigned size);
+unsigned cimbar_decoder_num_done(void* dec);
+// fill progress (0.0 - 1.0) for each in-flight stream. Returns the number of streams.
+unsigned cimbar_decoder_get_progress(void* dec, double* progress, unsigned size);
+// fill status for each in-flight stream. Returns the number of streams.
+unsigned cimbar_decoder_get_streams(void* dec, cimbar_stream_status* streams, unsigned size);
+
+// an encoder session: the cimbar_js configure/encode/next_frame loop, rendering into caller-owned buffers instead of a window.
+// out-of-range color_bits/ecc/compression select the cimbar::Config defaults. canvas_size <= 1024 gives 1024x1024 frames.
+void* cimbar_encoder_create(unsigned color_bits, unsigned ecc, int compression, int legacy_mode, int canvas_size);
+void cimbar_encoder_free(void* enc);
+
+// start a new fountain stream over `buffer` (copied). encode_id == -1 -> auto-increment. Returns 1 on success.
+int cimbar_encoder_encode(void* enc, const unsigned char* buffer, unsigned size, int encode_id);
+// frames are square, frame_size() pixels on a side
+int cimbar_encoder_frame_size(void* enc);
+// render the next frame as BGR (channels=3) or BGRA (channels=4), rows `stride` bytes apart.
+// returns the frame number, 0 if there is no stream, or -1 on bad arguments.
+// the stream restarts after 8x the required blocks, like cimbar_js.
+int cimbar_encoder_next_frame(void* enc, unsigned char* pixels, int channels, int stride);
+// advance past frames without rendering them (e.g. N sessions over the same data, each rendering every Nth frame).
+// returns the number of frames skipped.
+unsigned cimbar_encoder_skip(void* enc, unsigned frames);
+unsigned cimbar_encoder_blocks_required(void* enc);
+unsigned cimbar_encoder_blocks_per_frame(void* enc);
+
+// batched wirehair calls (codec from wirehair_encoder_create/wirehair_decoder_create), one call per many blocks.
+// block i lives at blocks + i*stride. `done` (optional) receives the number of blocks processed.
+// encode_batch writes count blocks (stride >= block bytes) and their lengths, returns Wirehair_Success or the first error.
+// decode_batch feeds blocks until the message can be recovered: returns Wirehair_Success as soon as it can,
+// Wirehair_NeedMore if all blocks were consumed, or the first error. lengths may be null (all blocks `stride` bytes).
+int cimbar_wirehair_encode_batch(void* codec, const unsigned* ids, unsigned count, unsigned char* out, unsigned stride, unsigned* lengths, unsigned* done);
+int cimbar_wirehair_decode_batch(void* codec, const unsigned* ids, unsigned count, const unsigned char* blocks, unsigned stride, const unsigned* lengths, unsigned* done);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif // CIMBAR_PY_API_H
@@ -0,0 +1,249 @@
+/* This code is subject to the terms of the Mozilla Public License, v.2.0. http://mozilla.org/MPL/2.0/. */
+#include "cimbar_py.h"
+
+#include "cimb_translator/Config.h"
+#include "encoder/SimpleEncoder.h"
+#include "fountain/FountainInit.h"
+#include "util/byte_istream.h"
+
+#include <opencv2/opencv.hpp>
+#include <algorithm>
+#include <memory>
+#include <optional>
+#include <vector>
+
+
+namespace {
+	// counts the bytes SimpleEncoder::encode_next() pulls from the fountain stream.
+	// every frame consumes the same amount, so skip() can advance the stream without rendering.
+	class counting_stream
+	{
+	public:
+		counting_stream(fountain_encoder_stream& fes)
+			: _fes(fes)
+		{}
+
+		bool good() const
+		{
+			return _fes.good();
+		}
+
+		counting_stream& read(char* data, unsigned length)
+		{
+			_fes.read(data, length);
+			_count += _fes.gcount();
+			return *this;
+		}
+
+		std::streamsize gcount() const
+		{
+			return _fes.gcount();
+		}
+
+		unsigned count() const
+		{
+			return _count;
+		}
+
+	protected:
+		fountain_encoder_stream& _fes;
+		unsigned _count = 0;
+	};
+
+	// the same loop cimbar_js runs (configure/encode/next_frame), minus the window
+	class encoder_session
+	{
+	public:
+		encoder_session(unsigned color_bits, unsigned ecc, int compression, bool legacy_mode, int canvas_size)
+			: _colorBits(color_bits)
+			, _ecc(ecc)
+			, _compressionLevel(compression)
+			, _legacyMode(legacy_mode)
+			, _canvasSize(canvas_size)
+		{}
+
+		bool encode(const unsigned char* buffer, unsigned size, int encode_id)
+		{
+			_frameCount = 0;
+			_frameBytes = 0;
+			if (!FountainInit::init())
+				return false;
+
+			SimpleEncoder enc = make_encoder();
+			if (encode_id < 0)
+				_encodeId = (_encodeId + 1) & 0x7F; // new id for every file, like cimbar_js
+			else
+				_encodeId = static_cast<uint8_t>(encode_id);
+			enc.set_encode_id(_encodeId);
+
+			cimbar::byte_istream bis(reinterpret_cast<const char*>(buffer), size);
+			_fes = enc.create_fountain_encoder(bis, _compressionLevel);
+			return _fes and _fes->good();
+		}
+
+		// returns the frame number (1, 2, ...), or 0 if there is nothing to encode
+		int next_frame(cv::Mat& out)
+		{
+			if (!_fes)
+				return 0;
+			maybe_restart();
+
+			SimpleEncoder enc = make_encoder();
+			enc.set_encode_id(_encodeId);
+			counting_stream cs(*_fes);
+			std::optional<cv::Mat> frame = enc.encode_next(cs, _canvasSize);
+			if (!frame)
+				return 0;
+			_frameBytes = cs.count();
+
+			cv::cvtColor(*frame, out, out.channels() == 4? cv::COLOR_RGB2BGRA : cv::COLOR_RGB2BGR);
+			return ++_frameCount;
+		}
+
+		// advance past `frames` frames without rendering them. Returns the number skipped.
+		unsigned skip(unsigned frames)
+		{
+			if (!_fes)
+				return 0;
+
+			unsigned skipped = 0;
+			if (!_frameBytes and frames)
+			{
+				// measure once, on a frame we were going to throw away anyway
+				cv::Mat scratch(frame_size(), frame_size(), CV_8UC3);
+				if (!next_frame(scratch))
+					return 0;
+				++skipped;
+			}
+
+			_scratch.resize(_frameBytes);
+			for (; skipped < frames and _fes->good(); ++skipped)
+			{
+				maybe_restart();
+				_fes->read(_scratch.data(), _frameBytes);
+				++_frameCount;
+			}
+			return skipped;
+		}
+
+		int frame_size() const
+		{
+			return std::max<int>(_canvasSize, cimbar::Config::image_size());
+		}
+
+		unsigned blocks_required() const
+		{
+			return _fes? _fes->blocks_required() : 0;
+		}
+
+		unsigned blocks_per_frame() const
+		{
+			return cimbar::Config::fountain_chunks_per_frame(cimbar::Config::symbol_bits() + _colorBits, _legacyMode);
+		}
+
+	protected:
+		SimpleEncoder make_encoder() const
+		{
+			SimpleEncoder enc(_ecc, cimbar::Config::symbol_bits(), _colorBits);
+			if (_legacyMode)
+				enc.set_legacy_mode();
+			return enc;
+		}
+
+		void maybe_restart()
+		{
+			// like cimbar_js: cycle through 8x the required blocks, then start over.
+			// too low and the receiver sees long runs of blocks it already has.
+			if (_fes->block_count() > _fes->blocks_required() * 8)
+			{
+				_fes->restart();
+				_frameCount = 0;
+			}
+		}
+
+	protected:
+		unsigned _colorBits;
+		unsigned _ecc;
+		int _compressionLevel;
+		bool _legacyMode;
+		int _canvasSize;
+
+		std::shared_ptr<fountain_encoder_stream> _fes;
+		uint8_t _encodeId = 109;
+		int _frameCount = 0;
+		unsigned _frameBytes = 0;
+		std::vector<char> _scratch;
+	};
+}
+
+extern "C" {
+
+void* cimbar_encoder_create(unsigned color_bits, unsigned ecc, int compression, int legacy_mode, int canvas_size)
+{
+	// defaults, same as cimbar_js configure()
+	if (color_bits > 3)
+		color_bits = cimbar::Config::color_bits();
+	if (ecc >= 150)
+		ecc = cimbar::Config::ecc_bytes();
+	if (compression < 0 or compression > 22)
+		compression = cimbar::Config::compression_level();
+	if (canvas_size < 0)
+		canvas_size = 0;
+	return new encoder_session(color_bits, ecc, compression, legacy_mode, canvas_size);
+}
+
+void cimbar_encoder_free(void* enc)
+{
+	delete static_cast<encoder_session*>(enc);
+}
+
+int cimbar_encoder_encode(void* enc, const unsigned char* buffer, unsigned size, int encode_id)
+{
+	if (!enc or (!buffer and size))
+		return 0;
+	return static_cast<encoder_session*>(enc)->encode(buffer, size, encode_id);
+}
+
+int cimbar_encoder_frame_size(void* enc)
+{
+	if (!enc)
+		return 0;
+	return static_cast<encoder_session*>(enc)->frame_size();
+}
+
+int cimbar_encoder_next_frame(void* enc, unsigned char* pixels, int channels, int stride)
+{
+	if (!enc or !pixels or (channels != 3 and channels != 4))
+		return -1;
+
+	encoder_session* session = static_cast<encoder_session*>(enc);
+	int size = session->frame_size();
+	if (stride < size * channels)
+		return -1;
+
+	cv::Mat out(size, size, channels == 4? CV_8UC4 : CV_8UC3, pixels, stride);
+	return session->next_frame(out);
+}
+
+unsigned cimbar_encoder_skip(void* enc, unsigned frames)
+{
+	if (!enc)
+		return 0;
+	return static_cast<encoder_session*>(enc)->skip(frames);
+}
+
+unsigned cimbar_encoder_blocks_required(void* enc)
+{
+	if (!enc)
+		return 0;
+	return static_cast<encoder_session*>(enc)->blocks_required();
+}
+
+unsigned cimbar_encoder_blocks_per_frame(void* enc)
+{
+	if (!enc)
+		return 0;
+	return static_cast<encoder_session*>(enc)->blocks_per_frame();
+}
+
+}
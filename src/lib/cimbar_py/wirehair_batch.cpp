@@ -0,0 +1,53 @@
+/* This code is subject to the terms of the Mozilla Public License, v.2.0. http://mozilla.org/MPL/2.0/. */
+#include "cimbar_py.h"
+
+#include "wirehair/wirehair.h"
+
+#include <cstddef>
+
+
+extern "C" {
+
+int cimbar_wirehair_encode_batch(void* codec, const unsigned* ids, unsigned count, unsigned char* out, unsigned stride, unsigned* lengths, unsigned* done)
+{
+	unsigned i = 0;
+	int res = Wirehair_Success;
+	if (!codec or !ids or !out or !lengths)
+		res = Wirehair_InvalidInput;
+
+	for (; res == Wirehair_Success and i < count; ++i)
+	{
+		uint32_t written = 0;
+		res = wirehair_encode(reinterpret_cast<WirehairCodec>(codec), ids[i], out + (size_t)i*stride, stride, &written);
+		if (res != Wirehair_Success)
+			break;
+		lengths[i] = written;
+	}
+
+	if (done)
+		*done = i;
+	return res;
+}
+
+int cimbar_wirehair_decode_batch(void* codec, const unsigned* ids, unsigned count, const unsigned char* blocks, unsigned stride, const unsigned* lengths, unsigned* done)
+{
+	unsigned i = 0;
+	int res = Wirehair_NeedMore;
+	if (!codec or !ids or !blocks)
+		res = Wirehair_InvalidInput;
+
+	for (; res == Wirehair_NeedMore and i < count; ++i)
+	{
+		res = wirehair_decode(reinterpret_cast<WirehairCodec>(codec), ids[i], blocks + (size_t)i*stride, lengths? lengths[i] : stride);
+		if (res == Wirehair_Success)
+			++i;
+		if (res != Wirehair_NeedMore)
+			break;
+	}
+
+	if (done)
+		*done = i;
+	return res;
+}
+
+}
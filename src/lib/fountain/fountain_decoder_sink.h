@@ -45,7 +45,8 @@ public:
 
 	void mark_done(const FountainMetadata& md)
 	{
-		_done.insert(md.id());
+		if (_done.insert(md.id()).second)
+			_doneOrder.push_back(md.id());
 		auto it = _streams.find(stream_slot(md));
 		if (it != _streams.end())
 			_streams.erase(it);
@@ -69,6 +70,12 @@ public:
 		return done;
 	}
 
+	// the i'th file to complete, in completion order (i < num_done())
+	std::string get_done(unsigned i) const
+	{
+		return get_filename(FountainMetadata(_doneOrder[i]));
+	}
+
 	std::vector<double> get_progress() const
 	{
 		std::vector<double> progress;
@@ -81,6 +88,23 @@ public:
 		return progress;
 	}
 
+	struct stream_status
+	{
+		unsigned slot;
+		unsigned blocks;
+		unsigned blocks_required;
+		unsigned size;
+	};
+
+	// per-stream detail for progress reporting: blocks received vs required, and the file size
+	std::vector<stream_status> get_stream_status() const
+	{
+		std::vector<stream_status> status;
+		for (auto&& [slot, s] : _streams)
+			status.push_back({slot, s.progress(), s.blocks_required(), (unsigned)s.data_size()});
+		return status;
+	}
+
 	bool is_done(uint32_t id) const
 	{
 		return _done.find(id) != _done.end();
@@ -147,5 +171,7 @@ protected:
 	std::unordered_map<uint8_t, fountain_decoder_stream> _streams;
 	// track the uint32_t combo of (encode_id,size) to avoid redundant work
 	std::set<uint32_t> _done;
+	// the same ids, in the order they completed
+	std::vector<uint32_t> _doneOrder;
 	bool _logWrites;
 };
@@ -75,6 +75,9 @@ TEST_CASE( "FountainSinkTest/testDefault", "[unit]" )
 
 	assertEquals( "", turbo::str::join(sink.get_progress()) );
 	assertEquals( "1.1600 0.1200", turbo::str::join(sink.get_done()) );
+	// by index, in the order they completed
+	assertEquals( "0.1200", sink.get_done(0) );
+	assertEquals( "1.1600", sink.get_done(1) );
 
 	string contents = File(tempdir.path() / "0.1200").read_all();
 	assertEquals( 1200, contents.size() );
@@ -138,4 +141,11 @@ TEST_CASE( "FountainSinkTest/testSameFrameManyTimes", "[unit]" )
 
 	assertEquals( "0.333333", turbo::str::join(sink.get_progress()) ); // 33% done
 	assertEquals( "", turbo::str::join(sink.get_done()) );
+
+	auto status = sink.get_stream_status();
+	assertEquals( 1, status.size() );
+	assertEquals( 3, status[0].slot );
+	assertEquals( 10, status[0].blocks );
+	assertEquals( 30, status[0].blocks_required );
+	assertEquals( 20000, status[0].size );
 }
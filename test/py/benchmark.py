@@ -0,0 +1,257 @@
+"""
+End-to-end throughput benchmark: cimbar --encode -> python_decoder pipeline -> fountain decode.
+
+For every combination of mode, ecc, color bits and payload size:
+  * encode a random (incompressible) payload -- in memory with libcimbar_py's encoder if available,
+    otherwise with `cimbar --encode`
+  * loop the encoded frames through the python decoder's capture/detect/decode pipeline,
+    the way a receiver watches a sender cycle through them
+  * stop when the payload has been reconstructed (or on timeout), and verify it
+
+Results are written as JSON, and optionally compared against a baseline recorded earlier on the same machine
+(throughput depends on the hardware, so no baseline is checked in).
+
+  python test/py/benchmark.py --sizes 10000 1000000 --output bench.json
+  python test/py/benchmark.py --baseline base.json --save-baseline     # record the current numbers
+  python test/py/benchmark.py --baseline base.json                     # fail on a regression against them
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from glob import glob
+from os.path import join as path_join
+
+import cv2
+
+from helpers import CIMBAR_SRC
+from test_cimbar_cli import CIMBAR_EXE
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+import cimbar_native  # noqa: E402
+from cimbar_session import CimbarDecodeSession  # noqa: E402
+from detectors import create_detector  # noqa: E402
+from perspective import PerspectiveNormalizer  # noqa: E402
+from pipeline import DecodePipeline  # noqa: E402
+
+
+# metrics where bigger is better / smaller is better
+HIGHER_IS_BETTER = ('frames_per_second', 'kbps')
+LOWER_IS_BETTER = ('time_to_first_file',)
+
+
+class LoopSource():
+    """Pipeline capture source that cycles through the encoded frames, like a screen showing the sender."""
+    def __init__(self, frames):
+        self.frames = frames
+        self.index = 0
+
+    def open(self):
+        pass
+
+    def grab(self, crop=None):
+        frame = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        if crop is None:
+            return frame, (0, 0)
+        x, y, w, h = crop
+        x, y = max(0, x), max(0, y)
+        return frame[y:y+h, x:x+w], (x, y)
+
+    def close(self):
+        pass
+
+
+class FrameDecoder():
+    """decode(roi) -> newly completed files. libcimbar_py if available, otherwise a persistent cimbar process."""
+    def __init__(self, output_dir, mode, ecc, color_bits):
+        self.session = None
+        self.native = None
+        if cimbar_native.is_available():
+            self.native = cimbar_native.Decoder(output_dir, color_bits, ecc, legacy_mode=(mode.upper() == '4C'))
+        else:
+            self.session = CimbarDecodeSession(
+                CIMBAR_EXE, output_dir, extra_args=['-m', mode, '-e', str(ecc), '-c', str(color_bits)])
+            fd, self.temp_path = tempfile.mkstemp(prefix='cimbar_bench_', suffix='.png', dir=output_dir)
+            os.close(fd)
+
+    @property
+    def backend(self):
+        return 'native' if self.native else 'session'
+
+    def decode(self, roi):
+        if self.native:
+            return self.native.decode(roi).new_files
+        cv2.imwrite(self.temp_path, roi)
+        return self.session.decode_file(self.temp_path)[1]
+
+    def close(self):
+        if self.native:
+            self.native.close()
+        if self.session:
+            self.session.close()
+            os.remove(self.temp_path)
+
+
+def encode(payload, payload_path, prefix, mode, ecc, color_bits):
+    if cimbar_native.is_available():
+        with cimbar_native.Encoder(color_bits, ecc, legacy_mode=(mode.upper() == '4C')) as encoder:
+            encoder.encode(payload)
+            # roughly the frame budget `cimbar --encode` writes (redundancy 1.2)
+            return list(encoder.frames(max(1, math.ceil(encoder.frames_required() * 1.2))))
+
+    cmd = [CIMBAR_EXE, '--encode', '-i', payload_path, '-o', prefix,
+           '-m', mode, '-e', str(ecc), '-c', str(color_bits)]
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    paths = sorted(glob(f'{prefix}_*.png'), key=lambda p: int(p.rsplit('_', 1)[1].split('.')[0]))
+    return [cv2.imread(p) for p in paths]
+
+
+def case_key(mode, ecc, color_bits, size):
+    return f'{mode}-ecc{ecc}-c{color_bits}-{size}'
+
+
+def run_case(mode, ecc, color_bits, size, fps, timeout):
+    with tempfile.TemporaryDirectory(prefix='cimbar_bench_') as workdir:
+        payload = random.Random(size).randbytes(size)
+        payload_path = path_join(workdir, 'payload.bin')
+        with open(payload_path, 'wb') as f:
+            f.write(payload)
+
+        frames = encode(payload, payload_path, path_join(workdir, 'frame'), mode, ecc, color_bits)
+        output_dir = path_join(workdir, 'out')
+        os.makedirs(output_dir)
+
+        decoder = FrameDecoder(output_dir, mode, ecc, color_bits)
+        completed = []
+        done = threading.Event()
+
+        def on_roi(roi, bbox):
+            for path in decoder.decode(roi):
+                completed.append((time.perf_counter(), path))
+                done.set()
+
+        # the decoders run with --no-deskew, so detections are warped onto the 1024x1024 grid first
+        detector, normalizer = create_detector('anchor'), PerspectiveNormalizer()
+        pipeline = DecodePipeline(LoopSource(frames), detect=lambda image: detector.detect(image, normalizer),
+                                  decode=on_roi, fps=fps)
+        start = time.perf_counter()
+        pipeline.start()
+        try:
+            done.wait(timeout)
+        finally:
+            pipeline.stop()
+            decoder.close()
+        elapsed = time.perf_counter() - start
+
+        result = {
+            'mode': mode,
+            'ecc': ecc,
+            'color_bits': color_bits,
+            'size': size,
+            'backend': decoder.backend,
+            'frames_encoded': len(frames),
+            'frames_captured': pipeline.captured,
+            'frames_decoded': pipeline.decoded,
+            'elapsed': round(elapsed, 3),
+            'completed': bool(completed),
+            'verified': False,
+        }
+        if completed:
+            first_time, path = completed[0]
+            ttf = first_time - start
+            with open(path, 'rb') as f:
+                result['verified'] = f.read() == payload
+            result['time_to_first_file'] = round(ttf, 3)
+            result['frames_per_second'] = round(pipeline.decoded / elapsed, 2)
+            result['kbps'] = round(size * 8 / ttf / 1000, 1)
+        return result
+
+
+def compare(results, baseline, tolerance):
+    """returns a list of regressions vs the baseline, as human-readable strings"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        if previous.get('completed') and not current.get('completed'):
+            regressions.append(f'{key}: no longer completes')
+            continue
+        for metric in HIGHER_IS_BETTER:
+            if metric in previous and metric in current and current[metric] < previous[metric] * (1 - tolerance):
+                regressions.append(f'{key}: {metric} {current[metric]} < baseline {previous[metric]}')
+        for metric in LOWER_IS_BETTER:
+            if metric in previous and metric in current and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f'{key}: {metric} {current[metric]} > baseline {previous[metric]}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='cimbar encode -> python decoder throughput benchmark')
+    parser.add_argument('--modes', nargs='+', default=['B', '4C'])
+    parser.add_argument('--ecc', nargs='+', type=int, default=[30])
+    parser.add_argument('--color-bits', nargs='+', type=int, default=[2])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000, 1000000])
+    parser.add_argument('--fps', type=float, default=60.0, help='simulated capture rate')
+    parser.add_argument('--timeout', type=float, default=120.0, help='per-case timeout, in seconds')
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--baseline', help='baseline JSON to compare against (or to write, with --save-baseline)')
+    parser.add_argument('--save-baseline', action='store_true', help='overwrite the baseline with these results')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed relative slowdown vs the baseline')
+    args = parser.parse_args()
+    if args.save_baseline and not args.baseline:
+        parser.error('--save-baseline needs --baseline PATH')
+
+    if not os.path.exists(CIMBAR_EXE) and not cimbar_native.is_available():
+        print(f'{CIMBAR_EXE} not found -- build and install cimbar (or libcimbar_py) first')
+        return 2
+
+    results = {}
+    for mode in args.modes:
+        for ecc in args.ecc:
+            for color_bits in args.color_bits:
+                for size in args.sizes:
+                    key = case_key(mode, ecc, color_bits, size)
+                    result = run_case(mode, ecc, color_bits, size, args.fps, args.timeout)
+                    results[key] = result
+                    if result['completed']:
+                        print(f"{key}: {result['frames_per_second']} frames/s, {result['kbps']} kbit/s, "
+                              f"first file in {result['time_to_first_file']}s "
+                              f"({'ok' if result['verified'] else 'MISMATCH'}, {result['backend']})")
+                    else:
+                        print(f"{key}: did not complete in {args.timeout}s ({result['frames_decoded']} frames decoded)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failed = [key for key, r in results.items() if r['completed'] and not r['verified']]
+    for key in failed:
+        print(f'MISMATCH {key}: decoded file differs from the payload')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'baseline saved to {args.baseline}')
+        return 1 if failed else 0
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    elif args.baseline:
+        print(f'no baseline at {args.baseline} -- run with --save-baseline to record one')
+    for line in regressions:
+        print(f'REGRESSION {line}')
+    return 1 if regressions or failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Detector benchmark: per-frame cost and hit rate of each python_decoder detector.
+
+Synthetic screenshots are built from the real code layout -- the anchors, and cell tiles from bitmap/ --
+warped with a little perspective onto a busy desktop-like background. A detection is a hit when all
+four corners land within `--tolerance` (fraction of the code size) of the true corners. A CODE_SIZE of 0
+makes frames without a code, to time a miss; there a hit means finding nothing.
+
+  python test/py/benchmark_detectors.py
+  python test/py/benchmark_detectors.py --frames 1920x1080:1024 3840x2160:1024 3840x2160:2048 --count 20
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from glob import glob
+from os.path import join as path_join
+
+import cv2
+import numpy as np
+
+from helpers import CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+from detectors import DETECTORS, create_detector  # noqa: E402
+
+
+BITMAP_DIR = path_join(CIMBAR_SRC, 'bitmap')
+IMAGE_SIZE = 1024
+ANCHOR_SIZE = 60
+CELL_SPACING = 9
+CELL_OFFSET = 8
+CELLS_PER_COL = 112
+CORNER_PADDING = 6
+COLORS = [(255, 255, 0), (255, 0, 255), (0, 255, 255), (0, 255, 0)]
+
+
+def load_tile(path):
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    return image[:, :, :3] * (image[:, :, 3:] / 255.0)
+
+
+def make_code(rng):
+    """one 1024x1024 dark-mode code: anchors in the corners, random colored tiles in the cell grid"""
+    code = np.zeros((IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.uint8)
+    tiles = [load_tile(p) for p in sorted(glob(path_join(BITMAP_DIR, '4', '*.png')))]
+    for row in range(CELLS_PER_COL):
+        for col in range(CELLS_PER_COL):
+            near_row = row < CORNER_PADDING or row >= CELLS_PER_COL - CORNER_PADDING
+            near_col = col < CORNER_PADDING or col >= CELLS_PER_COL - CORNER_PADDING
+            if near_row and near_col:
+                continue
+            x, y = CELL_OFFSET + col * CELL_SPACING, CELL_OFFSET + row * CELL_SPACING
+            tile = tiles[rng.randrange(len(tiles))] / 255.0 * np.array(rng.choice(COLORS))
+            code[y:y+8, x:x+8] = tile.astype(np.uint8)
+
+    anchor = load_tile(path_join(BITMAP_DIR, 'anchor-dark.png')).astype(np.uint8)
+    secondary = load_tile(path_join(BITMAP_DIR, 'anchor-secondary-dark.png')).astype(np.uint8)
+    far = IMAGE_SIZE - ANCHOR_SIZE
+    code[:ANCHOR_SIZE, :ANCHOR_SIZE] = anchor
+    code[:ANCHOR_SIZE, far:] = anchor
+    code[far:, :ANCHOR_SIZE] = anchor
+    code[far:, far:] = secondary
+    return code
+
+
+def make_background(rng, width, height):
+    """light desktop: a few windows, text-like strokes and some noise"""
+    background = np.full((height, width, 3), 230, dtype=np.uint8)
+    for _ in range(12):
+        x, y = rng.randrange(width), rng.randrange(height)
+        w, h = rng.randrange(100, width // 2), rng.randrange(80, height // 2)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        cv2.rectangle(background, (x, y), (x + w, y + h), color, -1)
+        cv2.rectangle(background, (x, y), (x + w, y + h), (40, 40, 40), 2)
+    for _ in range(300):
+        x, y = rng.randrange(width), rng.randrange(height)
+        cv2.putText(background, 'cimbar', (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (20, 20, 20), 1)
+    noise = np.random.default_rng(rng.randrange(1 << 32)).integers(-8, 9, background.shape)
+    return np.clip(background + noise, 0, 255).astype(np.uint8)
+
+
+def make_frame(rng, code, width, height, code_size):
+    """the code at code_size px, at a random spot with a few percent of perspective, on a random background"""
+    frame = make_background(rng, width, height)
+    if not code_size:
+        return frame, None
+    x0 = rng.randrange(0, width - code_size + 1)
+    y0 = rng.randrange(0, height - code_size + 1)
+
+    def jitter():
+        return rng.uniform(0, code_size * 0.03)
+
+    corners = np.float32([
+        [x0 + jitter(), y0 + jitter()],
+        [x0 + code_size - jitter(), y0 + jitter()],
+        [x0 + code_size - jitter(), y0 + code_size - jitter()],
+        [x0 + jitter(), y0 + code_size - jitter()],
+    ])
+    source = np.float32([[0, 0], [IMAGE_SIZE, 0], [IMAGE_SIZE, IMAGE_SIZE], [0, IMAGE_SIZE]])
+    matrix = cv2.getPerspectiveTransform(source, corners)
+    warped = cv2.warpPerspective(code, matrix, (width, height), flags=cv2.INTER_AREA)
+    mask = cv2.warpPerspective(np.full(code.shape[:2], 255, np.uint8), matrix, (width, height))
+    frame[mask > 0] = warped[mask > 0]
+    return frame, corners
+
+
+def is_hit(detections, corners, code_size, tolerance):
+    if corners is None:
+        return not detections
+    if not detections:
+        return False
+    error = np.linalg.norm(detections[0].corners - corners, axis=1).max()
+    return bool(error < tolerance * code_size)
+
+
+def run(detector_name, frames, repeat, tolerance):
+    detector = create_detector(detector_name)
+    hits = 0
+    times = []
+    for frame, corners, code_size in frames:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            detections = detector.find(frame)
+            times.append(time.perf_counter() - start)
+        hits += is_hit(detections, corners, code_size, tolerance)
+    return {
+        'ms_per_frame': round(1000 * float(np.median(times)), 2),
+        'ms_worst': round(1000 * max(times), 2),
+        'hit_rate': round(hits / len(frames), 3),
+    }
+
+
+def parse_frame_spec(spec):
+    """WIDTHxHEIGHT:CODE_SIZE"""
+    resolution, code_size = spec.split(':')
+    width, height = resolution.split('x')
+    return int(width), int(height), int(code_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark python_decoder detectors on synthetic screenshots')
+    parser.add_argument('--detectors', nargs='+', default=list(DETECTORS), choices=list(DETECTORS))
+    parser.add_argument('--frames', nargs='+', default=['1920x1080:1024', '1920x1080:720', '1920x1080:0',
+                                                         '3840x2160:1024', '3840x2160:2048', '3840x2160:0'],
+                        help='WIDTHxHEIGHT:CODE_SIZE scenes to generate')
+    parser.add_argument('--count', type=int, default=10, help='frames per scene')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per frame')
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help='max corner error, as a fraction of the code size')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    code = make_code(rng)
+    results = []
+    for spec in args.frames:
+        width, height, code_size = parse_frame_spec(spec)
+        frames = [make_frame(rng, code, width, height, code_size) + (code_size,) for _ in range(args.count)]
+        for name in args.detectors:
+            result = {'frame': spec, 'detector': name, **run(name, frames, args.repeat, args.tolerance)}
+            results.append(result)
+            print(f"{spec:>16} {name:>8}: {result['ms_per_frame']:7.2f} ms/frame "
+                  f"(worst {result['ms_worst']:7.2f}), hit rate {result['hit_rate']:.0%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
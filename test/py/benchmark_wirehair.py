@@ -0,0 +1,142 @@
+"""
+Wirehair block throughput benchmark: per-block ctypes calls vs the batch API, plus a lossy-channel simulation.
+
+For every block size:
+  * encode the same block IDs with a `WirehairEncoder.encode()` loop and with one `encode_batch()` call
+  * decode them with a `WirehairDecoder.decode()` loop and with one `decode_batch()` call
+  * check that both paths produce identical blocks and recover the message
+
+Then simulate `--transfers` transfers over a channel that drops each block with probability `--loss`,
+using the batch API, and report how many blocks the decoder needed beyond N.
+
+  python test/py/benchmark_wirehair.py --block-sizes 32 1400 --message-size 100000
+  WIREHAIR_LIB=/path/to/libcimbar_py.so python test/py/benchmark_wirehair.py --loss 0.2 --transfers 1000
+"""
+import argparse
+import sys
+import time
+from os.path import join as path_join
+
+import numpy as np
+
+from helpers import CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+import wirehair  # noqa: E402
+
+
+def timed(fn, repeat):
+    """best wall time of `repeat` runs, and the last result"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def loop_encode(encoder, ids):
+    out = np.empty((len(ids), encoder.block_bytes), dtype=np.uint8)
+    lengths = np.empty(len(ids), dtype=np.uint32)
+    for i, block_id in enumerate(ids):
+        lengths[i] = len(encoder.encode(int(block_id), out[i]))
+    return out, lengths
+
+
+def loop_decode(message_size, block_size, ids, blocks):
+    with wirehair.WirehairDecoder(message_size, block_size) as decoder:
+        for i, block_id in enumerate(ids):
+            if decoder.decode(int(block_id), blocks[i]):
+                return bytes(decoder.recover())
+
+
+def batch_decode(message_size, block_size, ids, blocks):
+    with wirehair.WirehairDecoder(message_size, block_size) as decoder:
+        if decoder.decode_batch(ids, blocks):
+            return bytes(decoder.recover())
+
+
+def run_case(message, block_size, repeat):
+    with wirehair.WirehairEncoder(message, block_size) as encoder:
+        # skip a few originals so decoding has to solve, not just copy
+        ids = np.arange(encoder.block_count + encoder.block_count // 10 + 16, dtype=np.uint32)[::-1]
+        loop_time, (loop_blocks, loop_lengths) = timed(lambda: loop_encode(encoder, ids), repeat)
+        batch_time, (batch_blocks, batch_lengths) = timed(lambda: encoder.encode_batch(ids), repeat)
+    # bytes past the end of the short last original block are not written
+    same_blocks = np.array_equal(loop_lengths, batch_lengths) and all(
+        np.array_equal(a[:size], b[:size]) for a, b, size in zip(loop_blocks, batch_blocks, loop_lengths))
+
+    loop_decode_time, loop_message = timed(lambda: loop_decode(len(message), block_size, ids, loop_blocks), repeat)
+    batch_decode_time, batch_message = timed(lambda: batch_decode(len(message), block_size, ids, batch_blocks),
+                                             repeat)
+    return {
+        'blocks': len(ids),
+        'encode_loop_us': loop_time * 1e6 / len(ids),
+        'encode_batch_us': batch_time * 1e6 / len(ids),
+        'decode_loop_us': loop_decode_time * 1e6 / len(ids),
+        'decode_batch_us': batch_decode_time * 1e6 / len(ids),
+        'verified': same_blocks and loop_message == message == batch_message,
+    }
+
+
+def simulate(message, block_size, loss, transfers, seed):
+    """transfers over a lossy channel; returns (transfers per second, mean / max blocks received beyond N)"""
+    rng = np.random.default_rng(seed)
+    with wirehair.WirehairEncoder(message, block_size) as encoder:
+        n = encoder.block_count
+        # enough blocks to survive the loss rate with a wide margin, encoded once and reused for every transfer
+        ids = np.arange(int(n / max(1.0 - loss, 0.01) * 1.5) + 64, dtype=np.uint32)
+        blocks, _ = encoder.encode_batch(ids)
+
+    overheads = []
+    start = time.perf_counter()
+    for _ in range(transfers):
+        kept = rng.random(len(ids)) >= loss
+        with wirehair.WirehairDecoder(len(message), block_size) as decoder:
+            if not decoder.decode_batch(ids[kept], blocks[kept]):
+                raise RuntimeError('channel too lossy for the simulated block budget')
+            overheads.append(decoder.received - n)
+    elapsed = time.perf_counter() - start
+    return transfers / elapsed, float(np.mean(overheads)), int(np.max(overheads))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='wirehair per-block vs batch throughput benchmark')
+    parser.add_argument('--block-sizes', nargs='+', type=int, default=[32, 256, 1400])
+    parser.add_argument('--message-size', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3, help='report the best of this many runs')
+    parser.add_argument('--loss', type=float, default=0.1, help='simulated block loss probability')
+    parser.add_argument('--transfers', type=int, default=200, help='simulated lossy transfers per block size')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not wirehair.is_available():
+        print('wirehair library not found -- build libcimbar_py, or set WIREHAIR_LIB')
+        return 2
+    if not wirehair.has_batch():
+        print('loaded library has no batch entry points -- the batch numbers below use the per-block fallback')
+
+    message = np.random.default_rng(args.seed).integers(0, 256, args.message_size, dtype=np.uint8).tobytes()
+    failed = []
+    for block_size in args.block_sizes:
+        result = run_case(message, block_size, args.repeat)
+        print(f"block {block_size}B x {result['blocks']}: "
+              f"encode {result['encode_loop_us']:.2f} -> {result['encode_batch_us']:.2f} us/block "
+              f"({result['encode_loop_us'] / result['encode_batch_us']:.1f}x), "
+              f"decode {result['decode_loop_us']:.2f} -> {result['decode_batch_us']:.2f} us/block "
+              f"({result['decode_loop_us'] / result['decode_batch_us']:.1f}x) "
+              f"{'ok' if result['verified'] else 'MISMATCH'}")
+        if not result['verified']:
+            failed.append(block_size)
+
+        if args.transfers:
+            rate, mean_overhead, max_overhead = simulate(message, block_size, args.loss, args.transfers, args.seed)
+            print(f"  {args.transfers} transfers at {args.loss:.0%} loss: {rate:.1f} transfers/s, "
+                  f"extra blocks mean {mean_overhead:.2f} max {max_overhead}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
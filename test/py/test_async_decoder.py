@@ -0,0 +1,194 @@
+import asyncio
+import sys
+import threading
+from collections import namedtuple
+from os.path import join as path_join
+from unittest import TestCase
+
+import numpy as np
+
+from helpers import TestDirMixin, CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+from async_decoder import AsyncCimbarDecoder  # noqa: E402
+
+
+DecodeResult = namedtuple('DecodeResult', ['bytes', 'new_files'])
+
+
+def frame(i):
+    return np.full((8, 8, 3), i, dtype=np.uint8)
+
+
+class FakeDetector:
+    """every frame is a hit, and the frame itself is the roi"""
+    def detect(self, image, normalizer=None):
+        return True, image, (0, 0, image.shape[1], image.shape[0])
+
+
+class FakeNative:
+    """stands in for cimbar_native.Decoder: frame i carries 10 blocks of one file, frame `last` completes it
+
+    gate: if set, decode() blocks until it is set, so tests can hold a decode in the executor thread
+    """
+    def __init__(self, output_dir, last=None, gate=None):
+        self.output_dir = output_dir
+        self.last = last
+        self.gate = gate
+        self.started = threading.Event()
+        self.seen = []
+        self.active = 0
+        self.max_active = 0
+        self.closed = False
+        self.closed_while_decoding = False
+        self._lock = threading.Lock()
+
+    def decode(self, image):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.started.set()
+        try:
+            if self.gate is not None:
+                self.gate.wait(10)
+            i = int(image[0, 0, 0])
+            self.seen.append(i)
+            new_files = [path_join(self.output_dir, '5.1000')] if i == self.last else []
+            return DecodeResult(100, new_files)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def streams(self):
+        if self.seen and self.seen[-1] == self.last:
+            return []
+        return [(0, 10 * len(self.seen), 1000, 1000)]
+
+    def close(self):
+        self.closed_while_decoding = self.active > 0
+        self.closed = True
+
+
+class AsyncDecoderTest(TestDirMixin, TestCase):
+    def decoder(self, native, **kwargs):
+        decoder = AsyncCimbarDecoder(output_dir=self.working_dir.name, use_native=False, fps=0, **kwargs)
+        decoder.detector = FakeDetector()
+        decoder.native = native
+        return decoder
+
+    def test_event_order(self):
+        native = FakeNative(self.working_dir.name, last=2)
+
+        async def frames():
+            for i in range(3):
+                yield frame(i)
+
+        async def run():
+            async with self.decoder(native, latest=False, expected_files=1) as decoder:
+                return [event async for event in decoder.stream(frames())]
+
+        events = asyncio.run(run())
+        self.assertEqual([0, 1, 2], native.seen)
+        self.assertEqual(['decode', 'progress', 'decode', 'progress', 'decode', 'complete'],
+                         [e['event'] for e in events])
+        self.assertEqual([path_join(self.working_dir.name, '5.1000')], events[-2]['new_files'])
+        self.assertTrue(native.closed)
+
+    def test_backpressure_keeps_every_frame(self):
+        gate = threading.Event()
+        native = FakeNative(self.working_dir.name, gate=gate)
+        yielded = []
+
+        async def run():
+            decoder = self.decoder(native, latest=False, max_pending=1)
+
+            async def frames():
+                for i in range(5):
+                    yielded.append(i)
+                    yield frame(i)
+
+            async def release():
+                await asyncio.get_running_loop().run_in_executor(None, native.started.wait)
+                await asyncio.sleep(0.1)
+                # frame 0 is decoding and frame 1 is queued: the source is paused putting frame 2
+                paused = list(yielded)
+                gate.set()
+                return paused
+
+            async with decoder:
+                releaser = asyncio.ensure_future(release())
+                [e async for e in decoder.stream(frames())]
+                return decoder, await releaser
+
+        decoder, paused = asyncio.run(run())
+        self.assertEqual([0, 1, 2], paused)
+        self.assertEqual([0, 1, 2, 3, 4], native.seen)
+        self.assertEqual(0, decoder.dropped)
+
+    def test_latest_drops_stale_frames(self):
+        gate = threading.Event()
+        native = FakeNative(self.working_dir.name, gate=gate)
+
+        async def run():
+            decoder = self.decoder(native, latest=True, max_pending=1)
+            submitted = asyncio.Event()
+
+            async def frames():
+                yield frame(0)
+                await asyncio.get_running_loop().run_in_executor(None, native.started.wait)
+                for i in range(1, 5):
+                    yield frame(i)
+                submitted.set()
+                # keep the source open until the decoder has caught up
+                await asyncio.sleep(0.2)
+
+            async def release():
+                await submitted.wait()
+                # the last frame still has to pass detection before it replaces the queued one
+                await asyncio.sleep(0.1)
+                gate.set()
+
+            async with decoder:
+                releaser = asyncio.ensure_future(release())
+                events = [e async for e in decoder.stream(frames())]
+                await releaser
+                return decoder, events
+
+        decoder, _ = asyncio.run(run())
+        # frames 1-3 were replaced in the queue while frame 0 was being decoded
+        self.assertEqual([0, 4], native.seen)
+        self.assertEqual(3, decoder.dropped)
+
+    def test_cancel_mid_decode_then_close(self):
+        gate = threading.Event()
+        native = FakeNative(self.working_dir.name, gate=gate)
+
+        async def run():
+            decoder = self.decoder(native)
+            loop = asyncio.get_running_loop()
+            first = asyncio.ensure_future(decoder.decode(frame(1)))
+            await loop.run_in_executor(None, native.started.wait)
+            first.cancel()
+            await asyncio.sleep(0.05)
+
+            # the thread is still inside native.decode: neither a second decode nor aclose may use the session
+            second = asyncio.ensure_future(decoder.decode(frame(2)))
+            closing = asyncio.ensure_future(decoder.aclose())
+            await asyncio.sleep(0.1)
+            self.assertFalse(first.done())
+            self.assertFalse(native.closed)
+            self.assertEqual(1, native.max_active)
+
+            gate.set()
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+            second_events = await second
+            await closing
+            return second_events
+
+        events = asyncio.run(run())
+        self.assertEqual('decode', events[0]['event'])
+        self.assertEqual([1, 2], native.seen)
+        self.assertEqual(1, native.max_active)
+        self.assertTrue(native.closed)
+        self.assertFalse(native.closed_while_decoding)
@@ -0,0 +1,84 @@
+import itertools
+import sys
+from os.path import join as path_join
+from unittest import TestCase
+from unittest.mock import patch
+
+from helpers import CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+from candidate_decode import CandidateMemory  # noqa: E402
+
+
+LEFT = (0, 0, 100, 100)
+RIGHT = (500, 0, 100, 100)
+MIDDLE = (250, 0, 100, 100)
+
+
+class CandidateMemoryTest(TestCase):
+    def setUp(self):
+        # a strictly increasing clock, so recency never ties
+        patcher = patch('candidate_decode.time.time', side_effect=itertools.count(1.0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rank_keeps_detector_order_without_history(self):
+        memory = CandidateMemory()
+        self.assertEqual([0, 1, 2], memory.rank([LEFT, MIDDLE, RIGHT]))
+
+    def test_rank_prefers_regions_that_decoded(self):
+        memory = CandidateMemory(min_iou=0.5)
+        memory.record([LEFT, MIDDLE, RIGHT], [2])
+        self.assertEqual([2, 0, 1], memory.rank([LEFT, MIDDLE, RIGHT]))
+
+        # a slightly moved region still counts as the same place
+        self.assertEqual([1, 0], memory.rank([LEFT, (510, 5, 100, 100)]))
+        # a barely overlapping one does not
+        self.assertEqual([0, 1], memory.rank([LEFT, (570, 0, 100, 100)]))
+
+        # more successes rank first
+        memory.record([LEFT], [0])
+        memory.record([LEFT], [0])
+        self.assertEqual([1, 2, 0], memory.rank([MIDDLE, LEFT, RIGHT]))
+
+    def test_follows_a_moving_code(self):
+        memory = CandidateMemory(min_iou=0.5)
+        memory.record([LEFT], [0])
+        memory.record([(20, 0, 100, 100)], [0])
+        memory.record([(40, 0, 100, 100)], [0])
+        self.assertEqual(1, len(memory.entries))
+        self.assertEqual((40, 0, 100, 100), memory.entries[0][0])
+        self.assertEqual(3, memory.entries[0][1])
+        # the original spot has drifted out of reach (IoU 0.43)
+        self.assertEqual([1, 0], memory.rank([LEFT, (60, 0, 100, 100)]))
+
+    def test_forget_after_max_misses(self):
+        memory = CandidateMemory(max_misses=3)
+        memory.record([LEFT], [0])
+        memory.record([LEFT], [])
+        memory.record([LEFT], [])
+        # a success resets the miss count
+        memory.record([LEFT], [0])
+        memory.record([LEFT], [])
+        memory.record([LEFT], [])
+        self.assertEqual([1, 0], memory.rank([RIGHT, LEFT]))
+
+        memory.record([LEFT, RIGHT], [])
+        self.assertEqual([], memory.entries)
+        self.assertEqual([0, 1], memory.rank([RIGHT, LEFT]))
+
+    def test_misses_only_count_when_nothing_decoded(self):
+        memory = CandidateMemory(max_misses=1)
+        memory.record([LEFT], [0])
+        # LEFT was a candidate in a frame where RIGHT decoded: not a miss
+        memory.record([LEFT, RIGHT], [1])
+        self.assertEqual([LEFT, RIGHT], [e[0] for e in memory.entries])
+
+    def test_max_entries_keeps_the_most_recent(self):
+        memory = CandidateMemory(max_entries=2)
+        for bbox in (LEFT, MIDDLE, RIGHT):
+            memory.record([bbox], [0])
+        self.assertEqual({MIDDLE, RIGHT}, {e[0] for e in memory.entries})
+
+        memory.clear()
+        self.assertEqual([], memory.entries)
@@ -1,3 +1,5 @@
+import json
+import random
 import subprocess
 from subprocess import PIPE
 from os.path import join as path_join, getsize
@@ -86,3 +88,68 @@ class CimbarCliTest(TestDirMixin, TestCase):
             actual = r.read()
 
         self.assertEqual(expected, actual)
+
+    def test_decode_session_ack(self):
+        # encode
+        infile = path_join(CIMBAR_SRC, 'LICENSE')
+        outprefix = path_join(self.working_dir.name, 'img')
+        cmd = _get_command('--encode -i', infile, '-o', outprefix)
+
+        res = subprocess.run(cmd, stdout=PIPE)
+        self.assertEqual(0, res.returncode)
+        encoded_img = f'{outprefix}_0.png'
+
+        # long-lived decode: one filename per line, one ack per frame
+        cmd = _get_command('--ack --no-deskew -o', self.working_dir.name)
+        proc = subprocess.Popen(cmd, stdin=PIPE, stdout=PIPE, text=True, bufsize=1)
+        try:
+            proc.stdin.write(encoded_img + '\n')
+            proc.stdin.flush()
+            decoded_file = proc.stdout.readline().strip()
+            ack = proc.stdout.readline().strip()
+
+            self.assertTrue(self.working_dir.name in decoded_file)
+            self.assertTrue(ack.startswith('#frame '))
+            self.assertTrue(int(ack.split(' ')[1]) > 0)
+
+            # the file is already done -- the session stays up, but nothing new is written
+            proc.stdin.write(encoded_img + '\n')
+            proc.stdin.flush()
+            self.assertTrue(proc.stdout.readline().startswith('#frame '))
+        finally:
+            proc.stdin.close()
+            proc.wait()
+
+        with open(infile) as r:
+            expected = r.read()
+        with open(decoded_file) as r:
+            actual = r.read()
+
+        self.assertEqual(expected, actual)
+
+    def test_decode_session_progress(self):
+        # a payload that spans several frames, so one frame leaves the stream in flight
+        infile = path_join(self.working_dir.name, 'payload.bin')
+        with open(infile, 'wb') as f:
+            f.write(bytes(random.Random(12).getrandbits(8) for _ in range(100000)))
+        outprefix = path_join(self.working_dir.name, 'img')
+        cmd = _get_command('--encode -i', infile, '-o', outprefix)
+
+        res = subprocess.run(cmd, stdout=PIPE)
+        self.assertEqual(0, res.returncode)
+
+        cmd = _get_command('--ack --progress --no-deskew -o', self.working_dir.name)
+        proc = subprocess.Popen(cmd, stdin=PIPE, stdout=PIPE, text=True, bufsize=1)
+        try:
+            proc.stdin.write(f'{outprefix}_0.png\n')
+            proc.stdin.flush()
+            status = json.loads(proc.stdout.readline())
+            ack = proc.stdout.readline().strip()
+        finally:
+            proc.stdin.close()
+            proc.wait()
+
+        self.assertTrue(ack.startswith('#frame '))
+        self.assertTrue(0 < status['blocks'] < status['required'])
+        self.assertTrue(0 <= status['slot'] < 8)
+        self.assertTrue(status['size'] > 0)
@@ -0,0 +1,70 @@
+import random
+import sys
+from os.path import join as path_join
+from unittest import TestCase, skipUnless
+
+import numpy as np
+
+from helpers import TestDirMixin, CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+import cimbar_native  # noqa: E402
+
+
+def decode_frames(decoder, frames):
+    for frame in frames:
+        res = decoder.decode(frame)
+        if res.new_files:
+            return res.new_files
+    return []
+
+
+@skipUnless(cimbar_native.is_available(), 'libcimbar_py not built')
+class CimbarNativeTest(TestDirMixin, TestCase):
+    def _roundtrip(self, legacy_mode):
+        payload = random.Random(1).randbytes(20000)
+        with cimbar_native.Encoder(legacy_mode=legacy_mode) as encoder, \
+                cimbar_native.Decoder(self.working_dir.name, legacy_mode=legacy_mode) as decoder:
+            encoder.encode(payload)
+            self.assertEqual(1024, encoder.frame_size)
+            self.assertTrue(encoder.blocks_required() > 0)
+
+            files = decode_frames(decoder, encoder.frames(encoder.frames_required() * 4))
+
+        self.assertEqual(1, len(files))
+        with open(files[0], 'rb') as f:
+            self.assertEqual(payload, f.read())
+
+    def test_encoder_roundtrip(self):
+        self._roundtrip(legacy_mode=False)
+
+    def test_encoder_roundtrip_legacy(self):
+        self._roundtrip(legacy_mode=True)
+
+    def test_encoder_roundtrip_bgra(self):
+        payload = random.Random(2).randbytes(5000)
+        with cimbar_native.Encoder() as encoder, cimbar_native.Decoder(self.working_dir.name) as decoder:
+            encoder.encode(payload)
+            files = decode_frames(decoder, encoder.frames(encoder.frames_required() * 4, channels=4))
+
+        self.assertEqual(1, len(files))
+        with open(files[0], 'rb') as f:
+            self.assertEqual(payload, f.read())
+
+    def test_encoder_skip(self):
+        payload = random.Random(3).randbytes(50000)
+        with cimbar_native.Encoder() as full, cimbar_native.Encoder() as skipping:
+            full.encode(payload, encode_id=5)
+            skipping.encode(payload, encode_id=5)
+
+            frames = list(full.frames(4))
+            self.assertEqual(3, skipping.skip(3))
+            self.assertTrue(np.array_equal(frames[3], skipping.next_frame()))
+
+    def test_encoder_requires_encode(self):
+        with cimbar_native.Encoder() as encoder:
+            with self.assertRaises(RuntimeError):
+                encoder.next_frame()
+            encoder.encode(b'hello world')
+            with self.assertRaises(ValueError):
+                encoder.next_frame(np.zeros((100, 100, 3), dtype=np.uint8))
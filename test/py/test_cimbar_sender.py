@@ -0,0 +1,33 @@
+import random
+import sys
+from os.path import join as path_join
+from unittest import TestCase, skipUnless
+
+from helpers import TestDirMixin, CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+import cimbar_native  # noqa: E402
+from cimbar_sender import CimbarSender  # noqa: E402
+
+
+@skipUnless(cimbar_native.is_available(), 'libcimbar_py not built')
+class CimbarSenderTest(TestDirMixin, TestCase):
+    def test_roundtrip_defaults(self):
+        # default sender encoder -> default receiver decoder: both must agree on the mode
+        payload = random.Random(7).randbytes(30000)
+        completed = []
+
+        with cimbar_native.Decoder(self.working_dir.name) as decoder:
+            def display(canvas):
+                completed.extend(decoder.decode(canvas).new_files)
+                return not completed
+
+            # no margin or shake: the canvas is exactly the code, as the deskew-free decoder expects
+            sender = CimbarSender(payload, fps=100, display=display, workers=2, shake=False, margin=0)
+            with sender:
+                sender.run(duration=60)
+
+        self.assertIsNone(sender.error)
+        self.assertEqual(1, len(completed))
+        with open(completed[0], 'rb') as f:
+            self.assertEqual(payload, f.read())
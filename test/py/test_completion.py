@@ -0,0 +1,30 @@
+import sys
+from os.path import join as path_join
+from unittest import TestCase
+
+from helpers import CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+from completion import CompletedIndex  # noqa: E402
+
+
+class CompletedIndexTest(TestCase):
+    def test_add_once(self):
+        index = CompletedIndex()
+        entry = index.add('/out/5.1000')
+        self.assertEqual((5, 1000, '/out/5.1000'), entry[:3])
+        self.assertIsNone(index.add('/elsewhere/5.1000'))
+        self.assertIsNone(index.add('/out/not-a-sink-file'))
+        self.assertEqual(1, len(index))
+
+    def test_evicted_files_are_not_counted_twice(self):
+        index = CompletedIndex(max_entries=2)
+        for i in range(5):
+            index.add(f'/out/{i}.100')
+        self.assertEqual(5, len(index))
+        self.assertEqual(['/out/3.100', '/out/4.100'], [e.path for e in index.entries()])
+
+        self.assertIsNone(index.add('/out/0.100'))
+        self.assertIn('/out/0.100', index)
+        self.assertIsNone(index.get(0, 100))
+        self.assertEqual(5, len(index))
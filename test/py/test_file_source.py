@@ -0,0 +1,187 @@
+import os
+import random
+import subprocess
+import sys
+import threading
+from glob import glob
+from os.path import basename, exists, join as path_join
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from helpers import TestDirMixin, CIMBAR_SRC
+from test_cimbar_cli import CIMBAR_EXE
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+import cimbar_native  # noqa: E402
+from capture_backends import FileSource  # noqa: E402
+from cimbar_session import CimbarDecodeSession  # noqa: E402
+from detectors import create_detector  # noqa: E402
+from perspective import PerspectiveNormalizer  # noqa: E402
+from pipeline import DecodePipeline  # noqa: E402
+
+
+def write_frames(directory, count, size=64):
+    paths = []
+    for i in range(count):
+        path = path_join(directory, f'frame_{i}.png')
+        cv2.imwrite(path, np.full((size, size, 3), i * 10, dtype=np.uint8))
+        paths.append(path)
+    return paths
+
+
+def write_video(path, count, size=64):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (size, size))
+    for i in range(count):
+        writer.write(np.full((size, size, 3), i * 20, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def frame_number(frame, step=20):
+    # jpeg moves flat colors by a level or two
+    return round(int(frame[0, 0, 0]) / step)
+
+
+def encode_pngs(payload_path, prefix):
+    """cimbar --encode if it's built, otherwise the libcimbar_py encoder"""
+    if exists(CIMBAR_EXE):
+        subprocess.run([CIMBAR_EXE, '--encode', '-i', payload_path, '-o', prefix], check=True,
+                       stdout=subprocess.DEVNULL)
+        return sorted(glob(f'{prefix}_*.png'), key=lambda p: int(p.rsplit('_', 1)[1].split('.')[0]))
+
+    with open(payload_path, 'rb') as f, cimbar_native.Encoder() as encoder:
+        encoder.encode(f)
+        paths = []
+        for i, frame in enumerate(encoder.frames(encoder.frames_required() * 2)):
+            paths.append(f'{prefix}_{i}.png')
+            cv2.imwrite(paths[-1], frame)
+        return paths
+
+
+class FileSourceTest(TestDirMixin, TestCase):
+    def test_frames_in_order(self):
+        source = FileSource(write_frames(self.working_dir.name, 3))
+        source.open()
+        try:
+            seen = [int(source.grab()[0][0, 0, 0]) for _ in range(3)]
+            with self.assertRaises(EOFError):
+                source.grab()
+        finally:
+            source.close()
+        self.assertEqual([0, 10, 20], seen)
+
+    def test_loop(self):
+        source = FileSource(write_frames(self.working_dir.name, 2), loop=True)
+        source.open()
+        seen = [int(source.grab()[0][0, 0, 0]) for _ in range(5)]
+        source.close()
+        self.assertEqual([0, 10, 0, 10, 0], seen)
+
+    def test_crop(self):
+        source = FileSource(write_frames(self.working_dir.name, 1))
+        source.open()
+        frame, offset = source.grab((50, 40, 100, 100))
+        source.close()
+        self.assertEqual((24, 14, 3), frame.shape)
+        self.assertEqual((50, 40), offset)
+
+    def test_image_cache_is_bounded(self):
+        source = FileSource(write_frames(self.working_dir.name, 10), loop=True, cache_size=3)
+        source.open()
+        seen = [int(source.grab()[0][0, 0, 0]) for _ in range(25)]
+        self.assertEqual(3, len(source.cache))
+        source.close()
+        self.assertEqual([i % 10 * 10 for i in range(25)], seen)
+        self.assertEqual(0, len(source.cache))
+
+    def test_video_read_on_demand(self):
+        source = FileSource(write_video(path_join(self.working_dir.name, 'v.avi'), 6), loop=True)
+        source.open()
+        self.assertIsNotNone(source.capture)
+        self.assertLessEqual(len(source.cache), source.cache_size)
+        seen = [frame_number(source.grab()[0]) for _ in range(8)]
+        capture = source.capture
+        source.close()
+        self.assertEqual([0, 1, 2, 3, 4, 5, 0, 1], seen)
+        self.assertFalse(capture.isOpened())
+        self.assertIsNone(source.capture)
+
+    def test_video_eof(self):
+        source = FileSource(write_video(path_join(self.working_dir.name, 'v.avi'), 3))
+        source.open()
+        try:
+            seen = [frame_number(source.grab()[0]) for _ in range(3)]
+            with self.assertRaises(EOFError):
+                source.grab()
+        finally:
+            source.close()
+        self.assertEqual([0, 1, 2], seen)
+
+    def test_video_fps_skips_and_repeats(self):
+        now = [100.0]
+        with patch('capture_backends.time.perf_counter', lambda: now[0]):
+            source = FileSource(write_video(path_join(self.working_dir.name, 'v.avi'), 12), fps=10, loop=True)
+            source.open()
+            seen = []
+            # faster than the sender repeats a frame, slower skips, far ahead seeks, past the end loops
+            for t in (0.0, 0.05, 0.15, 0.35, 0.45, 0.95, 0.25, 1.35):
+                now[0] = 100.0 + t
+                seen.append(frame_number(source.grab()[0]))
+            source.close()
+        self.assertEqual([0, 0, 1, 3, 4, 9, 2, 1], seen)
+
+    def test_missing_video(self):
+        source = FileSource(path_join(self.working_dir.name, 'missing.avi'))
+        with self.assertRaises(RuntimeError):
+            source.open()
+
+
+@skipUnless(cimbar_native.is_available() or exists(CIMBAR_EXE), 'needs cimbar or libcimbar_py')
+class FileSourcePipelineTest(TestDirMixin, TestCase):
+    def test_roundtrip(self):
+        payload = random.Random(18).randbytes(20000)
+        payload_path = path_join(self.working_dir.name, 'payload.bin')
+        with open(payload_path, 'wb') as f:
+            f.write(payload)
+        paths = encode_pngs(payload_path, path_join(self.working_dir.name, 'img'))
+        self.assertTrue(paths)
+
+        output_dir = path_join(self.working_dir.name, 'out')
+        os.makedirs(output_dir)
+        if cimbar_native.is_available():
+            native = cimbar_native.Decoder(output_dir)
+            decode_roi, close = (lambda roi: native.decode(roi).new_files), native.close
+        else:
+            session = CimbarDecodeSession(CIMBAR_EXE, output_dir)
+            temp_path = path_join(self.working_dir.name, 'roi.png')
+
+            def decode_roi(roi):
+                cv2.imwrite(temp_path, roi)
+                return session.decode_file(temp_path)[1]
+            close = session.close
+
+        completed = []
+        done = threading.Event()
+
+        def decode(roi, bbox):
+            new_files = decode_roi(roi)
+            if new_files:
+                completed.extend(new_files)
+                done.set()
+            return bool(new_files)
+
+        detector, normalizer = create_detector('anchor'), PerspectiveNormalizer()
+        errors = []
+        pipeline = DecodePipeline(FileSource(paths, loop=True), detect=lambda image: detector.detect(image, normalizer),
+                                  decode=decode, fps=30, on_error=lambda stage, e: errors.append((stage, e)))
+        with pipeline:
+            done.wait(60)
+        close()
+
+        self.assertEqual([], errors)
+        self.assertEqual(1, len(completed))
+        with open(path_join(output_dir, basename(completed[0])), 'rb') as f:
+            self.assertEqual(payload, f.read())
@@ -0,0 +1,45 @@
+import sys
+from os.path import join as path_join
+from unittest import TestCase
+
+import numpy as np
+
+from helpers import CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+from frame_dedup import FrameDeduplicator  # noqa: E402
+
+
+def noise(seed, size=256):
+    return np.random.default_rng(seed).integers(0, 256, (size, size, 3), dtype=np.uint8)
+
+
+class FrameDeduplicatorTest(TestCase):
+    def test_only_recorded_frames_are_duplicates(self):
+        dedup = FrameDeduplicator()
+        frame = noise(0)
+
+        # a frame that failed to decode is not remembered
+        self.assertFalse(dedup.is_duplicate(frame))
+        self.assertFalse(dedup.is_duplicate(frame.copy()))
+
+        dedup.record(dedup.last_hash)
+        self.assertTrue(dedup.is_duplicate(frame.copy()))
+        self.assertFalse(dedup.is_duplicate(noise(1)))
+        self.assertEqual((4, 1), (dedup.checked, dedup.skipped))
+
+    def test_history_is_lru(self):
+        dedup = FrameDeduplicator(history=2)
+        frames = [noise(seed) for seed in range(3)]
+        for frame in frames[:2]:
+            self.assertFalse(dedup.is_duplicate(frame))
+            dedup.record(dedup.last_hash)
+
+        # touch the oldest, so the next record evicts frames[1]
+        self.assertTrue(dedup.is_duplicate(frames[0]))
+        self.assertFalse(dedup.is_duplicate(frames[2]))
+        dedup.record(dedup.last_hash)
+
+        self.assertTrue(dedup.is_duplicate(frames[0]))
+        self.assertFalse(dedup.is_duplicate(frames[1]))
+        self.assertTrue(dedup.is_duplicate(frames[2]))
@@ -0,0 +1,168 @@
+import os
+import struct
+import sys
+from os.path import join as path_join
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+
+from helpers import TestDirMixin, CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+import frame_record  # noqa: E402
+from frame_record import FrameRecorder, RecordingReader, RecordingSource  # noqa: E402
+
+
+def frame(i, width=40, height=30, channels=3):
+    # flat blocks, so jpeg keeps them close enough to compare
+    image = np.zeros((height, width, channels), dtype=np.uint8)
+    image[:, :width // 2] = 10 * i
+    image[:, width // 2:] = 200 - 10 * i
+    return image
+
+
+FRAMES = [
+    (0.0, frame(0), (0, 0)),
+    (0.25, frame(1, width=20, height=16), (100, 50)),
+    (0.5, frame(2, channels=4), (7, 9)),
+]
+
+
+class FrameRecordTest(TestDirMixin, TestCase):
+    def record(self, codec, frames=FRAMES):
+        path = path_join(self.working_dir.name, f'{codec}.rec')
+        with FrameRecorder(path, codec=codec) as recorder:
+            for timestamp, image, offset in frames:
+                recorder.write(image, offset, timestamp=10 + timestamp)
+        self.assertEqual(len(frames), recorder.frames)
+        self.assertEqual(0, recorder.dropped)
+        self.assertIsNone(recorder.error)
+        return path
+
+    def assertFramesEqual(self, expected, actual, tolerance=0):
+        self.assertEqual(len(expected), len(actual))
+        for (t0, f0, o0), (t1, f1, o1) in zip(expected, actual):
+            self.assertAlmostEqual(t0, t1)
+            self.assertEqual(o0, o1)
+            self.assertEqual(f0.shape, f1.shape)
+            self.assertLessEqual(np.abs(f0.astype(int) - f1.astype(int)).max(), tolerance)
+
+    def test_roundtrip(self):
+        for codec, tolerance in (('raw', 0), ('png', 0), ('jpeg', 8)):
+            with self.subTest(codec=codec):
+                frames = FRAMES if codec != 'jpeg' else FRAMES[:2]
+                with RecordingReader(self.record(codec, frames)) as reader:
+                    self.assertEqual(codec, reader.codec)
+                    self.assertEqual(len(frames), len(reader))
+                    self.assertAlmostEqual(frames[-1][0], reader.duration)
+                    self.assertFramesEqual(frames, list(reader), tolerance)
+                    # random access
+                    self.assertFramesEqual(frames[1:2], [reader.read(1)], tolerance)
+
+    def test_file_layout(self):
+        path = self.record('raw')
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        self.assertEqual(frame_record.MAGIC + bytes([frame_record.CODECS['raw'], 0, 0, 0]), data[:12])
+        position = frame_record.FILE_HEADER.size
+        positions = []
+        for timestamp, image, (x, y) in FRAMES:
+            header = frame_record.FRAME_HEADER.unpack_from(data, position)
+            height, width, channels = image.shape
+            self.assertEqual((timestamp, x, y, width, height, channels, image.size), header)
+            start = position + frame_record.FRAME_HEADER.size
+            self.assertEqual(image.tobytes(), data[start:start + image.size])
+            positions.append(position)
+            position = start + image.size
+
+        trailer = frame_record.INDEX_TRAILER
+        index_position, count, magic = trailer.unpack_from(data, len(data) - trailer.size)
+        self.assertEqual((position, 3, frame_record.INDEX_MAGIC), (index_position, count, magic))
+        self.assertEqual(positions, list(struct.unpack_from('<3Q', data, index_position)))
+        self.assertEqual(len(data), index_position + 3 * 8 + trailer.size)
+
+    def test_truncated_without_index(self):
+        path = self.record('png')
+        with RecordingReader(path) as reader:
+            positions = reader.positions
+        index_position = os.path.getsize(path) - 3 * 8 - frame_record.INDEX_TRAILER.size
+        # an interrupted recording: no index, and the last frame cut in half
+        cut = (positions[2] + index_position) // 2
+        with open(path, 'r+b') as f:
+            f.truncate(cut)
+
+        with RecordingReader(path) as reader:
+            self.assertEqual(positions[:2], reader.positions)
+            self.assertFramesEqual(FRAMES[:2], list(reader))
+
+        # cut inside a record header: still just the complete frames
+        with open(path, 'r+b') as f:
+            f.truncate(positions[1] + 10)
+        with RecordingReader(path) as reader:
+            self.assertFramesEqual(FRAMES[:1], list(reader))
+
+    def test_not_a_recording(self):
+        path = path_join(self.working_dir.name, 'other.bin')
+        with open(path, 'wb') as f:
+            f.write(b'NOTCIMBR' + bytes(20))
+        with self.assertRaises(ValueError):
+            RecordingReader(path)
+
+        with self.assertRaises(ValueError):
+            FrameRecorder(path, codec='webp')
+
+
+class RecordingSourceTest(TestDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = path_join(self.working_dir.name, 'src.rec')
+        with FrameRecorder(self.path, codec='raw') as recorder:
+            recorder.write(frame(0, width=40, height=30), (100, 50), timestamp=0.0)
+            recorder.write(frame(1, width=40, height=30), (0, 0), timestamp=0.5)
+
+    def test_crop_is_translated(self):
+        source = RecordingSource(self.path, realtime=False)
+        source.open()
+        try:
+            # the recorded frame covers (100, 50)-(140, 80) of the screen
+            image, offset = source.grab((90, 60, 20, 100))
+            self.assertEqual((20, 10, 3), image.shape)
+            self.assertEqual((100, 60), offset)
+            np.testing.assert_array_equal(frame(0, width=40, height=30)[10:30, 0:10], image)
+
+            # no crop: the whole recorded frame at its recorded offset
+            image, offset = source.grab()
+            self.assertEqual(((30, 40, 3), (0, 0)), (image.shape, offset))
+        finally:
+            source.close()
+
+    def test_crop_outside_the_frame(self):
+        source = RecordingSource(self.path, realtime=False)
+        source.open()
+        image, offset = source.grab((0, 0, 50, 50))
+        source.close()
+        # nothing to clip to: the full frame is returned
+        self.assertEqual(((30, 40, 3), (100, 50)), (image.shape, offset))
+
+    def test_ends_with_eof(self):
+        source = RecordingSource(self.path, realtime=False)
+        source.open()
+        source.grab()
+        source.grab()
+        with self.assertRaises(EOFError):
+            source.grab()
+        source.close()
+        self.assertIsNone(source.reader)
+
+    def test_realtime_keeps_the_recorded_pace(self):
+        sleeps = []
+        with patch('frame_record.time.perf_counter', return_value=0.0), \
+                patch('frame_record.time.sleep', sleeps.append):
+            source = RecordingSource(self.path)
+            source.open()
+            source.grab()
+            source.grab()
+            source.close()
+        self.assertEqual([0.5], sleeps)
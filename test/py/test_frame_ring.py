@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import sys
+from multiprocessing import resource_tracker
+from os.path import join as path_join
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+import numpy as np
+
+from helpers import CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+import frame_ring  # noqa: E402
+from frame_ring import FrameRing  # noqa: E402
+
+
+def consume(ring, results, count):
+    """child process: read `count` frames in order, report (seq, shape, checksum), then exit"""
+    try:
+        for _ in range(count):
+            frame = ring.acquire(timeout=10)
+            if frame is None:
+                results.put(None)
+                return
+            with frame:
+                results.put((frame.seq, frame.image.shape, int(frame.image.sum(dtype=np.uint64))))
+    finally:
+        ring.close()
+
+
+def frame(seed, shape=(120, 160, 4)):
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+
+
+class FrameRingTest(TestCase):
+    def test_handoff_across_processes(self):
+        frames = [frame(i) for i in range(3)]
+        results = multiprocessing.Queue()
+        with FrameRing(slots=4, max_shape=(120, 160, 4)) as ring:
+            for image in frames:
+                ring.write(image)
+            child = multiprocessing.Process(target=consume, args=(ring, results, len(frames)))
+            child.start()
+            received = [results.get(timeout=30) for _ in frames]
+            child.join(timeout=30)
+            self.assertEqual(0, child.exitcode)
+
+            expected = [(i + 1, image.shape, int(image.sum(dtype=np.uint64))) for i, image in enumerate(frames)]
+            self.assertEqual(expected, received)
+
+            # the consumer closing its ring must not unlink the segment: it can still be attached by name
+            later = frame(9)
+            seq = ring.write(later)
+            attached = FrameRing(slots=4, max_shape=(120, 160, 4), name=ring.name, create=False)
+            try:
+                with attached.acquire(timeout=1) as latest:
+                    self.assertEqual(seq, latest.seq)
+                    self.assertTrue(np.array_equal(later, latest.image))
+            finally:
+                attached.close()
+
+    @skipUnless(hasattr(os, 'fork'), 'needs fork')
+    def test_forked_child_does_not_unlink(self):
+        # a forked child inherits the creator's FrameRing object without __setstate__
+        with FrameRing(slots=2, max_shape=(8, 8, 3)) as ring:
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    ring.close()
+                finally:
+                    os._exit(0)
+            os.waitpid(pid, 0)
+
+            attached = FrameRing(slots=2, max_shape=(8, 8, 3), name=ring.name, create=False)
+            attached.close()
+
+    def test_attach_is_not_tracked(self):
+        with FrameRing(slots=2, max_shape=(8, 8, 3)) as ring:
+            with patch.object(resource_tracker, 'register', wraps=resource_tracker.register) as register:
+                attached = FrameRing(slots=2, max_shape=(8, 8, 3), name=ring.name, create=False)
+            self.assertNotIn('shared_memory', [rtype for _, rtype in (c.args for c in register.call_args_list)])
+            ring.write(np.full((8, 8, 3), 7, dtype=np.uint8))
+            with attached.acquire(timeout=1) as f:
+                self.assertEqual(7, int(f.image[0, 0, 0]))
+            attached.close()
+            self.assertIs(resource_tracker, frame_ring.shared_memory.resource_tracker)
@@ -0,0 +1,105 @@
+import sys
+import threading
+import time
+from os.path import join as path_join
+from unittest import TestCase
+
+from helpers import CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+from multi_source import DecodeScheduler, SourceChannel  # noqa: E402
+
+
+class FakeDecoder:
+    """decode(roi) -> (nbytes, new_files, streams), with `blocks` new fountain blocks per call"""
+    def __init__(self, blocks, seconds=0.002):
+        self.blocks = blocks
+        self.seconds = seconds
+        self.total = 0
+
+    def decode(self, roi):
+        time.sleep(self.seconds)
+        if not self.blocks:
+            return 0, [], []
+        self.total += self.blocks
+        return 100, [], [(0, self.total, 10 ** 9, 1000)]
+
+
+class DecodeSchedulerTest(TestCase):
+    def test_weight(self):
+        scheduler = DecodeScheduler([], min_weight=0.2)
+        channel = SourceChannel('a', None, None)
+        self.assertEqual(1.0, scheduler.weight(channel))
+        channel.yield_rate = 0.0
+        self.assertEqual(0.2, scheduler.weight(channel))
+        channel.yield_rate = 3.0
+        self.assertEqual(3.0, scheduler.weight(channel))
+
+    def test_time_follows_yield(self):
+        active = SourceChannel('active', None, FakeDecoder(blocks=5))
+        idle = SourceChannel('idle', None, FakeDecoder(blocks=0))
+        done = threading.Event()
+
+        def on_result(channel, nbytes, new_files):
+            # both sources always have a fresh region waiting, like two screens being watched
+            if active.decodes + idle.decodes >= 150:
+                done.set()
+            else:
+                scheduler.offer(channel, 'roi')
+
+        scheduler = DecodeScheduler([active, idle], workers=1, min_weight=0.2, on_result=on_result)
+        scheduler.offer(active, 'roi')
+        scheduler.offer(idle, 'roi')
+        scheduler.start()
+        try:
+            self.assertTrue(done.wait(30))
+        finally:
+            scheduler.stop()
+
+        # weights 5 vs min_weight 0.2: the active source gets ~96% of the decode time
+        self.assertGreater(scheduler.shares()['active'], 0.85)
+        self.assertEqual(5.0, active.yield_rate)
+        self.assertEqual(0.0, idle.yield_rate)
+        self.assertEqual(5 * active.decodes, active.new_blocks)
+        # the idle source is still probed, it just doesn't slow the transfer down
+        self.assertGreater(idle.decodes, 0)
+
+    def test_idle_source_runs_when_alone(self):
+        idle = SourceChannel('idle', None, FakeDecoder(blocks=0, seconds=0))
+        idle.yield_rate = 0.0
+        idle.vtime = 50.0
+        scheduler = DecodeScheduler([idle], workers=1)
+        scheduler.offer(idle, 'roi')
+        channel, roi, _ = scheduler._next()
+        self.assertIs(idle, channel)
+        self.assertEqual('roi', roi)
+        self.assertIsNone(idle.pending)
+        self.assertTrue(idle.busy)
+
+    def test_no_credit_while_idle(self):
+        # a source that had nothing to decode must not bank virtual time and then monopolize the workers
+        fresh = SourceChannel('fresh', None, None)
+        busy = SourceChannel('busy', None, None)
+        busy.vtime = 10.5
+        scheduler = DecodeScheduler([fresh, busy], workers=1)
+        scheduler.clock = 10.0
+        scheduler.offer(fresh, 'a')
+        scheduler.offer(busy, 'b')
+
+        channel, roi, _ = scheduler._next()
+        self.assertEqual((fresh, 'a'), (channel, roi))
+        self.assertEqual(10.0, fresh.vtime)
+
+        fresh.vtime += 1.0
+        fresh.busy = False
+        scheduler.offer(fresh, 'c')
+        channel, roi, _ = scheduler._next()
+        self.assertEqual((busy, 'b'), (channel, roi))
+
+    def test_replaced_region(self):
+        channel = SourceChannel('a', None, None)
+        scheduler = DecodeScheduler([channel], workers=1)
+        scheduler.offer(channel, 'old')
+        scheduler.offer(channel, 'new')
+        self.assertEqual(1, channel.replaced)
+        self.assertEqual('new', scheduler._next()[1])
@@ -0,0 +1,92 @@
+import sys
+from os.path import join as path_join
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from helpers import CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+from rate_control import RateController  # noqa: E402
+
+
+class FakeTime:
+    """stands in for the time module: wall clock and process cpu time both move only when told to"""
+    def __init__(self):
+        self.now = 1000.0
+        self.cpu = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def process_time(self):
+        return self.cpu
+
+
+class RateControllerTest(TestCase):
+    def setUp(self):
+        self.time = FakeTime()
+        for target, value in (('rate_control.time', self.time), ('rate_control.os.cpu_count', lambda: 1)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.pipeline = SimpleNamespace(captured=0, detected=0, decoded=0, fps=None, decode_interval=None)
+        self.blocks = 0
+        self.rate = RateController(max_fps=60, min_fps=5, idle_fps=2, min_interval=0.0, idle_interval=0.5,
+                                   cpu_target=0.85, ramp_up=2.0, back_off=0.5, period=0.5)
+        self.assertTrue(self.rate.update(self.pipeline, self.blocks))
+
+    def period(self, captured=10, detected=0, decoded=0, blocks=0, cpu=0.0, latency=None):
+        """one control period: what the pipeline did in the last second"""
+        self.time.now += 1.0
+        self.time.cpu += cpu
+        self.pipeline.captured += captured
+        self.pipeline.detected += detected
+        self.pipeline.decoded += decoded
+        self.blocks += blocks
+        self.assertTrue(self.rate.update(self.pipeline, self.blocks, latency))
+        return self.rate.state, self.pipeline.fps, self.pipeline.decode_interval
+
+    def test_starts_active_and_waits_for_period(self):
+        self.assertEqual(('active', 60, 0.0), (self.rate.state, self.pipeline.fps, self.pipeline.decode_interval))
+        self.time.now += 0.1
+        self.pipeline.captured += 10
+        self.assertFalse(self.rate.update(self.pipeline, self.blocks))
+
+    def test_idle_when_nothing_detected(self):
+        self.assertEqual(('idle', 2, 0.0), self.period(captured=10))
+        self.assertEqual(0.0, self.rate.hit_rate)
+
+    def test_idle_to_active_ramps_up(self):
+        self.period(captured=10)
+        # a code shows up and brings new blocks: restart from min_fps and double each period
+        self.assertEqual(('active', 10, 0.0), self.period(detected=2, decoded=2, blocks=20))
+        self.assertEqual(10.0, self.rate.yield_rate)
+        self.assertEqual(('active', 20, 0.0), self.period(detected=10, decoded=5, blocks=20))
+        self.assertEqual(('active', 40, 0.0), self.period(detected=10, decoded=5, blocks=20))
+        self.assertEqual(('active', 60, 0.0), self.period(detected=10, decoded=5, blocks=20))
+
+    def test_waiting_backs_off(self):
+        # the code is on screen, but decoding it brings nothing new
+        self.assertEqual(('waiting', 30, 0.5), self.period(detected=10, decoded=10))
+        self.assertEqual(('waiting', 15, 0.5), self.period(detected=10, decoded=10))
+        self.assertEqual(('waiting', 7.5, 0.5), self.period(detected=10, decoded=10))
+        self.assertEqual(('waiting', 5, 0.5), self.period(detected=10, decoded=10))
+
+        # new data again: back to active, from where waiting left it
+        self.assertEqual(('active', 10, 0.0), self.period(detected=10, decoded=10, blocks=5))
+
+        # and no code at all: idle
+        self.assertEqual(('idle', 2, 0.0), self.period(captured=10))
+
+    def test_cpu_over_target(self):
+        state, fps, _ = self.period(detected=10, decoded=10, blocks=50, cpu=0.95)
+        self.assertEqual(('active', 30), (state, fps))
+        self.assertAlmostEqual(0.95, self.rate.cpu)
+
+    def test_latency_caps_fps(self):
+        # 100ms per decode: capturing more than 2x that is wasted
+        self.assertEqual(('active', 20, 0.0), self.period(detected=10, decoded=10, blocks=50, latency=0.1))
+        # but never below min_fps
+        self.assertEqual(('active', 5, 0.0), self.period(detected=10, decoded=10, blocks=50, latency=1.0))
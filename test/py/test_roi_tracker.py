@@ -0,0 +1,126 @@
+import sys
+import threading
+from os.path import join as path_join
+from unittest import TestCase
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from helpers import TestDirMixin, CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+from capture_backends import FileSource  # noqa: E402
+from pipeline import DecodePipeline  # noqa: E402
+from roi_tracker import RoiTracker  # noqa: E402
+
+
+def write_squares(directory, positions, size=40):
+    """one 320x240 frame per position, with a white size x size square at (x, y)"""
+    paths = []
+    for i, (x, y) in enumerate(positions):
+        image = np.zeros((240, 320, 3), dtype=np.uint8)
+        image[y:y+size, x:x+size] = 255
+        paths.append(path_join(directory, f'square_{i}.png'))
+        cv2.imwrite(paths[-1], image)
+    return paths
+
+
+def find_square(image):
+    """stand-in detector: bounding box of the white pixels, in image coordinates"""
+    points = cv2.findNonZero(cv2.inRange(image, (128, 128, 128), (255, 255, 255)))
+    if points is None:
+        return False, None, None
+    x, y, w, h = cv2.boundingRect(points)
+    return True, image[y:y+h, x:x+w], (x, y, w, h)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class RoiTrackerTest(TestDirMixin, TestCase):
+    def step(self, source, tracker):
+        """one capture -> detect -> update round, the way DecodePipeline drives the tracker"""
+        crop = tracker.next_crop()
+        frame, offset = source.grab(crop)
+        found, _, bbox = find_square(frame)
+        if found:
+            bbox = (bbox[0] + offset[0], bbox[1] + offset[1], bbox[2], bbox[3])
+        tracker.update(crop is not None, found, bbox)
+        return crop, frame.shape[:2], found, bbox
+
+    def test_tracks_then_rescans_on_miss(self):
+        # the square sits still for three frames, jumps out of the tracked region, then stays there
+        positions = [(100, 80)] * 3 + [(250, 180)] * 3
+        source = FileSource(write_squares(self.working_dir.name, positions))
+        tracker = RoiTracker(margin=0.15, rescan_interval=60)
+        source.open()
+        try:
+            steps = [self.step(source, tracker) for _ in positions]
+        finally:
+            source.close()
+
+        # first frame: full scan
+        self.assertEqual((None, (240, 320), True, (100, 80, 40, 40)), steps[0])
+        # then only the bbox plus 15% (6px) margin is grabbed, and the bbox stays in source coordinates
+        for step in steps[1:3]:
+            self.assertEqual(((94, 74, 52, 52), (52, 52), True, (100, 80, 40, 40)), step)
+        # the code moved away: the tracked grab misses...
+        self.assertEqual(((94, 74, 52, 52), (52, 52), False, None), steps[3])
+        self.assertEqual(1, tracker.misses)
+        # ...so the next frame is a full scan, which finds it again and tracks the new spot
+        self.assertEqual((None, (240, 320), True, (250, 180, 40, 40)), steps[4])
+        self.assertEqual(((244, 174, 52, 52), (52, 52), True, (250, 180, 40, 40)), steps[5])
+
+    def test_crop_is_clipped_to_the_frame(self):
+        source = FileSource(write_squares(self.working_dir.name, [(280, 200)] * 2))
+        tracker = RoiTracker(margin=0.15, rescan_interval=60)
+        source.open()
+        steps = [self.step(source, tracker) for _ in range(2)]
+        source.close()
+
+        self.assertEqual(((274, 194, 52, 52), (46, 46), True, (280, 200, 40, 40)), steps[1])
+
+    def test_rescan_interval(self):
+        clock = FakeClock()
+        source = FileSource(write_squares(self.working_dir.name, [(100, 80)]), loop=True)
+        tracker = RoiTracker(margin=0.15, rescan_interval=2.0)
+        source.open()
+        with patch('roi_tracker.time.monotonic', clock):
+            crops = []
+            for _ in range(6):
+                crops.append(self.step(source, tracker)[0])
+                clock.now += 0.9
+        source.close()
+
+        # a full scan every 2s even though every tracked frame hits
+        tracked = (94, 74, 52, 52)
+        self.assertEqual([None, tracked, tracked, None, tracked, tracked], crops)
+        self.assertEqual(0, tracker.misses)
+
+    def test_pipeline_detects_on_the_tracked_region(self):
+        source = FileSource(write_squares(self.working_dir.name, [(100, 80)]), loop=True)
+        bboxes = []
+        done = threading.Event()
+
+        def decode(roi, bbox):
+            bboxes.append(bbox)
+            if len(bboxes) >= 10:
+                done.set()
+
+        errors = []
+        pipeline = DecodePipeline(source, detect=find_square, decode=decode, fps=200,
+                                  tracker=RoiTracker(rescan_interval=60),
+                                  on_error=lambda stage, e: errors.append((stage, e)))
+        with pipeline:
+            self.assertTrue(done.wait(10))
+
+        self.assertEqual([], errors)
+        self.assertEqual({(100, 80, 40, 40)}, set(bboxes))
+        # capture may grab another full frame before the first detection lands, but tracking takes over
+        self.assertGreater(pipeline.detect_time['tracked'][0], 0)
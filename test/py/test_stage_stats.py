@@ -0,0 +1,109 @@
+import json
+import sys
+from os.path import join as path_join
+from unittest import TestCase
+from unittest.mock import patch
+
+from helpers import TestDirMixin, CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+from stage_stats import StageStats, StageTimer, StatsExporter  # noqa: E402
+
+
+class StageTimerTest(TestCase):
+    def test_percentiles(self):
+        timer = StageTimer()
+        self.assertEqual(0.0, timer.percentile(50))
+        for ms in range(1, 101):
+            timer.record(ms / 1000.0)
+        summary = timer.summary()
+        self.assertEqual(100, summary['count'])
+        self.assertAlmostEqual(50.5, summary['mean_ms'])
+        self.assertAlmostEqual(51.0, summary['p50_ms'])
+        self.assertAlmostEqual(91.0, summary['p90_ms'])
+        self.assertAlmostEqual(100.0, summary['p99_ms'])
+        self.assertAlmostEqual(100.0, summary['max_ms'])
+
+    def test_window_keeps_recent(self):
+        timer = StageTimer(window=10)
+        timer.record(1.0)
+        for _ in range(10):
+            timer.record(0.002)
+        # the slow one fell out of the window, but still counts for max and mean
+        self.assertAlmostEqual(2.0, timer.summary()['p99_ms'])
+        self.assertAlmostEqual(1000.0, timer.summary()['max_ms'])
+        self.assertEqual(11, timer.count)
+
+
+class StageStatsTest(TestCase):
+    def test_record_time_count_watch(self):
+        stats = StageStats()
+        self.assertIsNone(stats.percentile('detect', 50))
+
+        stats.record('detect', 0.004)
+        stats.record('custom', 0.5)
+        with patch('stage_stats.time.perf_counter', side_effect=[10.0, 10.25]):
+            with stats.time('decode'):
+                pass
+        self.assertAlmostEqual(0.004, stats.percentile('detect', 50))
+        self.assertAlmostEqual(0.25, stats.percentile('decode', 99))
+
+        stats.count('captured')
+        stats.count('captured', 4)
+        captured = [7]
+        stats.watch('decoded', lambda: captured[0])
+        captured[0] = 9
+
+        snapshot = stats.snapshot()
+        self.assertEqual({'captured': 5, 'decoded': 9}, snapshot['counters'])
+        self.assertEqual(set(StageStats.STAGES) | {'custom'}, set(snapshot['stages']))
+        self.assertEqual(0, snapshot['stages']['grab']['count'])
+        self.assertEqual({'count', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms'},
+                         set(snapshot['stages']['detect']))
+        self.assertAlmostEqual(250.0, snapshot['stages']['decode']['max_ms'])
+        self.assertGreaterEqual(snapshot['uptime'], 0.0)
+        json.dumps(snapshot)
+
+    def test_time_records_on_error(self):
+        stats = StageStats()
+        with self.assertRaises(ValueError):
+            with stats.time('detect'):
+                raise ValueError()
+        self.assertEqual(1, stats.timers['detect'].count)
+
+    def test_prometheus(self):
+        stats = StageStats()
+        stats.count('captured', 3)
+        stats.record('detect', 0.01)
+        stats.record('detect', 0.03)
+        lines = stats.to_prometheus(prefix='test').splitlines()
+
+        self.assertEqual('# TYPE test_uptime_seconds gauge', lines[0])
+        self.assertRegex(lines[1], r'^test_uptime_seconds \d+\.\d{3}$')
+        self.assertIn('# TYPE test_captured_total counter', lines)
+        self.assertIn('test_captured_total 3', lines)
+        self.assertIn('# TYPE test_stage_seconds summary', lines)
+        self.assertIn('test_stage_seconds{stage="detect",quantile="0.5"} 0.030000', lines)
+        self.assertIn('test_stage_seconds{stage="detect",quantile="0.99"} 0.030000', lines)
+        self.assertIn('test_stage_seconds_sum{stage="detect"} 0.040000', lines)
+        self.assertIn('test_stage_seconds_count{stage="detect"} 2', lines)
+        self.assertIn('test_stage_seconds_count{stage="grab"} 0', lines)
+        # every sample line is "name{labels} value"
+        for line in lines:
+            if not line.startswith('#'):
+                self.assertRegex(line, r'^test_[a-z_]+(\{[^}]*\})? [0-9.]+$')
+
+
+class StatsExporterTest(TestDirMixin, TestCase):
+    def test_stop_writes_both_files(self):
+        stats = StageStats()
+        stats.count('captured', 2)
+        json_path = path_join(self.working_dir.name, 'stats.json')
+        prometheus_path = path_join(self.working_dir.name, 'stats.prom')
+        exporter = StatsExporter(stats, json_path, prometheus_path, interval=60).start()
+        exporter.stop()
+
+        with open(json_path) as f:
+            self.assertEqual(2, json.load(f)['counters']['captured'])
+        with open(prometheus_path) as f:
+            self.assertIn('cimbar_decoder_captured_total 2\n', f.read())
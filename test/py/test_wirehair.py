@@ -0,0 +1,112 @@
+import random
+import sys
+from os.path import join as path_join
+from unittest import TestCase, skipUnless
+
+import numpy as np
+
+from helpers import CIMBAR_SRC
+
+sys.path.insert(0, path_join(CIMBAR_SRC, 'python_decoder'))
+import wirehair  # noqa: E402
+from wirehair import WirehairDecoder, WirehairEncoder  # noqa: E402
+
+
+BLOCK_BYTES = 100
+
+
+def message(size=10050, seed=22):
+    # not a multiple of the block size, so the last original block is short
+    return random.Random(seed).randbytes(size)
+
+
+@skipUnless(wirehair.is_available(), 'wirehair library not found (set WIREHAIR_LIB)')
+class WirehairTest(TestCase):
+    def test_roundtrip_with_losses(self):
+        payload = message()
+        n = wirehair.block_count(len(payload), BLOCK_BYTES)
+        rng = random.Random(1)
+        with WirehairEncoder(payload, BLOCK_BYTES) as encoder, WirehairDecoder(len(payload), BLOCK_BYTES) as decoder:
+            block_id = 0
+            done = False
+            while not done:
+                # drop a third of the blocks, including originals
+                if rng.random() > 0.33:
+                    done = decoder.decode(block_id, bytes(encoder.encode(block_id)))
+                block_id += 1
+                self.assertLess(block_id, 3 * n)
+
+            self.assertGreaterEqual(decoder.received, n)
+            self.assertEqual(payload, bytes(decoder.recover()))
+            last = decoder.recover_block(n - 1)
+            self.assertEqual(payload[(n - 1) * BLOCK_BYTES:], bytes(last))
+            # more blocks after completion are ignored
+            self.assertTrue(decoder.decode(block_id, bytes(encoder.encode(block_id))))
+
+    def test_batch_roundtrip(self):
+        payload = message()
+        n = wirehair.block_count(len(payload), BLOCK_BYTES)
+        ids = np.array([i for i in range(2 * n) if i % 4 != 1], dtype=np.uint32)
+        with WirehairEncoder(payload, BLOCK_BYTES) as encoder, WirehairDecoder(len(payload), BLOCK_BYTES) as decoder:
+            blocks, lengths = encoder.encode_batch(ids)
+            # the batch matches the one-block-at-a-time encoder
+            for i in (0, n - 1, len(ids) - 1):
+                self.assertEqual(bytes(encoder.encode(int(ids[i]))), bytes(blocks[i, :lengths[i]]))
+
+            self.assertTrue(decoder.decode_batch(ids, blocks, lengths))
+            self.assertLess(decoder.received, len(ids))
+            self.assertEqual(payload, bytes(decoder.recover()))
+
+    def test_decoder_becomes_encoder(self):
+        payload = message()
+        n = wirehair.block_count(len(payload), BLOCK_BYTES)
+        with WirehairEncoder(payload, BLOCK_BYTES) as encoder:
+            decoder = WirehairDecoder(len(payload), BLOCK_BYTES)
+            block_id = n
+            while not decoder.decode(block_id, bytes(encoder.encode(block_id))):
+                block_id += 1
+            with decoder.to_encoder() as relay:
+                self.assertEqual(bytes(encoder.encode(3 * n)), bytes(relay.encode(3 * n)))
+            with self.assertRaises(ValueError):
+                decoder.recover()
+
+    def test_bad_block_count(self):
+        with self.assertRaises(wirehair.WirehairInputError) as cm:
+            WirehairDecoder(BLOCK_BYTES, BLOCK_BYTES)
+        self.assertEqual(wirehair.BAD_INPUT_SMALL_N, cm.exception.result)
+        # input errors are also ValueErrors
+        self.assertIsInstance(cm.exception, ValueError)
+
+        with self.assertRaises(wirehair.WirehairInputError) as cm:
+            WirehairEncoder(bytes(64001), 1)
+        self.assertEqual(wirehair.BAD_INPUT_LARGE_N, cm.exception.result)
+
+        with self.assertRaises(wirehair.WirehairInputError) as cm:
+            WirehairDecoder(0, BLOCK_BYTES)
+        self.assertEqual(wirehair.INVALID_INPUT, cm.exception.result)
+
+    def test_result_codes(self):
+        self.assertEqual(wirehair.SUCCESS, wirehair._check(wirehair.SUCCESS))
+        self.assertEqual(wirehair.NEED_MORE, wirehair._check(wirehair.NEED_MORE))
+        expected = {
+            wirehair.INVALID_INPUT: wirehair.WirehairInputError,
+            wirehair.BAD_DENSE_SEED: wirehair.WirehairSeedError,
+            wirehair.BAD_PEEL_SEED: wirehair.WirehairSeedError,
+            wirehair.EXTRA_INSUFFICIENT: wirehair.WirehairInsufficientError,
+            wirehair.OOM: wirehair.WirehairMemoryError,
+            wirehair.ERROR: wirehair.WirehairError,
+        }
+        for result, error in expected.items():
+            with self.assertRaises(error) as cm:
+                wirehair._check(result)
+            self.assertIs(error, type(cm.exception))
+            self.assertEqual(result, cm.exception.result)
+
+    def test_recover_before_done(self):
+        payload = message()
+        with WirehairEncoder(payload, BLOCK_BYTES) as encoder, WirehairDecoder(len(payload), BLOCK_BYTES) as decoder:
+            self.assertFalse(decoder.decode(0, bytes(encoder.encode(0))))
+            for call in (decoder.recover, lambda: decoder.recover_block(0), decoder.to_encoder):
+                with self.assertRaises(wirehair.WirehairError) as cm:
+                    call()
+                self.assertEqual(wirehair.NEED_MORE, cm.exception.result)